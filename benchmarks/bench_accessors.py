@@ -0,0 +1,97 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cost of the price accessors of a client holding valid prices.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_accessors
+
+Compares the original accessors (asserting their arguments and comparing `int(time.time())`
+with the time of the last refresh), the snapshot based ones which compared the snapshot's
+wall clock timestamp with `expiry` on every call, and the current ones, comparing
+`time.monotonic_ns()` with the deadline set by the last refresh.
+"""
+
+import threading
+import time
+import timeit
+from typing import Optional
+
+from pygasprice_client import POANetwork, FAST, FASTEST
+from pygasprice_client.snapshot import GasPriceSnapshot
+
+
+class OriginalPOANetwork(POANetwork):
+    def _original_value_if_valid(self, array: list, index: int) -> Optional[int]:
+        assert isinstance(array, list)
+        assert isinstance(index, int)
+
+        if int(time.time()) - self._last_refresh <= self.expiry and len(array) > index:
+            return array[index]
+        return None
+
+    def _swap(self, snapshot: GasPriceSnapshot):
+        super()._swap(snapshot)
+        self._gas_prices = list(snapshot.gas_prices)
+        self._max_tips = list(snapshot.max_tips)
+        self._last_refresh = int(time.time())
+
+    def fast_price(self) -> Optional[int]:
+        return self._original_value_if_valid(self._gas_prices, FAST)
+
+    def fastest_tip(self) -> Optional[int]:
+        return self._original_value_if_valid(self._max_tips, FASTEST)
+
+
+class WallClockPOANetwork(POANetwork):
+    def _return_value_if_valid(self, index: int, max_age: Optional[float] = None) -> Optional[int]:
+        snapshot = self.snapshot()
+        return snapshot.values[index] if snapshot is not None else None
+
+    def snapshot(self, max_age: Optional[float] = None) -> Optional[GasPriceSnapshot]:
+        snapshot = self._snapshot
+        if time.time() - snapshot.timestamp <= self.expiry:
+            return snapshot
+        return None
+
+
+def ready_client(cls):
+    # holds a fresh snapshot without starting a background thread
+    client = object.__new__(cls)
+    client._ready = threading.Event()
+    client.history = None
+    client.expiry = 600
+    client._swap(GasPriceSnapshot([1, 2, 3, 4], [10, 20, 30, 40], [5, 6, 7, 8]))
+    return client
+
+
+def main():
+    print(f"{'accessor':>15} {'original ns':>12} {'wall clock ns':>14} {'current ns':>11}")
+
+    clients = [ready_client(cls) for cls in (OriginalPOANetwork, WallClockPOANetwork, POANetwork)]
+    for name in ('fast_price', 'fastest_tip'):
+        results = []
+        for client in clients:
+            timer = timeit.Timer(getattr(client, name))
+            loops, _ = timer.autorange()
+            results.append(min(timer.repeat(repeat=5, number=loops)) / loops)
+
+        print(f"{name:>15} {results[0] * 1e9:>12.1f} {results[1] * 1e9:>14.1f} {results[2] * 1e9:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cost of re-aggregating all 12 series after a provider refresh, series by series versus in one batch.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch_aggregation [--providers 5 50 500]
+
+Every iteration updates the row of one provider and aggregates all series again, which is
+what the aggregator does whenever one of its component clients refreshes.
+"""
+
+import argparse
+import random
+import timeit
+
+from pygasprice_client import batch
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.batch import PriceMatrix
+from pygasprice_client.snapshot import SERIES
+
+GWEI = 1000000000
+
+
+def simulated_rows(providers: int) -> list:
+    generator = random.Random(providers)
+    return [[generator.choice([None, generator.randint(1, 500) * GWEI]) for _ in SERIES] for _ in range(providers)]
+
+
+def per_series(rows: list) -> list:
+    # what `Aggregator._fetch_price` used to do: one filter/map chain and `aggregate()` per series
+    return [Aggregator.aggregate(list(filter(lambda p: p, map(lambda values: values[index], rows))))
+            for index in range(len(SERIES))]
+
+
+def batched(rows: list, use_numpy: bool):
+    matrix = PriceMatrix(len(rows), use_numpy=use_numpy)
+    for index, row in enumerate(rows):
+        matrix.set_row(index, row)
+
+    def refresh(rows: list) -> list:
+        matrix.set_row(0, rows[0])
+        return matrix.aggregate()
+
+    return refresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--providers", type=int, nargs="+", default=[5, 50, 500])
+    arguments = parser.parse_args()
+
+    if not batch.NUMPY_INSTALLED:
+        print("NumPy is not installed, skipping the vectorized implementation")
+
+    print(f"{'providers':>10} {'implementation':>20} {'us/refresh':>12}")
+    for providers in arguments.providers:
+        rows = simulated_rows(providers)
+
+        implementations = [("per series", per_series), ("batch, pure Python", batched(rows, use_numpy=False))]
+        if batch.NUMPY_INSTALLED:
+            implementations.append(("batch, NumPy", batched(rows, use_numpy=True)))
+        assert all(implementation(rows) == per_series(rows) for _, implementation in implementations)
+
+        for name, implementation in implementations:
+            timer = timeit.Timer(lambda: implementation(rows))
+            loops, _ = timer.autorange()
+            best = min(timer.repeat(repeat=5, number=loops)) / loops
+            print(f"{providers:>10} {name:>20} {best * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
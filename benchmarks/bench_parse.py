@@ -0,0 +1,82 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cost of decoding and parsing recorded provider responses.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parse
+
+Compares what `_fetch_price` used to do (`Response.json()`, which decodes the body to text
+first, and float based scaling) with the current path (bytes decoded by the fastest JSON
+backend installed, exact `to_wei` scaling).
+"""
+
+import json
+import timeit
+
+import pygasprice_client
+from benchmarks.payloads import PAYLOADS
+from pygasprice_client import parsing
+from pygasprice_client.snapshot import GasPriceSnapshot
+
+
+def legacy_parse(name: str, body: bytes) -> GasPriceSnapshot:
+    # the pre-`to_wei` parsers, fed by `Response.json()`
+    values = legacy_values(name, json.loads(body.decode('utf-8')))
+    return GasPriceSnapshot(values[0:4], values[4:8], values[8:12])
+
+
+def legacy_values(name: str, data: dict) -> list:
+    if name == 'EtherchainOrg':
+        return [int(float(data[key]) * 10 ** 9) for key in ('safeLow', 'standard', 'fast', 'fastest')]
+    if name == 'POANetwork':
+        return [int(data[key] * 10 ** 9) for key in ('slow', 'standard', 'fast', 'instant')]
+    if name == 'EthGasStation':
+        return [int(data[key] * 10 ** 8) for key in ('safeLow', 'average', 'fast', 'fastest')]
+    if name == 'Etherscan':
+        result = data['result']
+        return [int(result[key]) * 10 ** 9 for key in ('SafeGasPrice', 'ProposeGasPrice', 'FastGasPrice', 'FastGasPrice')]
+    if name == 'Blocknative':
+        prices = data['blockPrices'][0]['estimatedPrices']
+        return [int(prices[tier][key]) * 10 ** 9 for key in ('price', 'maxFeePerGas', 'maxPriorityFeePerGas')
+                for tier in (3, 2, 1, 0)]
+
+
+def current_parse(name: str):
+    # parsers are used without starting a client
+    client = object.__new__(getattr(pygasprice_client, name))
+    return lambda body: client._parse_api_data(parsing.loads(body))
+
+
+def main():
+    print(f"JSON backend: {parsing.BACKEND}")
+    print(f"{'provider':>15} {'legacy us':>10} {'current us':>11}")
+
+    for name, body in PAYLOADS.items():
+        parse = current_parse(name)
+        results = []
+        for function in (lambda: legacy_parse(name, body), lambda: parse(body)):
+            timer = timeit.Timer(function)
+            loops, _ = timer.autorange()
+            results.append(min(timer.repeat(repeat=5, number=loops)) / loops)
+
+        print(f"{name:>15} {results[0] * 1e6:>10.2f} {results[1] * 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
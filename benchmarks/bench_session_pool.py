@@ -0,0 +1,69 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Per-fetch latency of unpooled `requests.get` versus a keep-alive `SessionPool`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_session_pool [--fetches 200] [--handshake-ms 20]
+
+The local stub delays every new connection by `--handshake-ms`, standing in for the
+TCP and TLS handshakes paid on every refresh without connection reuse.
+"""
+
+import argparse
+import time
+
+import requests
+
+from pygasprice_client.session import SessionPool
+from tests.stub import StubServer, POA_PAYLOAD
+
+
+def measure(fetch, url: str, fetches: int) -> float:
+    fetch(url)  # warm up
+
+    started = time.perf_counter()
+    for _ in range(fetches):
+        fetch(url).json()
+    return (time.perf_counter() - started) / fetches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fetches", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=20.0)
+    arguments = parser.parse_args()
+
+    server = StubServer(POA_PAYLOAD, connect_latency=arguments.handshake_ms / 1000)
+    pool = SessionPool()
+    try:
+        unpooled = measure(lambda url: requests.get(url), server.url, arguments.fetches)
+        pooled = measure(pool.get, server.url, arguments.fetches)
+    finally:
+        pool.close()
+        server.close()
+
+    print(f"fetches per run:         {arguments.fetches}")
+    print(f"simulated handshake:     {arguments.handshake_ms:.1f} ms")
+    print(f"requests.get (no reuse): {unpooled * 1000:.3f} ms/fetch")
+    print(f"SessionPool (keep-alive): {pooled * 1000:.3f} ms/fetch")
+    print(f"saved per fetch:         {(unpooled - pooled) * 1000:.3f} ms ({unpooled / pooled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
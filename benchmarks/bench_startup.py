@@ -0,0 +1,71 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Time to import the package and to construct an `Aggregator`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+
+Every case runs in a fresh interpreter, and the fastest of several runs is reported, net of
+the start-up of the interpreter itself. Eager construction starts a thread per provider,
+while a lazy `Aggregator` of the named providers starts nothing until its prices are accessed.
+"""
+
+import subprocess
+import sys
+import time
+import timeit
+
+CASES = [
+    ('interpreter', "pass"),
+    ('import', "import pygasprice_client.aggregator"),
+    ('import + eager Aggregator', "from pygasprice_client.aggregator import Aggregator\n"
+                                  "Aggregator(600, 600)"),
+    ('import + lazy Aggregator', "from pygasprice_client.aggregator import Aggregator\n"
+                                 "Aggregator(600, 600, providers=['Etherscan'], lazy=True)"),
+]
+
+
+def run(code: str, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main(repeat: int = 7):
+    print(f"{'case':>28} {'total ms':>9} {'net ms':>7}")
+
+    interpreter = None
+    for name, code in CASES:
+        elapsed = run(code, repeat)
+        interpreter = elapsed if interpreter is None else interpreter
+        print(f"{name:>28} {elapsed * 1e3:>9.1f} {(elapsed - interpreter) * 1e3:>7.1f}")
+
+    from pygasprice_client.aggregator import Aggregator
+    timer = timeit.Timer(lambda: Aggregator(600, 600, providers=['Etherscan'], lazy=True))
+    loops, _ = timer.autorange()
+    print(f"lazy construction in process: {min(timer.repeat(repeat=5, number=loops)) / loops * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
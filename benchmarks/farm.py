@@ -0,0 +1,119 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Local mock provider farm: one stub HTTP server per provider, serving recorded payloads."""
+
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pygasprice_client
+from benchmarks.payloads import PAYLOADS
+from tests.stub import _ThreadingHTTPServer
+
+PROVIDERS = ('EtherchainOrg', 'POANetwork', 'EthGasStation', 'Etherscan', 'Blocknative')
+
+
+class FarmServer:
+    """Serves the recorded payload of one provider to every GET.
+
+    Every response is delayed by `latency` plus a uniformly distributed `jitter` (in seconds),
+    and answered with HTTP 500 with probability `failure_rate`.
+    """
+
+    def __init__(self, payload: bytes, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 seed: int = 0):
+        self.payload = payload
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.threads = set()
+
+        random_generator = random.Random(seed)
+        lock = threading.Lock()
+        farm_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with lock:
+                    farm_server.requests += 1
+                    farm_server.threads.add(threading.current_thread())
+                    delay = farm_server.latency + random_generator.uniform(0, farm_server.jitter)
+                    failed = random_generator.random() < farm_server.failure_rate
+
+                if delay > 0:
+                    time.sleep(delay)
+
+                body = b'{"error":"simulated failure"}' if failed else farm_server.payload
+                self.send_response(500 if failed else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ProviderFarm:
+    """Starts a `FarmServer` for every provider and creates clients fetching from them."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.servers = {name: FarmServer(PAYLOADS[name], latency, jitter, failure_rate, seed + index)
+                        for index, name in enumerate(PROVIDERS)}
+
+    def client_class(self, name: str) -> type:
+        """Returns a subclass of provider `name` fetching from the farm instead of the live API."""
+        provider = getattr(pygasprice_client, name)
+        return type(name, (provider,), {'URL': self.servers[name].url})
+
+    def client(self, name: str, refresh_interval: int = 600, expiry: int = 600, **kwargs):
+        if name == 'Blocknative':
+            kwargs.setdefault('api_key', 'farm')
+        return self.client_class(name)(refresh_interval, expiry, **kwargs)
+
+    def clients(self, **kwargs) -> list:
+        return [self.client(name, **kwargs) for name in PROVIDERS]
+
+    @property
+    def requests(self) -> int:
+        return sum(server.requests for server in self.servers.values())
+
+    @property
+    def threads(self) -> set:
+        """Threads which served requests, to tell them from the threads of clients."""
+        return set().union(*(server.threads for server in self.servers.values()))
+
+    def close(self):
+        for server in self.servers.values():
+            server.close()
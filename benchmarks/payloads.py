@@ -0,0 +1,48 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Response bodies recorded from the supported providers, keyed by client class name."""
+
+PAYLOADS = {
+    'EtherchainOrg': b'{"safeLow":"31.1","standard":"33.3","fast":"36.6","fastest":"41.1","currentBaseFee":29.8,'
+                     b'"recommendedBaseFee":61.7}',
+
+    'POANetwork': b'{"health":true,"block_number":13402167,"block_time":13.179,"slow":30.7,"standard":33.3,'
+                  b'"fast":38.01,"instant":44.523,"timestamp":"2021-10-12T12:31:05.279Z"}',
+
+    'EthGasStation': b'{"fast":420.0,"fastest":480.0,"safeLow":330.0,"average":350.0,"block_time":13.77,'
+                     b'"blockNum":13402167,"speed":0.9980,"safeLowWait":17.3,"avgWait":3.2,"fastWait":0.5,'
+                     b'"fastestWait":0.5,"gasPriceRange":{"4":241.9,"6":241.9,"8":241.9,"10":241.9,"20":241.9,'
+                     b'"30":241.9,"40":241.9,"50":241.9,"60":241.9,"70":241.9,"80":241.9,"90":241.9,"100":241.9,'
+                     b'"110":241.9,"120":241.9,"130":241.9,"140":241.9,"150":241.9,"160":241.9,"170":241.9,'
+                     b'"180":241.9,"190":241.9,"200":241.9,"220":241.9,"240":241.9,"260":140.8,"280":28.6,'
+                     b'"300":19.8,"320":17.3,"340":8.9,"360":3.2,"380":2.1,"400":0.9,"420":0.5,"440":0.5,'
+                     b'"460":0.5,"480":0.5}}',
+
+    'Etherscan': b'{"status":"1","message":"OK","result":{"LastBlock":"13402167","SafeGasPrice":"31",'
+                 b'"ProposeGasPrice":"33","FastGasPrice":"38","suggestBaseFee":"30.093218461",'
+                 b'"gasUsedRatio":"0.99,0.44,0.71,0.12,1"}}',
+
+    'Blocknative': b'{"system":"ethereum","network":"main","unit":"gwei","maxPrice":64,"currentBlockNumber":13402166,'
+                   b'"msSinceLastBlock":3204,"blockPrices":[{"blockNumber":13402167,"estimatedTransactionCount":171,'
+                   b'"baseFeePerGas":30.093218461,"estimatedPrices":['
+                   b'{"confidence":99,"price":33,"maxPriorityFeePerGas":2.5,"maxFeePerGas":62.69},'
+                   b'{"confidence":95,"price":32,"maxPriorityFeePerGas":1.83,"maxFeePerGas":62.02},'
+                   b'{"confidence":90,"price":31,"maxPriorityFeePerGas":1.5,"maxFeePerGas":61.69},'
+                   b'{"confidence":80,"price":31,"maxPriorityFeePerGas":1.17,"maxFeePerGas":61.36},'
+                   b'{"confidence":70,"price":31,"maxPriorityFeePerGas":1.06,"maxFeePerGas":61.25}]}]}',
+}
@@ -0,0 +1,194 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark and load-test suite running all clients against a local mock provider farm.
+
+Run from the repository root:
+
+    python -m benchmarks.run [--latency-ms 20] [--jitter-ms 10] [--failure-rate 0.05]
+                             [--output results.json] [--compare baseline.json]
+
+Measures fetch throughput, accessor latency, aggregation cost, thread and memory footprint
+and time to first price, prints them and writes them as JSON. With `--compare`, every result
+is shown next to the one of an earlier run.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import threading
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.farm import PROVIDERS, ProviderFarm
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.engine import AsyncEngine
+from tests.stub import NoEngine
+
+
+def best_per_call(function, repeat: int = 5) -> float:
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=loops)) / loops
+
+
+def fetch_throughput(farm: ProviderFarm, duration: float) -> dict:
+    results = {}
+    for name in PROVIDERS:
+        client = farm.client(name, engine=NoEngine())
+        fetches = 0
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            client._fetch_price()
+            fetches += 1
+        results[f"fetch_throughput.{name}.per_s"] = fetches / duration
+
+    clients = farm.clients(engine=NoEngine())
+    before = farm.requests
+    deadline = time.perf_counter() + duration
+
+    def fetch_until_deadline(client):
+        while time.perf_counter() < deadline:
+            client._fetch_price()
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        list(executor.map(fetch_until_deadline, clients))
+    results["fetch_throughput.all_concurrent.per_s"] = (farm.requests - before) / duration
+
+    return results
+
+
+def accessor_latency(farm: ProviderFarm) -> dict:
+    client = farm.client('Blocknative', engine=NoEngine())
+    client._fetch_price()
+    assert client.fast_price() is not None
+
+    return {"accessor_latency.fast_price.ns": best_per_call(client.fast_price) * 1e9,
+            "accessor_latency.snapshot.ns": best_per_call(client.snapshot) * 1e9}
+
+
+def aggregation_cost(farm: ProviderFarm) -> dict:
+    clients = farm.clients(engine=NoEngine())
+    for client in clients:
+        client._fetch_price()
+
+    aggregator = Aggregator(600, 600, clients=clients, engine=NoEngine())
+    aggregator._fetch_price()
+    assert aggregator.fast_price() is not None
+
+    return {"aggregation.all_providers.us": best_per_call(aggregator._fetch_price) * 1e6,
+            "aggregation.one_provider.us": best_per_call(lambda: aggregator._update(clients[:1])) * 1e6,
+            "accessor_latency.aggregator_fast_price.ns": best_per_call(aggregator.fast_price) * 1e9}
+
+
+def footprint(farm: ProviderFarm, clients: int) -> dict:
+    results = {}
+    for mode in ("threads", "engine"):
+        engine = AsyncEngine() if mode == "engine" else None
+        threads = set(threading.enumerate())
+        tracemalloc.start()
+        started = tracemalloc.get_traced_memory()[0]
+
+        created = [farm.client(PROVIDERS[index % len(PROVIDERS)], engine=engine) for index in range(clients)]
+        for client in created:
+            client.wait_ready(10)
+
+        started_threads = set(threading.enumerate()) - threads - farm.threads
+        results[f"footprint.{mode}.threads_per_client"] = len(started_threads) / clients
+        results[f"footprint.{mode}.kib_per_client"] = (tracemalloc.get_traced_memory()[0] - started) / 1024 / clients
+        tracemalloc.stop()
+
+        if engine is not None:
+            engine.stop()
+
+    return results
+
+
+def time_to_first_price(farm: ProviderFarm) -> dict:
+    started = time.perf_counter()
+    client = farm.client('POANetwork')
+    assert client.wait_ready(10)
+    results = {"time_to_first_price.client.ms": (time.perf_counter() - started) * 1000}
+
+    started = time.perf_counter()
+    clients = farm.clients(engine=NoEngine())
+    aggregator = Aggregator(600, 600, clients=clients, engine=NoEngine())
+    for client in clients:
+        threading.Thread(target=client._fetch_price, daemon=True).start()
+    assert aggregator.wait_ready(10)
+    results["time_to_first_price.aggregator.ms"] = (time.perf_counter() - started) * 1000
+    assert aggregator.wait_ready(10, quorum=len(clients))
+    results["time_to_first_price.aggregator_all_providers.ms"] = (time.perf_counter() - started) * 1000
+
+    return results
+
+
+def metadata(arguments: argparse.Namespace) -> dict:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {"timestamp": time.time(), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "latency_ms": arguments.latency_ms, "jitter_ms": arguments.jitter_ms,
+            "failure_rate": arguments.failure_rate, "clients": arguments.clients}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=1.0, help="Duration of throughput runs (in seconds)")
+    parser.add_argument("--clients", type=int, default=50, help="Clients created to measure the footprint")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", default=None, help="Results of an earlier run to compare with")
+    arguments = parser.parse_args()
+
+    farm = ProviderFarm(arguments.latency_ms / 1000, arguments.jitter_ms / 1000, arguments.failure_rate)
+    try:
+        results = {}
+        results.update(fetch_throughput(farm, arguments.duration))
+        results.update(accessor_latency(farm))
+        results.update(aggregation_cost(farm))
+        results.update(time_to_first_price(farm))
+        results.update(footprint(farm, arguments.clients))
+    finally:
+        farm.close()
+
+    with open(arguments.output, "w") as file:
+        json.dump({"metadata": metadata(arguments), "results": results}, file, indent=2, sort_keys=True)
+
+    baseline = {}
+    if arguments.compare is not None:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)["results"]
+
+    for name, value in sorted(results.items()):
+        line = f"{name:<50} {value:>12.2f}"
+        if baseline.get(name):
+            line += f" {baseline[name]:>12.2f} {(value / baseline[name] - 1) * 100:>+8.1f}%"
+        print(line)
+
+    print(f"Results written to {arguments.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,17 +16,45 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import re
 import threading
 import time
-from typing import Optional
-
-import requests
+from collections import deque
+from typing import Callable, Optional
+
+from pygasprice_client.breaker import CircuitBreaker
+from pygasprice_client.cache import SnapshotCache
+from pygasprice_client.curve import PriceCurve, tier_points
+from pygasprice_client.history import GasPriceHistory
+from pygasprice_client.metrics import ClientMetrics, default_metrics
+from pygasprice_client.parsing import loads, to_wei
+from pygasprice_client.recording import FeedRecorder
+from pygasprice_client.scheduler import AdaptiveSchedule, retry_after
+from pygasprice_client.session import SessionPool, answered_by, default_session_pool
+from pygasprice_client.snapshot import GasPriceSnapshot, EMPTY_SNAPSHOT, GAS_PRICE, MAX_FEE, MAX_TIP, \
+    NANOSECONDS, monotonic_ns
 
 SAFELOW = 0
 STANDARD = 1
 FAST = 2
 FASTEST = 3
 
+_API_KEY_PARAMETER = re.compile(r'([?&](?:api[-_]?key|key)=)[^&#\s\'"]*', re.IGNORECASE)
+_USERINFO = re.compile(r'(\b[a-z][a-z0-9+.-]*://)[^/?#@\s]+@', re.IGNORECASE)
+
+
+class RateLimitedError(Exception):
+    """Raised when a provider answers with HTTP 429, asking to wait `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def redact_url(url: str) -> str:
+    """Returns `url` with API key query parameters and user credentials masked, so that it can be logged."""
+    return _USERINFO.sub(r'\1***@', _API_KEY_PARAMETER.sub(r'\1***', url))
+
 
 class GasClientApi:
     """Asynchronous client for several gas price APIs.
@@ -38,149 +66,572 @@ class GasClientApi:
     the feed becomes available again.
 
     Also the moment before the first fetch has finished, all `*_price()` methods
-    of this class return `None`.
+    of this class return `None`. Use `wait_ready()` (or `await ready()`) to block until
+    the first fetch has finished instead of sleeping.
+
+    If an `engine` is passed, no background thread is created. The client registers
+    with the `AsyncEngine` instead, which refreshes it together with all other clients
+    sharing that engine.
+
+    Callbacks registered with `add_listener()` are invoked after every successful refresh,
+    so dependent clients like `Aggregator` can react to new data without polling.
+
+    Every refresh is published as one immutable `GasPriceSnapshot`, so values read through
+    `snapshot()` always come from the same fetch. The last `history_size` snapshots are
+    kept in `history`, a `GasPriceHistory` answering rolling percentile, EMA and
+    volatility queries.
+
+    HTTP requests are sent through a `SessionPool`, which keeps connections to every
+    host alive between refreshes. Unless a `session_pool` is passed, all clients share
+    the process-wide default pool.
+
+    With an `AdaptiveSchedule`, the refresh interval starts at `refresh_interval` and then
+    follows price volatility. Either way refreshes are never more frequent than the
+    `MIN_INTERVAL` of the provider, and `Retry-After` of HTTP 429 responses is honoured.
+
+    Failing requests are counted by a per-client `CircuitBreaker`. Once it opens, the provider
+    is left alone until its jittered, exponentially growing backoff delay has passed, and
+    `Aggregator` ignores the client meanwhile. Pass `breaker_factory` (e.g.
+    `functools.partial(CircuitBreaker, failure_threshold=5)`) to tune it.
+
+    HTTP latency, parse time, successes, failures and expiries are recorded in `metrics`,
+    by default the process-wide `ClientMetrics`. API keys never appear in log lines.
+
+    With a `SnapshotCache`, every refresh is also written to disk, and a new client starts
+    with the cached snapshot if it is younger than `expiry`, so it serves prices immediately
+    after a restart while the first live fetch is still running.
+
+    With a `FeedRecorder`, every raw response is appended to a log which can be replayed offline.
+
+    Providers reachable at several endpoints can be given the full URLs of `mirrors`, which are
+    requested as hedges: if the primary URL has not answered successfully within the 95th
+    percentile of its recent response times (`hedge_delay()`), or has failed, the next mirror is
+    requested too, and the first successful response is used. Only responses of the primary URL
+    count, as hedged calls would drag the delay up towards the latency of a slow primary.
+
+    Refreshing starts when the client is created, or with `lazy=True` when prices are first
+    accessed (or waited for) or `start()` is called. `stop()` stops refreshing, and clients can be
+    used as context managers starting and stopping them.
+
+    Besides the four tiers, `price_within()`, `maxfee_within()` and `tip_within()` return the price
+    to be included within a number of blocks with a given confidence, from a `PriceCurve`
+    interpolated through the tiers of the current refresh, each of which is the price for one of
+    the `TIER_TARGETS`.
 
     All gas prices are returned in Wei.
 
     Attributes:
         refresh_interval: Refresh frequency (in seconds).
         expiry: Expiration time (in seconds).
+        engine: Optional `AsyncEngine` scheduling the refreshes of this client.
+        session_pool: `SessionPool` used to send HTTP requests.
+        history: `GasPriceHistory` of recent snapshots, or `None` if `history_size` is 0.
+        schedule: Optional `AdaptiveSchedule` adapting the refresh interval.
+        breaker: `CircuitBreaker` of this client, whose `state` can be monitored.
+        metrics: `ClientMetrics` instrumenting this client, or `None`.
+        cache: Optional `SnapshotCache` persisting the latest snapshot.
+        recorder: Optional `FeedRecorder` logging every raw response.
+        mirrors: URLs requested as hedges if the primary URL is slow or fails.
     """
 
     logger = logging.getLogger()
 
-    def __init__(self, url: str, refresh_interval: int, expiry: int, headers=None):
+    # shortest interval between requests allowed by the provider (in seconds)
+    MIN_INTERVAL = 0
+
+    # delay before hedging requests to mirrors until enough fetch durations are known (in seconds)
+    HEDGE_DELAY = 1.0
+
+    # (blocks, confidence) of being included at the price of the safe low, standard, fast and fastest
+    # tiers, by default the waiting times of < 30 minutes, < 5 minutes, < 2 minutes and < 30 seconds
+    # commonly promised by providers, in 12 second blocks
+    TIER_TARGETS = ((150, 0.9), (25, 0.9), (10, 0.9), (2, 0.9))
+
+    # price curve of the current snapshot, interpolated on first use
+    _curve = None
+
+    # replaced by each refresh with a single reference swap
+    _snapshot = EMPTY_SNAPSHOT
+    _reported_unavailable = False
+
+    # `monotonic_ns()` at which `_snapshot` expires, set by every refresh so accessors need no wall clock
+    _valid_until = float('-inf')
+    _expiry = 0
+
+    # exponentially smoothed duration of successful fetches (in seconds), `None` until the first one
+    latency = None
+    _latencies = None
+    mirrors = ()
+
+    # whether refreshing starts on first access, until it has been started
+    _pending_start = False
+    _stopped = None
+
+    breaker = None
+    metrics = None
+    cache = None
+    recorder = None
+
+    # whether the current snapshot has been loaded from `cache` rather than fetched
+    _restored = False
+
+    def __init__(self, url: str, refresh_interval: int, expiry: int, headers=None, engine=None,
+                 session_pool: Optional[SessionPool] = None, history_size: int = 256,
+                 schedule: Optional[AdaptiveSchedule] = None,
+                 breaker_factory: Optional[Callable[[], CircuitBreaker]] = None,
+                 metrics: Optional[ClientMetrics] = None, cache: Optional[SnapshotCache] = None,
+                 recorder: Optional[FeedRecorder] = None, mirrors: Optional[list] = None, lazy: bool = False):
         assert(isinstance(url, str))
         assert(isinstance(refresh_interval, int))
         assert(isinstance(expiry, int))
+        assert(isinstance(session_pool, SessionPool) or session_pool is None)
+        assert(isinstance(history_size, int))
+        assert(isinstance(schedule, AdaptiveSchedule) or schedule is None)
+        assert(callable(breaker_factory) or breaker_factory is None)
+        assert(isinstance(metrics, ClientMetrics) or metrics is None)
+        assert(isinstance(cache, SnapshotCache) or cache is None)
+        assert(isinstance(recorder, FeedRecorder) or recorder is None)
+        assert(isinstance(mirrors, list) or mirrors is None)
+        assert(isinstance(lazy, bool))
 
         self.URL = url
 
         self.refresh_interval = refresh_interval
         self.expiry = expiry
         self.headers = headers
-
-        # indexed 0 (safe low) to 3 (fastest)
-        self._gas_prices = []
-        self._max_fees = []
-        self._max_tips = []
-
-        self._last_refresh = 0
+        self.engine = engine
+        self.session_pool = session_pool if session_pool is not None else default_session_pool()
+        self.history = GasPriceHistory(history_size) if history_size > 0 else None
+        self.schedule = schedule
+        self.breaker = breaker_factory() if breaker_factory is not None else CircuitBreaker()
+        self.metrics = metrics if metrics is not None else default_metrics()
+        self.metrics.track(self)
+
+        self.mirrors = list(mirrors or [])
+        self._latencies = deque(maxlen=100)
+
+        self._interval = float(refresh_interval)
+        self._retry_at = 0.0
         self._expired = True
-        threading.Thread(target=self._background_run, daemon=True).start()
-        
-        # logger_url - to avoid potential api-key values being present in logs.
-        pattern          = '?api-key'
-        self.logger_url  = ''
+        self._listeners = []
+        self._ready = threading.Event()
 
-        if pattern in self.URL:
-            self.logger_url = self.URL.split(pattern, 1)[0]
+        # logger_url - to avoid potential api-key values being present in logs.
+        self.logger_url = self._redacted_url()
+
+        self.recorder = recorder
+        self.cache = cache
+        if cache is not None:
+            self._restore()
+
+        self._stopped = None
+        self._start_lock = threading.Lock()
+        self._pending_start = lazy
+        if not lazy:
+            self.start()
+
+    def start(self):
+        """Starts refreshing prices, unless already started."""
+        with self._start_lock:
+            self._pending_start = False
+            if self._stopped is not None:
+                return
+            self._stopped = threading.Event()
+
+        if self.engine is not None:
+            self.engine.register(self)
         else:
-            self.logger_url = self.URL
+            threading.Thread(target=self._background_run, daemon=True).start()
+
+    def stop(self):
+        """Stops refreshing prices. Prices already fetched remain available until they expire."""
+        if self._stopped is None and not self._pending_start:
+            return
+
+        with self._start_lock:
+            self._pending_start = False
+            stopped, self._stopped = self._stopped, None
+
+        if stopped is None:
+            return
+        stopped.set()
+        if self.engine is not None:
+            self.engine.unregister(self)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
 
     def _background_run(self):
-        while True:
+        stopped = self._stopped
+        while stopped is not None and not stopped.is_set():
             self._fetch_price()
-            time.sleep(self.refresh_interval)
+            stopped.wait(self._next_refresh_delay())
+
+    def _next_refresh_delay(self) -> float:
+        """Returns the time to wait before the next refresh (in seconds)."""
+        delay = self._interval if self.schedule is not None else self.refresh_interval
+        backoff = self.breaker.retry_in() if self.breaker is not None else 0.0
+        return max(delay, self.MIN_INTERVAL, self._retry_at - time.time(), backoff)
+
+    def add_listener(self, callback: Callable[['GasClientApi'], None]):
+        """Registers `callback`, which gets called with this client after every successful refresh.
+
+        Callbacks run on the thread which performed the refresh, so they should return quickly.
+        """
+        assert callable(callback)
+        self._listeners = self._listeners + [callback]
+
+    def remove_listener(self, callback: Callable[['GasClientApi'], None]):
+        self._listeners = [listener for listener in self._listeners if listener != callback]
+
+    def _notify_listeners(self):
+        for listener in self._listeners:
+            try:
+                listener(self)
+            except Exception:
+                self.logger.exception(f"Gas price listener of {self.logger_url} failed")
 
     def _fetch_price(self):
+        if self.breaker is not None and not self.breaker.allow():
+            return
+
         try:
-            data = requests.get(self.URL, headers=self.headers).json()
+            started, started_ns = time.perf_counter(), monotonic_ns()
+            data = self._fetch_data()
+            fetched, fetched_ns = time.perf_counter(), monotonic_ns()
+            snapshot = self._parse_api_data(data).with_fetch_times(started_ns, fetched_ns)
+            parsed = time.perf_counter()
 
-            self._parse_api_data(data)
-            self._last_refresh = int(time.time())
+            self._record_latency(fetched - started)
+            if self.metrics is not None:
+                self.metrics.fetch_succeeded(self, fetched - started, parsed - fetched)
+
+            previous = self._snapshot
+            self._publish(snapshot)
+
+            if self.schedule is not None:
+                self._interval = self.schedule.next_interval(
+                    self._interval, previous if previous is not EMPTY_SNAPSHOT else None, self._snapshot)
 
             self.logger.debug(f"Fetched current gas prices from {self.logger_url}: {data}")
 
             if self._expired:
                 self.logger.info(f"Current gas prices from {self.logger_url} became available")
                 self._expired = False
-        except:
-            self.logger.warning(f"Failed to fetch current gas prices from {self.URL}")
+        except RateLimitedError as e:
+            self._retry_at = time.time() + e.retry_after
+            self.logger.warning(f"Gas price requests to {self.logger_url} are rate limited,"
+                                f" retrying in {e.retry_after}s")
+        except Exception:
+            self.logger.warning(f"Failed to fetch current gas prices from {self.logger_url}")
+            if self.metrics is not None:
+                self.metrics.fetch_failed(self)
+            if self.breaker is not None and self.breaker.record_failure():
+                self.logger.warning(f"Gas price requests to {self.logger_url} are suspended for"
+                                    f" {self.breaker.retry_in():.1f}s after {self.breaker.failures} failures")
+        else:
+            if self.breaker is not None:
+                self.breaker.record_success()
+            self._notify_listeners()
+
+    def _fetch_data(self):
+        """Requests and decodes the current data of the provider, passed to `_parse_api_data()`."""
+        if self.mirrors:
+            response = self.session_pool.hedged_get([self.URL] + self.mirrors, headers=self.headers,
+                                                    delay=self.hedge_delay())
+            # the response time of a mirror says nothing about how long to wait for the primary
+            if answered_by(response, self.URL):
+                self._latencies.append(response.elapsed.total_seconds())
+        else:
+            response = self.session_pool.get(self.URL, headers=self.headers)
+        self._raise_for_status(response)
+
+        if self.recorder is not None:
+            self.recorder.record(self, response.content, response.elapsed.total_seconds())
+        return loads(response.content)
+
+    def _redacted_url(self) -> str:
+        """Returns the URL of the provider as it may appear in logs and metric labels."""
+        return redact_url(self.URL)
+
+    def _raise_for_status(self, response):
+        if response.status_code == 429:
+            raise RateLimitedError(retry_after(response.headers.get('Retry-After'), default=self.refresh_interval))
+        response.raise_for_status()
+
+    def _record_latency(self, elapsed: float):
+        self.latency = elapsed if self.latency is None else self.latency + 0.2 * (elapsed - self.latency)
+        # with mirrors, `_fetch_data()` records the response times of the primary URL instead
+        if self._latencies is not None and not self.mirrors:
+            self._latencies.append(elapsed)
+
+    def hedge_delay(self) -> float:
+        """Returns how long to wait for a response before requesting the next mirror (in seconds)."""
+        latencies = sorted(self._latencies or ())
+        if len(latencies) < 20:
+            return self.HEDGE_DELAY
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _publish(self, snapshot: GasPriceSnapshot):
+        self._swap(snapshot)
+        self._restored = False
+
+        if self.cache is not None:
+            self.cache.store(SnapshotCache.key_for(self), snapshot)
+
+    def _swap(self, snapshot: GasPriceSnapshot):
+        previous = self._snapshot
+
+        # readers check the deadline before reading the snapshot, so it is replaced last
+        self._snapshot = snapshot
+        self._valid_until = self._deadline(snapshot)
+        self._ready.set()
+
+        if self.history is not None and self._is_history(snapshot, previous):
+            self.history.append(snapshot)
+
+    def _is_history(self, snapshot: GasPriceSnapshot, previous: GasPriceSnapshot) -> bool:
+        """Whether `snapshot`, replacing `previous`, is recorded in the history."""
+        return True
+
+    def _restore(self):
+        snapshot = self.cache.load(SnapshotCache.key_for(self))
+        if snapshot is None or snapshot.age > self.expiry:
+            return
+
+        self._swap(snapshot)
+        self._restored = True
+        self._expired = False
+        self.logger.info(f"Restored cached gas prices from {self.logger_url},"
+                         f" fetched {snapshot.age:.0f}s ago")
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the first fetch of this client has finished.
+
+        Args:
+            timeout: Maximum time to wait (in seconds), or `None` to wait indefinitely.
+
+        Returns:
+            `True` if data has been fetched, `False` if `timeout` elapsed first.
+        """
+        if self._pending_start:
+            self.start()
+        return self._ready.wait(timeout)
 
-    def _return_value_if_valid(self, array: list, index: int) -> Optional[int]:
-        assert isinstance(array, list)
-        assert isinstance(index, int)
+    async def ready(self, timeout: Optional[float] = None, **kwargs) -> bool:
+        """Waits without blocking the event loop until `wait_ready(**kwargs)` would return `True`.
 
-        if int(time.time()) - self._last_refresh <= self.expiry and len(array) > index:
-            return array[index]
+        Returns:
+            `True` if data has been fetched, `False` if `timeout` elapsed first.
+        """
+        if self.wait_ready(0, **kwargs):
+            return True
 
-        else:
-            if self._last_refresh == 0:
-                self.logger.warning(f"Current gas prices from {self.logger_url} are unavailable")
-                self._last_refresh = 1
+        import asyncio
 
-            if not self._expired:
-                self.logger.warning(f"Current gas prices from {self.logger_url} have expired")
-                self._expired = True
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
 
-            return None
+        def resolve():
+            if not future.done():
+                future.set_result(True)
 
-    def _parse_api_data(self, data):
+        def on_refresh(client):
+            if self.wait_ready(0, **kwargs):
+                loop.call_soon_threadsafe(resolve)
+
+        self.add_listener(on_refresh)
+        try:
+            # the first fetch may have finished before the listener was registered
+            if self.wait_ready(0, **kwargs):
+                return True
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.remove_listener(on_refresh)
+
+    @property
+    def expiry(self) -> int:
+        return self._expiry
+
+    @expiry.setter
+    def expiry(self, expiry: int):
+        self._expiry = expiry
+        self._valid_until = self._deadline(self._snapshot)
+
+    def _deadline(self, snapshot: GasPriceSnapshot) -> float:
+        if snapshot is EMPTY_SNAPSHOT:
+            return float('-inf')
+        return snapshot.fetch_finished_ns + self._expiry * NANOSECONDS
+
+    def _return_value_if_valid(self, index: int, max_age: Optional[float] = None) -> Optional[int]:
+        if max_age is None and monotonic_ns() <= self._valid_until:
+            return self._snapshot.values[index]
+
+        snapshot = self.snapshot(max_age)
+        return snapshot.values[index] if snapshot is not None else None
+
+    def _parse_api_data(self, data) -> GasPriceSnapshot:
         raise NotImplementedError
 
-    def safe_low_price(self) -> Optional[int]:
+    def snapshot(self, max_age: Optional[float] = None) -> Optional[GasPriceSnapshot]:
+        """Returns all current gas prices, max fees and tips, as fetched by the same refresh.
+
+        Args:
+            max_age: Maximum age of the prices (in seconds) accepted by this call, if stricter
+                than `expiry`.
+
+        Returns:
+            The current `GasPriceSnapshot`, or `None` if the client price feed has expired,
+            the prices are older than `max_age` or no fetch has finished yet.
+        """
+        snapshot = self._current()
+        if snapshot is None or max_age is None or snapshot.age_ns <= max_age * NANOSECONDS:
+            return snapshot
+        return None
+
+    def _current(self) -> Optional[GasPriceSnapshot]:
+        if monotonic_ns() <= self._valid_until:
+            return self._snapshot
+
+        if self._pending_start:
+            self.start()
+
+        # the snapshot may have been replaced since the deadline was read
+        snapshot = self._snapshot
+        valid_until = self._deadline(snapshot)
+        if monotonic_ns() <= valid_until:
+            self._valid_until = valid_until
+            return snapshot
+
+        if snapshot is EMPTY_SNAPSHOT:
+            if not self._reported_unavailable:
+                self.logger.warning(f"Current gas prices from {self.logger_url} are unavailable")
+                self._reported_unavailable = True
+
+        elif not self._expired:
+            self.logger.warning(f"Current gas prices from {self.logger_url} have expired")
+            self._expired = True
+            if self.metrics is not None:
+                self.metrics.expired(self)
+
+        return None
+
+    def safe_low_price(self, max_age: Optional[float] = None) -> Optional[int]:
         """Returns the current 'SafeLow (<30m)' gas price (in Wei).
 
+        Args:
+            max_age: Maximum age of the price (in seconds) accepted by this call, if stricter than `expiry`.
+
         Returns:
             The current 'SafeLow (<30m)' gas price (in Wei), or `None` if the client price
-            feed has expired.
+            feed has expired or the price is older than `max_age`.
         """
-        return self._return_value_if_valid(self._gas_prices, SAFELOW)
+        return self._return_value_if_valid(GAS_PRICE + SAFELOW, max_age)
 
-    def standard_price(self) -> Optional[int]:
+    def standard_price(self, max_age: Optional[float] = None) -> Optional[int]:
         """Returns the current 'Standard (<5m)' gas price (in Wei).
 
+        Args:
+            max_age: Maximum age of the price (in seconds) accepted by this call, if stricter than `expiry`.
+
         Returns:
             The current 'Standard (<5m)' gas price (in Wei), or `None` if the client price
-            feed has expired.
+            feed has expired or the price is older than `max_age`.
         """
-        return self._return_value_if_valid(self._gas_prices, STANDARD)
+        return self._return_value_if_valid(GAS_PRICE + STANDARD, max_age)
 
-    def fast_price(self) -> Optional[int]:
+    def fast_price(self, max_age: Optional[float] = None) -> Optional[int]:
         """Returns the current 'Fast (<2m)' gas price (in Wei).
 
+        Args:
+            max_age: Maximum age of the price (in seconds) accepted by this call, if stricter than `expiry`.
+
         Returns:
             The current 'Fast (<2m)' gas price (in Wei), or `None` if the client price
-            feed has expired.
+            feed has expired or the price is older than `max_age`.
         """
-        return self._return_value_if_valid(self._gas_prices, FAST)
+        return self._return_value_if_valid(GAS_PRICE + FAST, max_age)
 
-    def fastest_price(self) -> Optional[int]:
+    def fastest_price(self, max_age: Optional[float] = None) -> Optional[int]:
         """Returns the current fastest (undocumented!) gas price (in Wei).
 
+        Args:
+            max_age: Maximum age of the price (in seconds) accepted by this call, if stricter than `expiry`.
+
         Returns:
             The current fastest (undocumented!) gas price (in Wei), or `None` if the client price
-            feed has expired.
+            feed has expired or the price is older than `max_age`.
         """
-        return self._return_value_if_valid(self._gas_prices, FASTEST)
+        return self._return_value_if_valid(GAS_PRICE + FASTEST, max_age)
 
 
     """Recommends a maxFeePerGas value, to limit base fee plus priority fee (tip)"""
-    def safe_low_maxfee(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_fees, SAFELOW)
+    def safe_low_maxfee(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_FEE + SAFELOW, max_age)
 
-    def standard_maxfee(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_fees, STANDARD)
+    def standard_maxfee(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_FEE + STANDARD, max_age)
 
-    def fast_maxfee(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_fees, FAST)
+    def fast_maxfee(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_FEE + FAST, max_age)
 
-    def fastest_maxfee(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_fees, FASTEST)
+    def fastest_maxfee(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_FEE + FASTEST, max_age)
 
     """Recommends a maxPriorityFeePerGas value, which is awarded to the miner"""
-    def safe_low_tip(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_tips, SAFELOW)
+    def safe_low_tip(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_TIP + SAFELOW, max_age)
+
+    def standard_tip(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_TIP + STANDARD, max_age)
+
+    def fast_tip(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_TIP + FAST, max_age)
+
+    def fastest_tip(self, max_age: Optional[float] = None) -> Optional[int]:
+        return self._return_value_if_valid(MAX_TIP + FASTEST, max_age)
+
+    def price_curve(self, max_age: Optional[float] = None) -> Optional[PriceCurve]:
+        """Returns the price curve of the current snapshot, or `None` if there is no valid one.
+
+        The curve is interpolated once per refresh, by the first call after it.
+        """
+        snapshot = self.snapshot(max_age)
+        if snapshot is None:
+            return None
+
+        curve = self._curve
+        if curve is None or curve.snapshot is not snapshot:
+            curve = self._curve = self._build_curve(snapshot)
+        return curve
 
-    def standard_tip(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_tips, STANDARD)
+    def _build_curve(self, snapshot: GasPriceSnapshot) -> PriceCurve:
+        return PriceCurve.from_points(snapshot, self._curve_points(snapshot))
 
-    def fast_tip(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_tips, FAST)
+    def _curve_points(self, snapshot: GasPriceSnapshot) -> list:
+        """Returns `(blocks, confidence, (gas price, max fee, tip))` points the price curve passes through."""
+        return tier_points(snapshot, self.TIER_TARGETS)
 
-    def fastest_tip(self) -> Optional[int]:
-        return self._return_value_if_valid(self._max_tips, FASTEST)
+    def price_within(self, blocks: float, confidence: float = 0.9, max_age: Optional[float] = None) -> Optional[int]:
+        """Returns the gas price to be included within `blocks` blocks with probability `confidence`."""
+        curve = self.price_curve(max_age)
+        return curve.gas_price(blocks, confidence) if curve is not None else None
+
+    def maxfee_within(self, blocks: float, confidence: float = 0.9, max_age: Optional[float] = None) -> Optional[int]:
+        """Returns the max fee to be included within `blocks` blocks with probability `confidence`."""
+        curve = self.price_curve(max_age)
+        return curve.max_fee(blocks, confidence) if curve is not None else None
+
+    def tip_within(self, blocks: float, confidence: float = 0.9, max_age: Optional[float] = None) -> Optional[int]:
+        """Returns the tip to be included within `blocks` blocks with probability `confidence`."""
+        curve = self.price_curve(max_age)
+        return curve.max_tip(blocks, confidence) if curve is not None else None
 
 
 class EtherchainOrg(GasClientApi):
@@ -188,14 +639,20 @@ class EtherchainOrg(GasClientApi):
     URL = "https://www.etherchain.org/api/gasPriceOracle"
     SCALE = 1000000000
 
-    def __init__(self, refresh_interval: int, expiry: int):
-        super().__init__(self.URL, refresh_interval, expiry)
+    def __init__(self, refresh_interval: int, expiry: int, url=None, **kwargs):
+
+        assert(isinstance(url, str) or url is None)
 
-    def _parse_api_data(self, data):
-        self._gas_prices = [int(float(data['safeLow'])*self.SCALE),
-                            int(float(data['standard'])*self.SCALE),
-                            int(float(data['fast'])*self.SCALE),
-                            int(float(data['fastest'])*self.SCALE)]
+        if url is not None:
+            self.URL = url
+
+        super().__init__(self.URL, refresh_interval, expiry, **kwargs)
+
+    def _parse_api_data(self, data) -> GasPriceSnapshot:
+        return GasPriceSnapshot(gas_prices=[to_wei(data['safeLow'], self.SCALE),
+                                            to_wei(data['standard'], self.SCALE),
+                                            to_wei(data['fast'], self.SCALE),
+                                            to_wei(data['fastest'], self.SCALE)])
 
 
 class POANetwork(GasClientApi):
@@ -203,20 +660,21 @@ class POANetwork(GasClientApi):
     URL = "https://gasprice.poa.network"
     SCALE = 1000000000
 
-    def __init__(self, refresh_interval: int, expiry: int, alt_url=None):
+    def __init__(self, refresh_interval: int, expiry: int, alt_url=None, url=None, **kwargs):
 
         assert(isinstance(alt_url, str) or alt_url is None)
+        assert(isinstance(url, str) or url is None)
 
-        if alt_url is not None:
-            self.URL = alt_url
+        if alt_url is not None or url is not None:
+            self.URL = url if url is not None else alt_url
 
-        super().__init__(self.URL, refresh_interval, expiry)
+        super().__init__(self.URL, refresh_interval, expiry, **kwargs)
 
-    def _parse_api_data(self, data):
-        self._gas_prices = [int(data['slow']*self.SCALE),
-                            int(data['standard']*self.SCALE),
-                            int(data['fast']*self.SCALE),
-                            int(data['instant']*self.SCALE)]
+    def _parse_api_data(self, data) -> GasPriceSnapshot:
+        return GasPriceSnapshot(gas_prices=[to_wei(data['slow'], self.SCALE),
+                                            to_wei(data['standard'], self.SCALE),
+                                            to_wei(data['fast'], self.SCALE),
+                                            to_wei(data['instant'], self.SCALE)])
 
 
 class EthGasStation(GasClientApi):
@@ -224,41 +682,52 @@ class EthGasStation(GasClientApi):
     URL = "https://ethgasstation.info/json/ethgasAPI.json"
     SCALE = 100000000
 
-    def __init__(self, refresh_interval: int, expiry: int, api_key=None):
+    def __init__(self, refresh_interval: int, expiry: int, api_key=None, url=None, **kwargs):
 
         assert(isinstance(api_key, str) or api_key is None)
+        assert(isinstance(url, str) or url is None)
+
+        if url is not None:
+            self.URL = url
 
         if api_key is not None:
             self.URL = f"{self.URL}?api-key={api_key}"
 
-        super().__init__(self.URL, refresh_interval, expiry)
+        super().__init__(self.URL, refresh_interval, expiry, **kwargs)
 
-    def _parse_api_data(self, data):
-        self._gas_prices = [int(data['safeLow']*self.SCALE),
-                            int(data['average']*self.SCALE),
-                            int(data['fast']*self.SCALE),
-                            int(data['fastest']*self.SCALE)]
+    def _parse_api_data(self, data) -> GasPriceSnapshot:
+        return GasPriceSnapshot(gas_prices=[to_wei(data['safeLow'], self.SCALE),
+                                            to_wei(data['average'], self.SCALE),
+                                            to_wei(data['fast'], self.SCALE),
+                                            to_wei(data['fastest'], self.SCALE)])
 
 
 class Etherscan(GasClientApi):
 
     URL = "https://api.etherscan.io/api?module=gastracker&action=gasoracle"
     SCALE = 1000000000
+    MIN_INTERVAL = 5    # 1 request per 5 seconds without an API key
 
-    def __init__(self, refresh_interval: int, expiry: int, api_key=None):
+    def __init__(self, refresh_interval: int, expiry: int, api_key=None, url=None, **kwargs):
 
         assert(isinstance(api_key, str) or api_key is None)
+        assert(isinstance(url, str) or url is None)
+
+        if url is not None:
+            self.URL = url
 
         if api_key is not None:
             self.URL = f"{self.URL}&apikey={api_key}"
+            self.MIN_INTERVAL = 0.2
 
-        super().__init__(self.URL, refresh_interval, expiry)
+        super().__init__(self.URL, refresh_interval, expiry, **kwargs)
 
-    def _parse_api_data(self, data):
-        self._gas_prices = [int(data['result']['SafeGasPrice'])*self.SCALE,
-                            int(data['result']['ProposeGasPrice'])*self.SCALE,
-                            int(data['result']['FastGasPrice'])*self.SCALE,
-                            int(data['result']['FastGasPrice'])*self.SCALE]
+    def _parse_api_data(self, data) -> GasPriceSnapshot:
+        result = data['result']
+        return GasPriceSnapshot(gas_prices=[to_wei(result['SafeGasPrice'], self.SCALE),
+                                            to_wei(result['ProposeGasPrice'], self.SCALE),
+                                            to_wei(result['FastGasPrice'], self.SCALE),
+                                            to_wei(result['FastGasPrice'], self.SCALE)])
 
 
 class Blocknative(GasClientApi):
@@ -266,22 +735,47 @@ class Blocknative(GasClientApi):
     URL = "https://api.blocknative.com/gasprices/blockprices"
     SCALE = 1000000000
 
-    def __init__(self, refresh_interval: int, expiry: int, api_key):
+    def __init__(self, refresh_interval: int, expiry: int, api_key, url=None, **kwargs):
         assert isinstance(api_key, str)
+        assert isinstance(url, str) or url is None
+
+        if url is not None:
+            self.URL = url
+
         headers = {"Authorization": api_key}
-        super().__init__(self.URL, refresh_interval, expiry, headers)
+        super().__init__(self.URL, refresh_interval, expiry, headers, **kwargs)
+
+    # tiers are the next block prices at 80%, 90%, 95% and 99% confidence
+    TIER_TARGETS = ((1, 0.8), (1, 0.9), (1, 0.95), (1, 0.99))
+
+    # raw confidence levels of the last response, along with its gas prices, converted when a curve is built
+    _estimated_prices = None
 
-    def _parse_api_data(self, data):
+    def _parse_api_data(self, data) -> GasPriceSnapshot:
         next_block_prices = data['blockPrices'][0]['estimatedPrices']
-        self._gas_prices = [int(next_block_prices[3]['price']) * self.SCALE,
-                            int(next_block_prices[2]['price']) * self.SCALE,
-                            int(next_block_prices[1]['price']) * self.SCALE,
-                            int(next_block_prices[0]['price']) * self.SCALE]
-        self._max_fees = [int(next_block_prices[3]['maxFeePerGas']) * self.SCALE,
-                          int(next_block_prices[2]['maxFeePerGas']) * self.SCALE,
-                          int(next_block_prices[1]['maxFeePerGas']) * self.SCALE,
-                          int(next_block_prices[0]['maxFeePerGas']) * self.SCALE]
-        self._max_tips = [int(next_block_prices[3]['maxPriorityFeePerGas']) * self.SCALE,
-                          int(next_block_prices[2]['maxPriorityFeePerGas']) * self.SCALE,
-                          int(next_block_prices[1]['maxPriorityFeePerGas']) * self.SCALE,
-                          int(next_block_prices[0]['maxPriorityFeePerGas']) * self.SCALE]
+        gas_prices = [to_wei(next_block_prices[3]['price'], self.SCALE),
+                      to_wei(next_block_prices[2]['price'], self.SCALE),
+                      to_wei(next_block_prices[1]['price'], self.SCALE),
+                      to_wei(next_block_prices[0]['price'], self.SCALE)]
+        max_fees = [to_wei(next_block_prices[3]['maxFeePerGas'], self.SCALE),
+                    to_wei(next_block_prices[2]['maxFeePerGas'], self.SCALE),
+                    to_wei(next_block_prices[1]['maxFeePerGas'], self.SCALE),
+                    to_wei(next_block_prices[0]['maxFeePerGas'], self.SCALE)]
+        max_tips = [to_wei(next_block_prices[3]['maxPriorityFeePerGas'], self.SCALE),
+                    to_wei(next_block_prices[2]['maxPriorityFeePerGas'], self.SCALE),
+                    to_wei(next_block_prices[1]['maxPriorityFeePerGas'], self.SCALE),
+                    to_wei(next_block_prices[0]['maxPriorityFeePerGas'], self.SCALE)]
+
+        self._estimated_prices = (tuple(gas_prices), next_block_prices)
+        return GasPriceSnapshot(gas_prices, max_fees, max_tips)
+
+    def _curve_points(self, snapshot: GasPriceSnapshot) -> list:
+        estimated = self._estimated_prices
+        if estimated is None or estimated[0] != snapshot.gas_prices:
+            return super()._curve_points(snapshot)
+
+        points = [(1, level['confidence'] / 100, (to_wei(level['price'], self.SCALE),
+                                                  to_wei(level['maxFeePerGas'], self.SCALE),
+                                                  to_wei(level['maxPriorityFeePerGas'], self.SCALE)))
+                  for level in estimated[1] if 'confidence' in level]
+        return points if len(points) > 0 else super()._curve_points(snapshot)
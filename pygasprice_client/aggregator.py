@@ -15,55 +15,287 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import time
+import threading
+from typing import Optional
 
 from pygasprice_client import FAST, GasClientApi, EthGasStation, POANetwork, EtherchainOrg, \
     Etherscan, Blocknative
+from pygasprice_client.batch import PriceMatrix
+from pygasprice_client.curve import PriceCurve
+from pygasprice_client.scoring import QualityScoring
+from pygasprice_client.snapshot import GasPriceSnapshot, SERIES
+from pygasprice_client.strategy import AggregationStrategy, PrunedMean
 
 
 class Aggregator(GasClientApi):
+    """Combines the gas prices of several `GasClientApi` clients into a single price.
+
+    The aggregate is recomputed as soon as one of the component clients refreshes, and only
+    for the tiers whose inputs have changed. The latest values of all component clients are
+    kept in a `PriceMatrix`, which aggregates all changed tiers in a single pass. A periodic check
+    every `refresh_interval` seconds picks up component clients whose prices have expired. The
+    aggregate is as old as the oldest snapshot it aggregates, which `max_age` is checked against.
+    Only aggregates whose values have changed are recorded in the `history`.
+
+    Component clients whose circuit breaker is open are left out of the aggregate without
+    reading their prices, until a probe request succeeds again. `breaker_states()` reports
+    the breaker state of every component client.
+
+    `wait_ready()` accepts a `quorum`, the number of component clients which need to have
+    delivered prices before the aggregator is considered ready.
+
+    How the values of the component clients are combined is decided by the `strategy`, by
+    default `PrunedMean`, which behaves like `aggregate()`. With `QualityScoring` providers are
+    scored, bias corrected and quarantined, and `provider_scores()` reports their statistics.
+
+    The price curve of the aggregator (see `price_within()`) combines the price curves of the
+    component clients point by point by the `strategy`, each interpolated from its own tier
+    conventions. Quarantined providers are left out. Combining costs O(clients x
+    `URGENCY_STEPS`) per fee type, so unless the strategy recomputes everything on every
+    aggregation, the combined curve is reused until the curve of a component client changes.
+
+    Further clients, for example streaming ones, can be aggregated by passing them in
+    `extra_clients`. Passing `clients` replaces the default providers altogether, for example
+    to aggregate the providers of another chain.
+
+    The default providers can be narrowed down by naming them in `providers`, for example
+    `providers=['Etherscan', 'Blocknative']`. Only the named providers are created.
+
+    Additional keyword arguments (for example `engine` or `cache`) are passed both to the component
+    clients and to the aggregator itself. With `lazy=True` neither the aggregator nor its component
+    clients send any request until prices are first accessed or `start()` is called, and `stop()`
+    stops them all.
+    """
+
+    URL = "aggregator"
+
+    # providers created by default, followed by Blocknative if an API key is given for it
+    PROVIDERS = ['EthGasStation', 'EtherchainOrg', 'POANetwork', 'Etherscan']
 
     def __init__(self, refresh_interval: int, expiry: int, ethgasstation_api_key=None, poa_network_alt_url=None,
-                 etherscan_api_key=None, blocknative_api_key=None):
-        self.clients = [
-            EthGasStation(refresh_interval=refresh_interval, expiry=expiry, api_key=ethgasstation_api_key),
-            EtherchainOrg(refresh_interval=refresh_interval, expiry=expiry),
-            POANetwork(refresh_interval=refresh_interval, expiry=expiry, alt_url=poa_network_alt_url),
-            Etherscan(refresh_interval=refresh_interval, expiry=expiry, api_key=etherscan_api_key)
-        ]
-        if blocknative_api_key:
-            self.clients.append(Blocknative(refresh_interval=refresh_interval, expiry=expiry, api_key=blocknative_api_key))
-
-        super().__init__("aggregator", refresh_interval, expiry)
+                 etherscan_api_key=None, blocknative_api_key=None, strategy: Optional[AggregationStrategy] = None,
+                 extra_clients: Optional[list] = None, clients: Optional[list] = None,
+                 providers: Optional[list] = None, **kwargs):
+        assert isinstance(strategy, AggregationStrategy) or strategy is None
+        assert isinstance(extra_clients, list) or extra_clients is None
+        assert isinstance(clients, list) or clients is None
+        assert isinstance(providers, list) or providers is None
+        assert clients is None or providers is None
 
-    def _background_run(self):
-        # Wait a few seconds for data to become available
-        for wait in range(min(5, self.refresh_interval)):
-            time.sleep(0.5)  # Since there's no synchronous API, wait a few seconds for data to become available
-            any(map(lambda c: c._last_refresh > 1, self.clients))
+        self.strategy = strategy if strategy is not None else PrunedMean()
+        self._lock = threading.RLock()
+        self._inputs_changed = threading.Condition(self._lock)
+        self._matrix = PriceMatrix(0)
+        self._matrix_rows = {}
+        # snapshot of every component client contributing to the matrix, by `id()` of the client
+        self._inputs = {}
+        # component curves the price curve has last been combined from
+        self._combined_curves = None
+
+        if clients is not None:
+            clients = list(clients)
+        else:
+            if providers is None:
+                providers = self.PROVIDERS + (['Blocknative'] if blocknative_api_key else [])
+
+            arguments = {
+                'EthGasStation': (EthGasStation, {'api_key': ethgasstation_api_key}),
+                'EtherchainOrg': (EtherchainOrg, {}),
+                # a local POA Network server is hedged against the public endpoint
+                'POANetwork': (POANetwork, {'alt_url': poa_network_alt_url, 'mirrors': [POANetwork.URL]}
+                               if poa_network_alt_url else {}),
+                'Etherscan': (Etherscan, {'api_key': etherscan_api_key}),
+                'Blocknative': (Blocknative, {'api_key': blocknative_api_key})
+            }
+            assert all(name in arguments for name in providers), f"Unknown providers in {providers}"
+            assert 'Blocknative' not in providers or blocknative_api_key, "Blocknative requires an API key"
 
-        while True:
+            clients = []
+            for name in providers:
+                provider_class, provider_arguments = arguments[name]
+                clients.append(provider_class(refresh_interval=refresh_interval, expiry=expiry, **provider_arguments,
+                                              **kwargs))
+        clients.extend(extra_clients or [])
+        self.clients = clients
+
+        super().__init__(self.URL, refresh_interval, expiry, **kwargs)
+
+        for client in clients:
+            client.add_listener(self._on_client_refresh)
+
+    def start(self):
+        """Starts refreshing the component clients and the aggregate, unless already started."""
+        super().start()
+        for client in self.clients:
+            if client._pending_start:
+                client.start()
+
+    def stop(self):
+        """Stops refreshing the component clients and the aggregate."""
+        super().stop()
+        for client in self.clients:
+            client.stop()
+
+    def _background_run(self):
+        stopped = self._stopped
+        while stopped is not None and not stopped.is_set():
             self._fetch_price()
-            time.sleep(self.refresh_interval)
+            stopped.wait(self.refresh_interval)
+
+    def _on_client_refresh(self, client: GasClientApi):
+        self._update([client])
 
     def _fetch_price(self):
-        # map() checks the client's price, filter() cleanses "None" prices from the list
-        self._gas_prices = [self.aggregate(list(filter(lambda p: p, map(lambda c: c.safe_low_price(), self.clients)))),
-                            self.aggregate(list(filter(lambda p: p, map(lambda c: c.standard_price(), self.clients)))),
-                            self.aggregate(list(filter(lambda p: p, map(lambda c: c.fast_price(), self.clients)))),
-                            self.aggregate(list(filter(lambda p: p, map(lambda c: c.fastest_price(), self.clients))))]
-
-        self._max_fees = [self.aggregate(list(filter(lambda p: p, map(lambda c: c.safe_low_maxfee(), self.clients)))),
-                          self.aggregate(list(filter(lambda p: p, map(lambda c: c.standard_maxfee(), self.clients)))),
-                          self.aggregate(list(filter(lambda p: p, map(lambda c: c.fast_maxfee(), self.clients)))),
-                          self.aggregate(list(filter(lambda p: p, map(lambda c: c.fastest_maxfee(), self.clients))))]
-
-        self._max_tips = [self.aggregate(list(filter(lambda p: p, map(lambda c: c.safe_low_tip(), self.clients)))),
-                          self.aggregate(list(filter(lambda p: p, map(lambda c: c.standard_tip(), self.clients)))),
-                          self.aggregate(list(filter(lambda p: p, map(lambda c: c.fast_tip(), self.clients)))),
-                          self.aggregate(list(filter(lambda p: p, map(lambda c: c.fastest_tip(), self.clients))))]
-
-        self._last_refresh = int(time.time())
+        self._update(self.clients)
+
+    def _sync_matrix(self):
+        """Resizes the providers x series matrix if `clients` has changed, keeping known rows."""
+        if len(self._matrix_rows) == len(self.clients) and \
+                all(self._matrix_rows.get(id(client)) == row for row, client in enumerate(self.clients)):
+            return
+
+        matrix = PriceMatrix(len(self.clients))
+        for row, client in enumerate(self.clients):
+            if id(client) in self._matrix_rows:
+                matrix.set_row(row, self._matrix.row(self._matrix_rows[id(client)]))
+
+        self._matrix = matrix
+        self._matrix_rows = {id(client): row for row, client in enumerate(self.clients)}
+
+    def _update(self, clients: list):
+        """Re-reads the prices of `clients` and re-aggregates the series whose inputs changed, or all of them.
+
+        Clients whose prices have expired since they were last read are re-read as well, so that
+        providers which stopped refreshing neither date nor skew the aggregate.
+        """
+        with self._lock:
+            self._sync_matrix()
+
+            # the deadline check of `snapshot()` is cheap, unlike re-reading every row
+            expired = [client for client in self.clients
+                       if client not in clients and self._inputs.get(id(client)) is not None
+                       and (client.breaker is not None and client.breaker.is_open or client.snapshot() is None)]
+
+            # a snapshot restored from the cache has to be replaced entirely by the first aggregation
+            changed = set(range(len(SERIES))) if self._restored or self.strategy.full_recompute else set()
+            for client in list(clients) + expired:
+                row = self._matrix_rows.get(id(client))
+                if row is None:
+                    continue
+
+                snapshot = None if client.breaker is not None and client.breaker.is_open else client.snapshot()
+                self._inputs[id(client)] = snapshot
+                # missing prices are either `None` or 0
+                values = tuple(value or None for value in snapshot.values) if snapshot is not None \
+                    else (None,) * len(SERIES)
+                previous = self._matrix.row(row)
+                changed.update(index for index, value in enumerate(values) if value != previous[index])
+                self._matrix.set_row(row, values)
+
+            self._publish(self._aggregate_snapshot(self._recompute(changed)))
+            self._inputs_changed.notify_all()
+
+        self._notify_listeners()
+
+    def _aggregate_snapshot(self, values: list) -> GasPriceSnapshot:
+        """Returns a snapshot of the aggregated `values`, as old as the oldest snapshot aggregated."""
+        inputs = [self._inputs.get(id(client)) for client in self.clients]
+        inputs = [snapshot for snapshot in inputs if snapshot is not None and any(snapshot.values)]
+        if len(inputs) == 0:
+            return GasPriceSnapshot.from_values(values)
+
+        oldest = min(inputs, key=lambda snapshot: snapshot.fetch_finished_ns)
+        return GasPriceSnapshot(values[0:4], values[4:8], values[8:12], oldest.timestamp,
+                                oldest.fetch_started_ns, oldest.fetch_finished_ns)
+
+    def _is_history(self, snapshot: GasPriceSnapshot, previous: GasPriceSnapshot) -> bool:
+        # the aggregate is republished whenever a component client refreshes, often with the same values
+        return snapshot.values != previous.values
+
+    def _build_curve(self, snapshot: GasPriceSnapshot) -> PriceCurve:
+        """Combines the price curves of the component clients by the `strategy`, or interpolates
+        its own tiers if there are none."""
+        curves, clients = [], []
+        for client in self.clients:
+            curve = client.price_curve() if client.breaker is None or not client.breaker.is_open else None
+            if curve is not None:
+                curves.append(curve)
+                clients.append(client)
+
+        if len(curves) == 0:
+            self._combined_curves = None
+            return super()._build_curve(snapshot)
+
+        # combining is O(clients x URGENCY_STEPS), so it is skipped if no component curve has changed
+        previous, combined = self._curve, self._combined_curves
+        if previous is not None and combined is not None and not self.strategy.full_recompute and \
+                len(combined) == len(curves) and all(old is new for old, new in zip(combined, curves)):
+            return PriceCurve(snapshot, previous._tables)
+
+        with self._lock:
+            curve = PriceCurve.combine(snapshot, curves, self.strategy, clients)
+        self._combined_curves = curves
+        return curve
+
+    def breaker_states(self) -> dict:
+        """Returns the circuit breaker state (`closed`, `open` or `half-open`) per component client."""
+        return {client: client.breaker.state for client in self.clients if client.breaker is not None}
+
+    def provider_scores(self) -> dict:
+        """Returns the quality statistics per component client, if aggregating by `QualityScoring`."""
+        if not isinstance(self.strategy, QualityScoring):
+            return {}
+
+        with self._lock:
+            return self.strategy.scores(self.clients)
+
+    def providers_contributing(self) -> list:
+        """Returns the number of component clients contributing a value, per series."""
+        with self._lock:
+            rows = [self._matrix.row(row) for row in range(len(self._matrix))]
+
+        return [sum(1 for row in rows if row[column]) for column in range(len(SERIES))]
+
+    def providers_ready(self) -> int:
+        """Returns the number of component clients currently contributing prices."""
+        with self._lock:
+            return sum(1 for row in range(len(self._matrix)) if any(self._matrix.row(row)))
+
+    def wait_ready(self, timeout: Optional[float] = None, quorum: int = 1) -> bool:
+        """Blocks until at least `quorum` component clients have delivered prices.
+
+        Args:
+            timeout: Maximum time to wait (in seconds), or `None` to wait indefinitely.
+            quorum: Number of component clients which need to be ready.
+
+        Returns:
+            `True` if the quorum has been reached, `False` if `timeout` elapsed first.
+        """
+        assert isinstance(quorum, int)
+        assert quorum > 0
+
+        if self._pending_start:
+            self.start()
+
+        with self._inputs_changed:
+            return self._inputs_changed.wait_for(lambda: self.providers_ready() >= quorum, timeout)
+
+    def _recompute(self, changed: set) -> list:
+        aggregates = list(self._snapshot.values)
+        columns = sorted(changed)
+
+        if type(self).aggregate is Aggregator.aggregate:
+            results = self.strategy.aggregate(self._matrix, columns, self.clients)
+        else:
+            # Honour subclasses customising `aggregate()`; filter() cleanses "None" prices from the list
+            inputs = [self._matrix.row(row) for row in range(len(self._matrix))]
+            results = [self.aggregate(list(filter(lambda p: p, map(lambda values: values[column], inputs))))
+                       for column in columns]
+
+        for column, result in zip(columns, results):
+            aggregates[column] = result
+
+        return aggregates
 
     @staticmethod
     def aggregate(values: list):
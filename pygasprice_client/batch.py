@@ -0,0 +1,167 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import Optional, Sequence
+
+from importlib.util import find_spec
+
+# NumPy takes tens of milliseconds to import, so it is only imported by the first matrix using it
+NUMPY_INSTALLED = find_spec('numpy') is not None
+numpy = None
+
+from pygasprice_client.snapshot import SERIES
+
+# Below this number of providers the pure Python implementation is faster
+NUMPY_MIN_PROVIDERS = 32
+
+# Whole numbers below this limit are represented exactly by float64, and so are sums of them
+_EXACT_SUM_LIMIT = 2 ** 53
+
+
+class PriceMatrix:
+    """Providers x series matrix holding the latest values of every provider.
+
+    Missing values (`None` or 0) are masked out. `aggregate()` prunes outliers and averages every
+    requested series in one pass, the same way `Aggregator.aggregate` does for a single series: one
+    maximum is pruned if more than three values are present, one minimum if more than two remain.
+
+    With NumPy, the values are additionally kept in a preallocated float64 array updated row by row,
+    so aggregation runs vectorized without converting the whole matrix on every refresh. The pure
+    Python implementation is used if NumPy is not installed.
+
+    Vectorized sums are only exact, and thus identical to `Aggregator.aggregate`, for whole numbers
+    (e.g. prices in wei) adding up to less than 2**53. Columns holding a fractional value, or whose
+    total exceeds that, are aggregated in pure Python instead.
+
+    Attributes:
+        use_numpy: Whether the vectorized NumPy implementation is used. By default NumPy is used
+            if it is installed and there are at least `NUMPY_MIN_PROVIDERS` providers.
+    """
+
+    def __init__(self, providers: int, width: int = len(SERIES), use_numpy: Optional[bool] = None):
+        assert isinstance(providers, int)
+        assert isinstance(width, int)
+
+        if use_numpy is None:
+            use_numpy = NUMPY_INSTALLED and providers >= NUMPY_MIN_PROVIDERS
+        assert not use_numpy or NUMPY_INSTALLED
+
+        self.use_numpy = use_numpy
+        self.width = width
+
+        self._rows = [(None,) * width] * providers
+        if use_numpy:
+            _import_numpy()
+            self._values = numpy.zeros((providers, width), dtype=numpy.float64)
+            self._fractional = numpy.zeros((providers, width), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def row(self, index: int) -> tuple:
+        return self._rows[index]
+
+    def set_row(self, index: int, values: Sequence):
+        assert len(values) == self.width
+
+        self._rows[index] = tuple(values)
+        if self.use_numpy:
+            self._values[index] = [value or 0.0 for value in values]
+            self._fractional[index] = self._values[index] % 1 != 0
+
+    def aggregate(self, columns: Optional[Sequence[int]] = None) -> list:
+        """Returns one aggregated value (or `None` if no provider had a value) per requested column."""
+        columns = list(range(self.width) if columns is None else columns)
+
+        if len(self._rows) == 0 or len(columns) == 0:
+            return [None] * len(columns)
+
+        if self.use_numpy:
+            return self._aggregate_numpy(columns)
+        else:
+            return [_aggregate_column([row[column] for row in self._rows]) for column in columns]
+
+    def _aggregate_numpy(self, columns: list) -> list:
+        matrix = self._values[:, columns]
+        present = matrix != 0
+        counts = present.sum(axis=0)
+
+        totals = matrix.sum(axis=0)
+        maxima = numpy.where(present, matrix, -numpy.inf).max(axis=0)
+        minima = numpy.where(present, matrix, numpy.inf).min(axis=0)
+
+        # Float sums are rounded differently than Python sums unless they are exact
+        inexact = self._fractional[:, columns].any(axis=0) | (numpy.abs(matrix).sum(axis=0) >= _EXACT_SUM_LIMIT)
+
+        # Prune the maximum of columns with more than three values, the minimum of those with more than two
+        totals = totals - numpy.where(counts > 3, maxima, 0.0) - numpy.where(counts > 2, minima, 0.0)
+        kept = counts - (counts > 3) - (counts > 2)
+
+        means = totals / numpy.maximum(kept, 1)
+        first = present.argmax(axis=0)
+
+        results = []
+        for position, column in enumerate(columns):
+            if inexact[position]:
+                results.append(_aggregate_column([row[column] for row in self._rows]))
+            elif kept[position] > 1:
+                results.append(float(means[position]))
+            elif kept[position] == 1:
+                # A single value is returned as is, like `Aggregator.aggregate` does
+                results.append(self._rows[first[position]][column])
+            else:
+                results.append(None)
+
+        return results
+
+
+def aggregate_batch(rows: Sequence[Sequence], columns: Optional[Sequence[int]] = None,
+                    use_numpy: Optional[bool] = None) -> list:
+    """Aggregates several series of `rows` (one row of values per provider) at once.
+
+    See `PriceMatrix` for details. Callers aggregating repeatedly should keep a `PriceMatrix`
+    and update its rows instead.
+    """
+    width = len(rows[0]) if len(rows) > 0 else (max(columns) + 1 if columns else 0)
+    matrix = PriceMatrix(len(rows), width, use_numpy)
+    for index, row in enumerate(rows):
+        matrix.set_row(index, row)
+
+    return matrix.aggregate(columns)
+
+
+def _aggregate_column(values: list):
+    values = [value for value in values if value]
+
+    # Same pruning as `Aggregator.aggregate`, so that values are summed in the same order
+    if len(values) > 3:
+        values.remove(max(values))
+    if len(values) > 2:
+        values.remove(min(values))
+
+    if len(values) > 1:
+        return sum(values) / len(values)
+    elif len(values) > 0:
+        return values[0]
+    else:
+        return None
+
+
+def _import_numpy():
+    global numpy
+    if numpy is None:
+        import numpy
@@ -0,0 +1,113 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Circuit breaker guarding the requests of a single provider.
+
+    The breaker starts `CLOSED`. After `failure_threshold` consecutive failures it opens, and no
+    requests are sent until a backoff delay has passed. The delay starts at `base_delay` and doubles
+    every time the breaker opens again, up to `max_delay`, randomized by +/- `jitter` so that many
+    clients do not retry a recovering provider at the same moment. Once the delay has passed the
+    breaker is `HALF_OPEN` and lets a single probe request through: success closes it, failure
+    opens it again with a longer delay.
+
+    Attributes:
+        failure_threshold: Consecutive failures opening the breaker.
+        base_delay: Initial backoff delay (in seconds).
+        max_delay: Maximum backoff delay (in seconds).
+        jitter: Relative randomization of backoff delays.
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_delay: float = 10.0, max_delay: float = 600.0,
+                 jitter: float = 0.2):
+        assert isinstance(failure_threshold, int)
+        assert failure_threshold > 0
+        assert 0 < base_delay <= max_delay
+        assert 0 <= jitter < 1
+
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+        self.failures = 0
+        self.trips = 0
+        self._opened = False
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if not self._opened:
+            return CLOSED
+        return OPEN if time.monotonic() < self._retry_at else HALF_OPEN
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def retry_in(self) -> float:
+        """Returns the time until the breaker lets the next request through (in seconds)."""
+        return max(self._retry_at - time.monotonic(), 0.0) if self._opened else 0.0
+
+    def allow(self) -> bool:
+        """Returns whether a request may be sent now. In `HALF_OPEN` state, only one probe is allowed."""
+        with self._lock:
+            if not self._opened:
+                return True
+
+            now = time.monotonic()
+            if now < self._retry_at:
+                return False
+
+            # Let one probe through; the breaker stays open for everyone else until it reports back
+            self._retry_at = now + self._delay()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.trips = 0
+            self._opened = False
+
+    def record_failure(self) -> bool:
+        """Records a failed request. Returns `True` if this opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            if not self._opened and self.failures < self.failure_threshold:
+                return False
+
+            self.trips += 1
+            self._opened = True
+            self._retry_at = time.monotonic() + self._delay()
+            return True
+
+    def _delay(self) -> float:
+        delay = min(self.base_delay * 2 ** max(self.trips - 1, 0), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def as_dict(self) -> dict:
+        return {'state': self.state, 'failures': self.failures, 'trips': self.trips, 'retry_in': self.retry_in()}
@@ -0,0 +1,94 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import logging
+import os
+import struct
+import threading
+import zlib
+from typing import Optional
+
+from pygasprice_client.snapshot import GasPriceSnapshot, SNAPSHOT_SIZE
+
+# File layout: magic, CRC32 of the payload, then one encoded `GasPriceSnapshot`
+MAGIC = b'GASCACH1'
+_CHECKSUM = struct.Struct('<I')
+_HEADER_SIZE = len(MAGIC) + _CHECKSUM.size
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'pygasprice')
+
+
+class SnapshotCache:
+    """On-disk cache of the latest snapshot of every client, used to warm-start after a restart.
+
+    Every snapshot is stored in its own small binary file, written to a temporary file first
+    and then renamed over the previous one, so readers only ever see complete files. Corrupt
+    or truncated files are ignored.
+
+    Attributes:
+        directory: Directory holding the cache files, created if missing.
+    """
+
+    logger = logging.getLogger()
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIRECTORY):
+        assert isinstance(directory, str)
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(client) -> str:
+        """Returns the cache key of `client`, distinct for every provider class and (redacted) URL."""
+        digest = hashlib.sha1(client.logger_url.encode()).hexdigest()[:16]
+        return f"{type(client).__name__}-{digest}"
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.snapshot")
+
+    def load(self, key: str) -> Optional[GasPriceSnapshot]:
+        try:
+            with open(self.path(key), 'rb') as file:
+                data = file.read(_HEADER_SIZE + SNAPSHOT_SIZE + 1)
+        except OSError:
+            return None
+
+        if len(data) != _HEADER_SIZE + SNAPSHOT_SIZE or not data.startswith(MAGIC):
+            return None
+
+        payload = data[_HEADER_SIZE:]
+        if _CHECKSUM.unpack_from(data, len(MAGIC))[0] != zlib.crc32(payload):
+            return None
+
+        return GasPriceSnapshot.from_bytes(payload)
+
+    def store(self, key: str, snapshot: GasPriceSnapshot):
+        payload = snapshot.to_bytes()
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            with open(temporary, 'wb') as file:
+                file.write(MAGIC + _CHECKSUM.pack(zlib.crc32(payload)) + payload)
+            os.replace(temporary, path)
+        except OSError as e:
+            self.logger.warning(f"Failed to cache gas prices in {path}: {e}")
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
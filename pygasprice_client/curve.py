@@ -0,0 +1,171 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+from typing import Optional
+
+from pygasprice_client.batch import PriceMatrix
+from pygasprice_client.snapshot import GasPriceSnapshot, GAS_PRICE, MAX_FEE, MAX_TIP
+from pygasprice_client.strategy import AggregationStrategy
+
+# The curve is tabulated over the "urgency" log(-log(1 - q)) of the probability q of being included in the
+# next block. Assuming every block includes a transaction with the same probability, the chance of
+# inclusion within `blocks` blocks is 1 - (1 - q) ** blocks, so the urgency of a target of `blocks` blocks
+# and `confidence` is log(-log(1 - confidence)) - log(blocks). The grid covers 1 block at 99.99% down to
+# 1000 blocks at 1%.
+URGENCY_MIN = -11.5
+URGENCY_MAX = 2.25
+URGENCY_STEPS = 1024
+_STEP = (URGENCY_MAX - URGENCY_MIN) / (URGENCY_STEPS - 1)
+
+
+def urgency(blocks: float, confidence: float) -> float:
+    """Returns the urgency of being included within `blocks` blocks with probability `confidence`."""
+    return math.log(-math.log1p(-confidence)) - math.log(blocks)
+
+
+class PriceCurve:
+    """Gas prices, max fees and tips needed to be included within any number of blocks with any confidence.
+
+    The curve is interpolated from the tiers of a single refresh, each of which is taken to be the
+    price for being included within some number of blocks with some confidence (see
+    `GasClientApi.TIER_TARGETS`). Between the tiers, prices are interpolated linearly in log price
+    over the urgency of the target. Targets more or less urgent than all tiers get the price of the
+    most or least urgent tier. Prices never decrease with urgency.
+
+    The curve is tabulated when created, so every query takes constant time. Tabulation reproduces
+    the prices of the tiers to within a fraction of a percent.
+
+    Attributes:
+        snapshot: The snapshot the curve has been interpolated from.
+    """
+
+    def __init__(self, snapshot: GasPriceSnapshot, tables: list):
+        assert isinstance(snapshot, GasPriceSnapshot)
+        assert len(tables) == 3
+
+        self.snapshot = snapshot
+        self._tables = tables
+
+    @classmethod
+    def from_points(cls, snapshot: GasPriceSnapshot, points: list) -> 'PriceCurve':
+        """Interpolates a curve through `points`, tuples of blocks, confidence and the
+        `(gas price, max fee, tip)` needed for that target."""
+        tables = []
+        for fee_type in range(3):
+            known = sorted((urgency(blocks, confidence), values[fee_type]) for blocks, confidence, values in points
+                           if values[fee_type] and 0 < confidence < 1)
+            tables.append(_tabulate(known) if len(known) > 0 else None)
+
+        return cls(snapshot, tables)
+
+    @classmethod
+    def combine(cls, snapshot: GasPriceSnapshot, curves: list, strategy: Optional[AggregationStrategy] = None,
+                clients: Optional[list] = None) -> 'PriceCurve':
+        """Combines `curves` into one, aggregating every point of the curves like `Aggregator.aggregate`.
+
+        If given, `strategy` combines the points instead (see `AggregationStrategy.combine()`), and
+        `clients` are the providers of the `curves`. This takes O(len(curves) * URGENCY_STEPS) per fee type.
+        """
+        assert clients is None or len(clients) == len(curves)
+
+        if clients is None:
+            clients = [None] * len(curves)
+
+        tables = []
+        for fee_type in range(3):
+            known = [(curve._tables[fee_type], client) for curve, client in zip(curves, clients)
+                     if curve._tables[fee_type] is not None]
+            if len(known) == 0:
+                tables.append(None)
+                continue
+
+            matrix = PriceMatrix(len(known), width=URGENCY_STEPS)
+            for row, (table, _) in enumerate(known):
+                matrix.set_row(row, table)
+
+            if strategy is None:
+                table = matrix.aggregate()
+            else:
+                table = strategy.combine(matrix, list(range(URGENCY_STEPS)), [client for _, client in known])
+            # no point can be combined if the strategy leaves all providers out
+            tables.append(table if None not in table else None)
+
+        return cls(snapshot, tables)
+
+    def _value(self, fee_type: int, blocks: float, confidence: float) -> Optional[int]:
+        assert blocks > 0
+        assert 0 < confidence < 1
+
+        table = self._tables[fee_type]
+        if table is None:
+            return None
+
+        position = (math.log(-math.log1p(-confidence)) - math.log(blocks) - URGENCY_MIN) / _STEP
+        if position <= 0:
+            return int(table[0])
+        if position >= URGENCY_STEPS - 1:
+            return int(table[-1])
+
+        index = int(position)
+        lower = table[index]
+        return int(lower + (table[index + 1] - lower) * (position - index))
+
+    def gas_price(self, blocks: float, confidence: float = 0.9) -> Optional[int]:
+        """Returns the gas price (in Wei) to be included within `blocks` blocks with probability `confidence`."""
+        return self._value(0, blocks, confidence)
+
+    def max_fee(self, blocks: float, confidence: float = 0.9) -> Optional[int]:
+        """Returns the max fee (in Wei) to be included within `blocks` blocks with probability `confidence`."""
+        return self._value(1, blocks, confidence)
+
+    def max_tip(self, blocks: float, confidence: float = 0.9) -> Optional[int]:
+        """Returns the tip (in Wei) to be included within `blocks` blocks with probability `confidence`."""
+        return self._value(2, blocks, confidence)
+
+
+def tier_points(snapshot: GasPriceSnapshot, targets: tuple) -> list:
+    """Returns the curve points of the tiers of `snapshot`, whose `(blocks, confidence)` are `targets`."""
+    values = snapshot.values
+    return [(blocks, confidence, (values[GAS_PRICE + tier], values[MAX_FEE + tier], values[MAX_TIP + tier]))
+            for tier, (blocks, confidence) in enumerate(targets)]
+
+
+def _tabulate(known: list) -> list:
+    """Interpolates the price at every step of the grid from `(urgency, price)` pairs sorted by urgency."""
+    logs = []
+    for position, price in known:
+        # prices must not decrease with urgency
+        value = math.log(price)
+        logs.append((position, max(value, logs[-1][1]) if logs else value))
+
+    table = []
+    segment = 0
+    for step in range(URGENCY_STEPS):
+        position = URGENCY_MIN + step * _STEP
+        while segment < len(logs) and logs[segment][0] < position:
+            segment += 1
+
+        if segment == 0:
+            table.append(math.exp(logs[0][1]))
+        elif segment == len(logs):
+            table.append(math.exp(logs[-1][1]))
+        else:
+            (lower, lower_log), (upper, upper_log) = logs[segment - 1], logs[segment]
+            table.append(math.exp(lower_log + (upper_log - lower_log) * (position - lower) / (upper - lower)))
+
+    return table
@@ -0,0 +1,94 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Gas price daemon: runs one `Aggregator` and publishes its prices to a shared-memory feed.
+
+All processes on the host read the feed with `SharedFeedClient`, so providers are polled once
+per host instead of once per process. API keys can be passed through environment variables
+(`ETHGASSTATION_API_KEY`, `ETHERSCAN_API_KEY`, `BLOCKNATIVE_API_KEY`) to keep them out of the
+process list.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.feed import DEFAULT_FEED_PATH, SharedFeedWriter
+from pygasprice_client.metrics import HTTPExporter, default_metrics
+from pygasprice_client.recording import FeedRecorder
+
+
+def parse_arguments(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='pygasprice-daemon', description=__doc__.splitlines()[0])
+    parser.add_argument("--feed", default=DEFAULT_FEED_PATH, help="Path of the shared-memory feed")
+    parser.add_argument("--refresh-interval", type=int, default=10, help="Refresh frequency (in seconds)")
+    parser.add_argument("--expiry", type=int, default=600, help="Expiration time (in seconds)")
+    parser.add_argument("--ethgasstation-api-key", default=os.environ.get('ETHGASSTATION_API_KEY'))
+    parser.add_argument("--etherscan-api-key", default=os.environ.get('ETHERSCAN_API_KEY'))
+    parser.add_argument("--blocknative-api-key", default=os.environ.get('BLOCKNATIVE_API_KEY'))
+    parser.add_argument("--poa-network-alt-url", default=None)
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve metrics on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--record", default=None, help="Append every provider response to this log")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    arguments = parse_arguments(args)
+    logging.basicConfig(format='%(asctime)-15s %(levelname)-8s %(message)s', level=logging.INFO)
+
+    exporter = None
+    if arguments.metrics_port is not None:
+        exporter = HTTPExporter(default_metrics().registry, port=arguments.metrics_port)
+        exporter.start()
+
+    writer = SharedFeedWriter(arguments.feed)
+    recorder = FeedRecorder(arguments.record) if arguments.record is not None else None
+
+    def publish(aggregator: Aggregator):
+        snapshot = aggregator.snapshot()
+        if snapshot is not None:
+            writer.publish(snapshot)
+
+    aggregator = Aggregator(refresh_interval=arguments.refresh_interval, expiry=arguments.expiry,
+                            ethgasstation_api_key=arguments.ethgasstation_api_key,
+                            poa_network_alt_url=arguments.poa_network_alt_url,
+                            etherscan_api_key=arguments.etherscan_api_key,
+                            blocknative_api_key=arguments.blocknative_api_key,
+                            recorder=recorder)
+    aggregator.add_listener(publish)
+    logging.info(f"Publishing gas prices to {arguments.feed}")
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    while not stopped.wait(1):
+        pass
+
+    aggregator.remove_listener(publish)
+    writer.close()
+    if recorder is not None:
+        recorder.close()
+    if exporter is not None:
+        exporter.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncEngine:
+    """Shared asyncio engine refreshing many gas price clients.
+
+    By default every `GasClientApi` runs its own background thread. Clients created with
+    `engine=AsyncEngine()` instead register with the engine, and a single event loop schedules
+    the refreshes of all of them. Blocking fetches are dispatched to a bounded thread pool, so
+    refreshes of different clients run concurrently without one OS thread per client.
+
+    The synchronous `*_price()`, `*_maxfee()` and `*_tip()` accessors of registered clients
+    are unaffected.
+
+    Attributes:
+        max_workers: Maximum number of fetches running at the same time.
+    """
+
+    logger = logging.getLogger()
+
+    def __init__(self, max_workers: int = 8):
+        assert(isinstance(max_workers, int))
+        assert(max_workers > 0)
+
+        self.max_workers = max_workers
+
+        self._loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gasprice")
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def register(self, client):
+        """Starts refreshing `client`, by default every `client.refresh_interval` seconds."""
+        self._loop.call_soon_threadsafe(self._start, client)
+
+    def unregister(self, client):
+        """Stops refreshing `client`."""
+        self._loop.call_soon_threadsafe(self._cancel, client)
+
+    def _start(self, client):
+        with self._lock:
+            if id(client) not in self._tasks:
+                self._tasks[id(client)] = self._loop.create_task(self._refresh_loop(client))
+
+    def _cancel(self, client):
+        with self._lock:
+            task = self._tasks.pop(id(client), None)
+
+        if task is not None:
+            task.cancel()
+
+    @property
+    def clients(self) -> int:
+        """Number of clients currently registered with the engine."""
+        return len(self._tasks)
+
+    async def _refresh_loop(self, client):
+        while True:
+            try:
+                await self._loop.run_in_executor(self._executor, client._fetch_price)
+            except Exception:
+                self.logger.exception(f"Unexpected error while refreshing {type(client).__name__}")
+
+            await asyncio.sleep(client._next_refresh_delay())
+
+    async def _cancel_all(self):
+        with self._lock:
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        """Cancels all refreshes and shuts the event loop and its thread pool down."""
+        asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result()
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=False)
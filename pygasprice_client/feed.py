@@ -0,0 +1,254 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+from typing import Optional, Tuple
+
+from pygasprice_client import GasClientApi
+from pygasprice_client.snapshot import GasPriceSnapshot, SNAPSHOT_SIZE
+
+# Feed layout: magic, sequence number, then one encoded `GasPriceSnapshot`
+MAGIC = b'GASFEED1'
+_MAGIC_SIZE = len(MAGIC)
+_SEQUENCE = struct.Struct('<Q')
+_PAYLOAD_OFFSET = _MAGIC_SIZE + _SEQUENCE.size
+FEED_SIZE = _PAYLOAD_OFFSET + SNAPSHOT_SIZE
+
+# Owner and mode of feeds are checked where the platform has them
+_UID = os.geteuid() if hasattr(os, 'geteuid') else None
+_O_NOFOLLOW = getattr(os, 'O_NOFOLLOW', 0)
+
+
+def _default_feed_path() -> str:
+    """Returns a feed path private to the current user: in `$XDG_RUNTIME_DIR` if set, otherwise in
+    a per-user directory below /dev/shm (or the temporary directory)."""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'pygasprice.feed')
+
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, f"pygasprice-{_UID}" if _UID is not None else 'pygasprice', 'pygasprice.feed')
+
+
+DEFAULT_FEED_PATH = _default_feed_path()
+
+
+def _untrusted(status: os.stat_result, owner: Optional[int]) -> Optional[str]:
+    """Returns why a feed file with `status` can not be trusted, or `None` if it can."""
+    if not stat.S_ISREG(status.st_mode):
+        return "is not a regular file"
+    if owner is not None and status.st_uid != owner:
+        return f"is owned by uid {status.st_uid}"
+    if status.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return "is writable by other users"
+    return None
+
+
+class SharedFeedWriter:
+    """Publishes snapshots to a memory-mapped file readable by any number of processes.
+
+    Writes are guarded by a seqlock: the sequence number is odd while a snapshot is being
+    written and even once it is complete, so readers never block the writer and detect torn
+    reads by comparing the sequence number before and after copying the snapshot. The file is
+    created if needed and reused (not replaced) on restart, so readers keep their mapping.
+    Only one writer may publish to a feed at a time.
+
+    The file is created with `mode`, by default readable by the current user only, in a directory
+    only accessible to that user if the directory does not exist yet. Symbolic links are not
+    followed, and an existing file not owned by the current user or writable by other users is
+    refused with a `PermissionError`, so that another user can not plant a feed at a known path.
+    """
+
+    def __init__(self, path: str = DEFAULT_FEED_PATH, mode: int = 0o600):
+        assert isinstance(path, str)
+        assert isinstance(mode, int)
+        assert not mode & (stat.S_IWGRP | stat.S_IWOTH), "Feeds must not be writable by other users"
+
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.mkdir(directory, 0o700)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | _O_NOFOLLOW, mode)
+        try:
+            status = os.fstat(fd)
+            reason = _untrusted(status, _UID)
+            if reason is not None:
+                raise PermissionError(f"Refusing to publish to {path}, which {reason}")
+
+            if status.st_size < FEED_SIZE:
+                os.ftruncate(fd, FEED_SIZE)
+            self._mmap = mmap.mmap(fd, FEED_SIZE)
+        finally:
+            os.close(fd)
+
+        if self._mmap[:_MAGIC_SIZE] != MAGIC:
+            _SEQUENCE.pack_into(self._mmap, _MAGIC_SIZE, 0)
+            self._mmap[:_MAGIC_SIZE] = MAGIC
+
+        # a writer which died mid-write left an odd sequence number behind
+        sequence = _SEQUENCE.unpack_from(self._mmap, _MAGIC_SIZE)[0]
+        self._sequence = sequence + (sequence & 1)
+        self._lock = threading.Lock()
+
+    def publish(self, snapshot: GasPriceSnapshot):
+        assert isinstance(snapshot, GasPriceSnapshot)
+
+        payload = snapshot.to_bytes()
+        with self._lock:
+            _SEQUENCE.pack_into(self._mmap, _MAGIC_SIZE, self._sequence + 1)
+            self._mmap[_PAYLOAD_OFFSET:FEED_SIZE] = payload
+            self._sequence += 2
+            _SEQUENCE.pack_into(self._mmap, _MAGIC_SIZE, self._sequence)
+
+    def close(self):
+        self._mmap.close()
+
+
+class SharedFeedReader:
+    """Reads snapshots published by a `SharedFeedWriter`, without locking and without system calls.
+
+    The feed is mapped lazily, so the reader can be created before the writer has started. It
+    is only mapped if it is a regular file owned by `owner` (by default the current user) and not
+    writable by other users; otherwise it is treated as if it did not exist.
+    """
+
+    logger = logging.getLogger()
+
+    def __init__(self, path: str = DEFAULT_FEED_PATH, max_attempts: int = 1000, owner: Optional[int] = _UID):
+        assert isinstance(path, str)
+        assert isinstance(max_attempts, int)
+        assert isinstance(owner, int) or owner is None
+
+        self.path = path
+        self.max_attempts = max_attempts
+        self.owner = owner
+        self._mmap = None
+        self._refused = None
+
+    def _map(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_RDONLY | _O_NOFOLLOW)
+        except OSError:
+            return False
+
+        try:
+            status = os.fstat(fd)
+            reason = _untrusted(status, self.owner)
+            if reason is not None:
+                if reason != self._refused:
+                    self.logger.warning(f"Ignoring gas price feed {self.path}, which {reason}")
+                    self._refused = reason
+                return False
+
+            if status.st_size < FEED_SIZE:
+                return False
+            buffer = mmap.mmap(fd, FEED_SIZE, access=mmap.ACCESS_READ)
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+
+        if buffer[:_MAGIC_SIZE] != MAGIC:
+            buffer.close()
+            return False
+
+        self._mmap = buffer
+        return True
+
+    def read(self, known_sequence: Optional[int] = None) -> Optional[Tuple[int, GasPriceSnapshot]]:
+        """Returns the current `(sequence, snapshot)` of the feed.
+
+        Returns `None` if the feed does not exist yet, nothing has been published, the sequence
+        number still equals `known_sequence`, or the writer kept interfering with the read.
+        """
+        if self._mmap is None and not self._map():
+            return None
+
+        for _ in range(self.max_attempts):
+            before = _SEQUENCE.unpack_from(self._mmap, _MAGIC_SIZE)[0]
+            if before == 0 or before == known_sequence:
+                return None
+            if before & 1:
+                continue
+
+            payload = self._mmap[_PAYLOAD_OFFSET:FEED_SIZE]
+            if _SEQUENCE.unpack_from(self._mmap, _MAGIC_SIZE)[0] == before:
+                return before, GasPriceSnapshot.from_bytes(payload)
+
+        return None
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+class SharedFeedClient(GasClientApi):
+    """Client reading the prices published by a gas price daemon through a shared-memory feed.
+
+    No HTTP requests are sent. Every accessor checks the sequence number of the feed and only
+    decodes a snapshot if the daemon has published a new one since, so reads take microseconds
+    and always see the latest aggregate. The background thread polls the feed every
+    `refresh_interval` seconds to notify listeners. Prices expire `expiry` seconds after the
+    daemon fetched them, for example if the daemon stops. Only a feed owned by `owner` (by default
+    the current user) is read, see `SharedFeedReader`.
+    """
+
+    def __init__(self, refresh_interval: int, expiry: int, path: str = DEFAULT_FEED_PATH,
+                 owner: Optional[int] = _UID, **kwargs):
+        assert isinstance(path, str)
+
+        self.reader = SharedFeedReader(path, owner=owner)
+        self._sequence = None
+        self._poll_lock = threading.Lock()
+
+        super().__init__(f"file://{path}", refresh_interval, expiry, **kwargs)
+
+    def _poll(self) -> bool:
+        with self._poll_lock:
+            result = self.reader.read(self._sequence)
+            if result is None:
+                return False
+
+            self._sequence, snapshot = result
+            self._publish(snapshot)
+
+        if self._expired:
+            self.logger.info(f"Current gas prices from {self.logger_url} became available")
+            self._expired = False
+
+        return True
+
+    def _fetch_price(self):
+        if self._poll():
+            self._notify_listeners()
+
+    def _return_value_if_valid(self, index: int, max_age: Optional[float] = None) -> Optional[int]:
+        self._poll()
+        return super()._return_value_if_valid(index, max_age)
+
+    def snapshot(self, max_age: Optional[float] = None) -> Optional[GasPriceSnapshot]:
+        self._poll()
+        return super().snapshot(max_age)
@@ -0,0 +1,234 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import math
+import threading
+from array import array
+from typing import Optional, Union
+
+from pygasprice_client.snapshot import GasPriceSnapshot, NANOSECONDS, SERIES
+
+_MISSING = float('nan')
+
+# Sorted windows kept up to date, beyond which all of them are dropped
+_MAX_SORTED_WINDOWS = 64
+
+
+def series_index(series: Union[int, str]) -> int:
+    """Resolves a series given by its index (e.g. `GAS_PRICE + FAST`) or name (e.g. 'fast_price')."""
+    if isinstance(series, str):
+        return SERIES.index(series)
+
+    assert isinstance(series, int)
+    assert 0 <= series < len(SERIES)
+    return series
+
+
+class GasPriceHistory:
+    """Fixed-size ring buffer of the most recent gas price snapshots.
+
+    Timestamps and each of the 12 series are kept in preallocated arrays, so memory stays
+    bounded by `capacity` however long the client runs. Missing values are skipped by all queries.
+
+    Queries can be limited to the last `samples` snapshots and/or to snapshots fetched within
+    the last `seconds`, measured on the monotonic clock like the age of snapshots. The sorted
+    values of every window queried by `percentile()` are kept and updated with the snapshots
+    appended and evicted since the previous query, in O(log n) comparisons per snapshot, so
+    rolling percentiles are not re-sorted on every refresh. Exponential moving averages are
+    folded in incrementally as well, costing O(1) per appended snapshot.
+
+    Attributes:
+        capacity: Maximum number of snapshots kept.
+    """
+
+    def __init__(self, capacity: int = 256):
+        assert isinstance(capacity, int)
+        assert capacity > 1
+
+        self.capacity = capacity
+
+        self._timestamps = array('d', [0.0] * capacity)
+        self._times_ns = array('q', [0] * capacity)
+        self._values = [array('d', [_MISSING] * capacity) for _ in SERIES]
+        self._appended = 0
+        self._sorted = {}
+        self._emas = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._appended, self.capacity)
+
+    def append(self, snapshot: GasPriceSnapshot):
+        assert isinstance(snapshot, GasPriceSnapshot)
+
+        with self._lock:
+            position = self._appended % self.capacity
+            if self._appended >= self.capacity:
+                self._evict(self._appended - self.capacity)
+
+            self._timestamps[position] = snapshot.timestamp
+            self._times_ns[position] = snapshot.fetch_finished_ns
+            for buffer, value in zip(self._values, snapshot.values):
+                buffer[position] = _MISSING if value is None else value
+
+            self._appended += 1
+
+    def _evict(self, sequence: int):
+        """Removes the snapshot numbered `sequence`, about to be overwritten, from the sorted windows."""
+        position = sequence % self.capacity
+        for (index, _, _), window in self._sorted.items():
+            if window.first <= sequence < window.end:
+                value = self._values[index][position]
+                if not math.isnan(value):
+                    del window.ordered[bisect.bisect_left(window.ordered, value)]
+                window.first = sequence + 1
+
+    def latest_timestamp(self) -> Optional[float]:
+        if self._appended == 0:
+            return None
+        return self._timestamps[(self._appended - 1) % self.capacity]
+
+    def _since_ns(self, seconds: Optional[float]) -> Optional[int]:
+        """Returns the monotonic time from which snapshots are within the last `seconds`."""
+        if seconds is None or self._appended == 0:
+            return None
+        return self._times_ns[(self._appended - 1) % self.capacity] - int(seconds * NANOSECONDS)
+
+    def _first(self, first: int, samples: Optional[int], since_ns: Optional[int]) -> int:
+        """Returns the sequence number of the oldest snapshot within the window, starting from `first`."""
+        if samples is not None:
+            assert samples > 0
+            first = max(first, self._appended - samples)
+        first = max(first, self._appended - self.capacity, 0)
+
+        if since_ns is not None:
+            while first < self._appended and self._times_ns[first % self.capacity] < since_ns:
+                first += 1
+        return first
+
+    def _window(self, index: int, samples: Optional[int], seconds: Optional[float]) -> list:
+        """Returns the values of series `index` within the window, oldest first."""
+        buffer = self._values[index]
+        values = (buffer[sequence % self.capacity]
+                  for sequence in range(self._first(0, samples, self._since_ns(seconds)), self._appended))
+        return [value for value in values if not math.isnan(value)]
+
+    def _sorted_window(self, index: int, samples: Optional[int], seconds: Optional[float]) -> list:
+        """Returns the sorted values of series `index` within the window, updating those of the previous query."""
+        key = (index, samples, seconds)
+        since_ns = self._since_ns(seconds)
+        window = self._sorted.get(key)
+
+        # values leaving the window must not have been overwritten yet, and it only slides forward
+        if window is None or window.first < self._appended - self.capacity or \
+                (since_ns is not None and since_ns < window.since_ns):
+            if len(self._sorted) >= _MAX_SORTED_WINDOWS:
+                self._sorted.clear()
+            first = self._first(0, samples, since_ns)
+            window = self._sorted[key] = _SortedWindow(sorted(self._window(index, samples, seconds)), first,
+                                                       self._appended, since_ns)
+            return window.ordered
+
+        buffer, ordered = self._values[index], window.ordered
+        first = self._first(window.first, samples, since_ns)
+        for sequence in range(window.first, min(first, window.end)):
+            value = buffer[sequence % self.capacity]
+            if not math.isnan(value):
+                del ordered[bisect.bisect_left(ordered, value)]
+        for sequence in range(max(window.end, first), self._appended):
+            value = buffer[sequence % self.capacity]
+            if not math.isnan(value):
+                bisect.insort(ordered, value)
+
+        window.first, window.end, window.since_ns = first, self._appended, since_ns
+        return ordered
+
+    def values(self, series: Union[int, str], samples: Optional[int] = None,
+               seconds: Optional[float] = None) -> list:
+        """Returns the recorded values of `series` within the window, oldest first."""
+        with self._lock:
+            return self._window(series_index(series), samples, seconds)
+
+    def percentile(self, series: Union[int, str], percent: float, samples: Optional[int] = None,
+                   seconds: Optional[float] = None) -> Optional[float]:
+        """Returns the `percent`-th percentile (0-100, linearly interpolated) of `series` within the window."""
+        assert 0 <= percent <= 100
+
+        index = series_index(series)
+        with self._lock:
+            ordered = self._sorted_window(index, samples, seconds)
+            if len(ordered) == 0:
+                return None
+
+            rank = (len(ordered) - 1) * percent / 100
+            lower = math.floor(rank)
+            upper = math.ceil(rank)
+            return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+    def median(self, series: Union[int, str], samples: Optional[int] = None,
+               seconds: Optional[float] = None) -> Optional[float]:
+        return self.percentile(series, 50, samples, seconds)
+
+    def ema(self, series: Union[int, str], span: int) -> Optional[float]:
+        """Returns the exponential moving average of `series` with smoothing factor 2 / (`span` + 1).
+
+        The average is updated lazily with the snapshots appended since the previous query.
+        """
+        assert isinstance(span, int)
+        assert span > 0
+
+        index = series_index(series)
+        alpha = 2 / (span + 1)
+
+        with self._lock:
+            average, folded = self._emas.get((index, span), (None, 0))
+
+            # Snapshots already overwritten in the ring buffer can no longer be folded in
+            first = max(folded, self._appended - self.capacity)
+            buffer = self._values[index]
+            for sequence in range(first, self._appended):
+                value = buffer[sequence % self.capacity]
+                if math.isnan(value):
+                    continue
+                average = value if average is None else average + alpha * (value - average)
+
+            self._emas[(index, span)] = (average, self._appended)
+            return average
+
+    def volatility(self, series: Union[int, str], samples: Optional[int] = None,
+                   seconds: Optional[float] = None) -> Optional[float]:
+        """Returns the standard deviation of the relative changes between consecutive values of `series`."""
+        values = self.values(series, samples, seconds)
+        changes = [current / previous - 1 for previous, current in zip(values, values[1:]) if previous]
+        if len(changes) < 2:
+            return None
+
+        mean = sum(changes) / len(changes)
+        return math.sqrt(sum((change - mean) ** 2 for change in changes) / (len(changes) - 1))
+
+
+class _SortedWindow:
+    """Sorted values of a series within a window, covering the snapshots numbered `first` to `end` (excluded)."""
+
+    __slots__ = ('ordered', 'first', 'end', 'since_ns')
+
+    def __init__(self, ordered: list, first: int, end: int, since_ns: Optional[int]):
+        self.ordered = ordered
+        self.first = first
+        self.end = end
+        self.since_ns = since_ns
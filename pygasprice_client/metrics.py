@@ -0,0 +1,375 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import logging
+import threading
+import weakref
+from typing import Callable, Optional, Sequence
+
+from pygasprice_client.snapshot import EMPTY_SNAPSHOT, SERIES
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PARSE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+
+class Metric:
+    """Family of samples sharing a name, keyed by a tuple of label values."""
+
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        assert isinstance(name, str)
+        assert isinstance(documentation, str)
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> list:
+        """Returns `(suffix, labels, value)` tuples, `labels` being a dict of label names to values."""
+        with self._lock:
+            values = list(self._values.items())
+
+        return [('', dict(zip(self.labelnames, labelvalues)), value) for labelvalues, value in sorted(values)]
+
+    def value(self, labelvalues: tuple = ()):
+        return self._values.get(labelvalues)
+
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def inc(self, labelvalues: tuple = (), amount: float = 1.0):
+        assert amount >= 0
+
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Gauge either set explicitly or, with a `callback`, computed when collected.
+
+    The callback returns a dict mapping label value tuples to values.
+    """
+
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], dict]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, labelvalues: tuple = ()):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def samples(self) -> list:
+        if self.callback is None:
+            return super().samples()
+
+        return [('', dict(zip(self.labelnames, labelvalues)), value)
+                for labelvalues, value in sorted(self.callback().items())]
+
+
+class Histogram(Metric):
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = HTTP_BUCKETS):
+        assert list(buckets) == sorted(buckets)
+
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labelvalues: tuple = ()):
+        position = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # per-bucket (non-cumulative) counts, with the last one for +Inf, then sum and count
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def value(self, labelvalues: tuple = ()):
+        """Returns the `(count, sum)` of the observations with the given labels."""
+        state = self._values.get(labelvalues)
+        return (state[2], state[1]) if state is not None else (0, 0.0)
+
+    def samples(self) -> list:
+        with self._lock:
+            values = [(labelvalues, (list(state[0]), state[1], state[2])) for labelvalues, state in self._values.items()]
+
+        samples = []
+        for labelvalues, (counts, total, count) in sorted(values):
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                samples.append(('_bucket', dict(labels, le=_format_value(bound)), cumulative))
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, count))
+
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics, rendered in the Prometheus text exposition format by `exposition()`."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        assert isinstance(metric, Metric)
+
+        with self._lock:
+            assert metric.name not in self._metrics, f"Metric {metric.name} is already registered"
+            self._metrics[metric.name] = metric
+
+        return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def collect(self) -> list:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def exposition(self) -> str:
+        lines = []
+        for metric in self.collect():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+class ClientMetrics:
+    """Instruments gas price clients, publishing their metrics to a `MetricsRegistry`.
+
+    Every `GasClientApi` reports HTTP latency and parse time histograms, success, failure and
+    expiry counters, labelled by provider class and by URL (with API keys masked), so that several
+    clients of the same class, such as the aggregators of different chains, are told apart. Snapshot age, circuit breaker state and the
+    number of providers contributing to every aggregated series are computed from the tracked
+    clients whenever the registry is collected, so they cost nothing on the refresh path.
+
+    Profiling hooks registered with `add_hook()` are called with the client, the phase (`http`
+    or `parse`) and its duration in seconds after every successful fetch.
+    """
+
+    logger = logging.getLogger()
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        assert isinstance(registry, MetricsRegistry) or registry is None
+
+        self.registry = registry if registry is not None else MetricsRegistry()
+
+        labels = ('provider', 'url')
+        self.http_seconds = self.registry.register(Histogram(
+            'gasprice_http_request_seconds', 'Duration of gas price requests, including decoding the response.', labels, HTTP_BUCKETS))
+        self.parse_seconds = self.registry.register(Histogram(
+            'gasprice_parse_seconds', 'Duration of parsing gas price API responses.', labels, PARSE_BUCKETS))
+        self.successes = self.registry.register(Counter(
+            'gasprice_fetch_success_total', 'Successful gas price refreshes.', labels))
+        self.failures = self.registry.register(Counter(
+            'gasprice_fetch_failures_total', 'Failed gas price refreshes.', labels))
+        self.expiries = self.registry.register(Counter(
+            'gasprice_expiries_total', 'Transitions of gas price feeds to expired.', labels))
+        self.registry.register(Gauge(
+            'gasprice_snapshot_age_seconds', 'Age of the freshest gas price snapshot.', labels, self._snapshot_ages))
+        self.registry.register(Gauge(
+            'gasprice_circuit_open', 'Whether the circuit breaker of a provider is open.', labels, self._circuits))
+        self.registry.register(Gauge(
+            'gasprice_providers_contributing', 'Component clients contributing to an aggregated series.',
+            ('provider', 'url', 'series'), self._contributions))
+
+        self._clients = weakref.WeakSet()
+        self._hooks = []
+
+    def add_hook(self, hook: Callable[[object, str, float], None]):
+        assert callable(hook)
+        self._hooks = self._hooks + [hook]
+
+    def remove_hook(self, hook: Callable[[object, str, float], None]):
+        self._hooks = [existing for existing in self._hooks if existing != hook]
+
+    def track(self, client):
+        self._clients.add(client)
+
+    def fetch_succeeded(self, client, http_seconds: Optional[float], parse_seconds: float):
+        """Records a successful refresh. `http_seconds` is `None` for messages pushed by streaming clients."""
+        provider = _labels(client)
+        if http_seconds is not None:
+            self.http_seconds.observe(http_seconds, provider)
+        self.parse_seconds.observe(parse_seconds, provider)
+        self.successes.inc(provider)
+
+        for hook in self._hooks:
+            try:
+                if http_seconds is not None:
+                    hook(client, 'http', http_seconds)
+                hook(client, 'parse', parse_seconds)
+            except Exception:
+                self.logger.exception("Gas price profiling hook failed")
+
+    def fetch_failed(self, client):
+        self.failures.inc(_labels(client))
+
+    def expired(self, client):
+        self.expiries.inc(_labels(client))
+
+    def _snapshot_ages(self) -> dict:
+        ages = {}
+        for client in list(self._clients):
+            snapshot = client._snapshot
+            if snapshot is not EMPTY_SNAPSHOT:
+                provider = _labels(client)
+                ages[provider] = min(ages.get(provider, float('inf')), max(snapshot.age, 0.0))
+
+        return ages
+
+    def _circuits(self) -> dict:
+        circuits = {}
+        for client in list(self._clients):
+            if client.breaker is not None:
+                provider = _labels(client)
+                circuits[provider] = max(circuits.get(provider, 0), int(client.breaker.is_open))
+
+        return circuits
+
+    def _contributions(self) -> dict:
+        contributions = {}
+        for client in list(self._clients):
+            providers_contributing = getattr(client, 'providers_contributing', None)
+            if providers_contributing is not None:
+                for series, count in zip(SERIES, providers_contributing()):
+                    contributions[_labels(client) + (series,)] = count
+
+        return contributions
+
+
+class MetricsExporter:
+    """Publishes the metrics of a `MetricsRegistry` somewhere; subclasses implement `start()` and `stop()`."""
+
+    def __init__(self, registry: MetricsRegistry):
+        assert isinstance(registry, MetricsRegistry)
+        self.registry = registry
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+
+class HTTPExporter(MetricsExporter):
+    """Serves the text exposition of a registry on `http://host:port/metrics` from a daemon thread.
+
+    Binds to the loopback interface by default, so the endpoint can only be scraped locally.
+    Pass `port=0` to pick a free port, available as `port` once started.
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9292, host: str = '127.0.0.1'):
+        assert isinstance(port, int)
+        assert isinstance(host, str)
+
+        super().__init__(registry)
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        assert self._server is None
+
+        # only processes exporting metrics pay for importing the HTTP server
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = registry.exposition().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = Server((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _labels(client) -> tuple:
+    # `logger_url` has API keys masked
+    return type(client).__name__, client.logger_url
+
+
+def _format_labels(labels: dict) -> str:
+    if len(labels) == 0:
+        return ''
+
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels.keys(), escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def default_metrics() -> ClientMetrics:
+    """Returns the process-wide `ClientMetrics` used by clients not given one explicitly."""
+    global _default_metrics
+
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = ClientMetrics()
+
+        return _default_metrics
@@ -0,0 +1,139 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import itertools
+import json
+import statistics
+from collections import deque
+from typing import Optional
+from urllib.parse import urlsplit
+
+from pygasprice_client import GasClientApi
+from pygasprice_client.parsing import loads
+from pygasprice_client.snapshot import GasPriceSnapshot
+
+
+class JsonRpcError(Exception):
+    pass
+
+
+class EthFeeHistory(GasClientApi):
+    """Estimates gas prices, max fees and tips locally from the `eth_feeHistory` of an Ethereum node.
+
+    Every refresh asks the node for its latest block (`eth_getBlockByNumber`) and, if new blocks
+    have been mined since, for the fee history of just those blocks, keeping the priority fee
+    rewards of the last `window` blocks. For every tier, the tip is the median over the window of
+    the reward at the tier's percentile of `percentiles` (safe low to fastest), ignoring empty
+    blocks. The gas price is the next block's base fee plus the tip, and the max fee is
+    `base_fee_multiplier` times the next block's base fee plus the tip, leaving headroom for
+    base fee increases while the transaction is pending.
+
+    Requests are sent as JSON-RPC through the client's `SessionPool`, so no third-party API is involved.
+
+    Attributes:
+        url: JSON-RPC endpoint of the node, logged without its path or credentials.
+        window: Number of recent blocks the estimates are based on.
+        percentiles: Reward percentiles of the safe low, standard, fast and fastest tiers.
+        base_fee_multiplier: Multiple of the next base fee included in max fees.
+    """
+
+    PERCENTILES = (10, 30, 60, 90)
+
+    def __init__(self, refresh_interval: int, expiry: int, url: str, window: int = 20,
+                 percentiles: tuple = PERCENTILES, base_fee_multiplier: int = 2, **kwargs):
+        assert isinstance(url, str)
+        assert isinstance(window, int)
+        assert 0 < window <= 1024
+        assert len(percentiles) == 4 and list(percentiles) == sorted(percentiles)
+        assert isinstance(base_fee_multiplier, int)
+
+        self.window = window
+        self.percentiles = tuple(percentiles)
+        # a tip at the n-th percentile of the rewards outbids n% of the transactions of a block
+        self.TIER_TARGETS = tuple((1, percentile / 100) for percentile in self.percentiles)
+        self.base_fee_multiplier = base_fee_multiplier
+
+        self._rewards = deque(maxlen=window)
+        self._latest_block = None
+        self._next_base_fee = None
+        self._ids = itertools.count(1)
+
+        super().__init__(url, refresh_interval, expiry, **kwargs)
+
+    def _redacted_url(self) -> str:
+        # node providers take API keys in the path (`/v3/<key>`) or as credentials, so only the host is logged
+        parts = urlsplit(self.URL)
+        return f"{parts.scheme}://{parts.netloc.rpartition('@')[2]}"
+
+    def _rpc(self, method: str, params: list):
+        request = {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params}
+        response = self.session_pool.post(self.URL, json=request, headers=self.headers)
+        self._raise_for_status(response)
+
+        body = loads(response.content)
+        if body.get('error') is not None:
+            raise JsonRpcError(f"{method} failed: {body['error']}")
+        return body['result']
+
+    def _fetch_data(self) -> Optional[dict]:
+        """Returns the fee history of the blocks mined since the last refresh, or `None` if there are none."""
+        latest = int(self._rpc('eth_getBlockByNumber', ['latest', False])['number'], 16)
+
+        if self._latest_block is not None and latest == self._latest_block:
+            return None
+
+        if self._latest_block is None or latest < self._latest_block:
+            # first refresh, or the node went back (reorg or another node behind a load balancer)
+            count = self.window
+        else:
+            count = min(latest - self._latest_block, self.window)
+
+        history = self._rpc('eth_feeHistory', [hex(count), hex(latest), list(self.percentiles)])
+        if self.recorder is not None:
+            self.recorder.record(self, json.dumps(history).encode())
+        return history
+
+    def _parse_api_data(self, data: Optional[dict]) -> GasPriceSnapshot:
+        if data is not None:
+            oldest = int(data['oldestBlock'], 16)
+            rewards = data.get('reward') or []
+            if self._latest_block is None or oldest <= self._latest_block:
+                self._rewards.clear()
+
+            for reward, ratio in zip(rewards, data['gasUsedRatio']):
+                # empty blocks report zero rewards, which say nothing about the fee market
+                if ratio > 0:
+                    self._rewards.append([int(value, 16) for value in reward])
+
+            self._latest_block = oldest + len(data['gasUsedRatio']) - 1
+            self._next_base_fee = int(data['baseFeePerGas'][-1], 16)
+
+        assert self._next_base_fee is not None
+
+        if len(self._rewards) > 0:
+            tips = [int(statistics.median(block[tier] for block in self._rewards)) for tier in range(4)]
+        else:
+            tips = [0, 0, 0, 0]
+
+        # percentiles are sorted, but medians of different blocks might not be
+        for tier in range(1, 4):
+            tips[tier] = max(tips[tier], tips[tier - 1])
+
+        base_fee = self._next_base_fee
+        return GasPriceSnapshot(gas_prices=[base_fee + tip for tip in tips],
+                                max_fees=[self.base_fee_multiplier * base_fee + tip for tip in tips],
+                                max_tips=tips)
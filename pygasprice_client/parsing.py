@@ -0,0 +1,62 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Union
+
+# The fastest JSON library installed decodes provider responses; all of them accept bytes
+try:
+    import orjson
+    loads = orjson.loads
+    BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson
+        loads = ujson.loads
+        BACKEND = 'ujson'
+    except ImportError:
+        loads = json.loads
+        BACKEND = 'json'
+
+GWEI = 1000000000
+
+# Below this magnitude, the product of a decimal's nearest float and the scale is off by less
+# than 2 ** -52 relatively, i.e. by less than half a Wei, so rounding it yields the exact result
+_EXACT_BELOW = 2.0 ** 51
+
+
+def to_wei(value: Union[int, float, str, Decimal], scale: int = GWEI) -> int:
+    """Converts `value` given in units of `scale` Wei (Gwei by default) to an exact integer amount of Wei.
+
+    Values are rounded to the nearest Wei rather than truncated, so `to_wei("0.29")` returns
+    exactly 290000000 where `int(0.29 * 10 ** 9)` gives 289999999. Amounts too large for that
+    to be exact in floating point (above about 2 million Gwei) are scaled as `Decimal`.
+    """
+    kind = type(value)
+    if kind is str or kind is float:
+        wei = float(value) * scale
+        if -_EXACT_BELOW < wei < _EXACT_BELOW:
+            return round(wei)
+        if kind is float:
+            value = repr(value)
+    elif kind is int:
+        return value * scale
+    elif kind is bool:
+        raise TypeError(f"Not an amount: {value!r}")
+
+    return int((Decimal(value) * scale).to_integral_value(ROUND_HALF_EVEN))
@@ -0,0 +1,105 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from typing import Iterator
+
+# File layout: magic, then one frame per response: the frame header, the provider name
+# and the zlib compressed response body
+MAGIC = b'GASREC01'
+_FRAME = struct.Struct('<IddB')
+
+Record = namedtuple('Record', ['provider', 'timestamp', 'duration', 'body'])
+Record.__doc__ = """Raw response of a provider, received at `timestamp` (in seconds since the epoch) after
+`duration` seconds."""
+
+
+class FeedRecorder:
+    """Append-only log of every raw response received by the clients recording into it.
+
+    Clients created with `recorder=FeedRecorder(path)` append each successful response before
+    parsing it, along with the name of their class, the time it was received and how long the
+    request took. Each response is stored as a length-prefixed, zlib compressed frame. Logs can
+    be read with `read_records()` and replayed offline by a `FeedReplay`.
+
+    Attributes:
+        path: Path of the log, appended to if it exists.
+    """
+
+    logger = logging.getLogger()
+
+    def __init__(self, path: str, compression_level: int = 6):
+        assert isinstance(path, str)
+        assert isinstance(compression_level, int)
+
+        self.path = path
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def record(self, client, body: bytes, duration: float = 0.0):
+        """Appends the response `body` just received by `client`."""
+        name = type(client).__name__.encode()
+        data = zlib.compress(body, self.compression_level)
+        frame = _FRAME.pack(len(data), time.time(), duration, len(name)) + name + data
+
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._file.write(frame)
+                self._file.flush()
+            except OSError as e:
+                self.logger.warning(f"Failed to record a gas price response in {self.path}: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_records(path: str) -> Iterator[Record]:
+    """Yields the records of the log at `path` in the order they were appended.
+
+    A frame truncated by a crash of the recording process ends the log.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a gas price recording")
+
+        while True:
+            header = file.read(_FRAME.size)
+            if len(header) < _FRAME.size:
+                return
+
+            length, timestamp, duration, name_length = _FRAME.unpack(header)
+            name = file.read(name_length)
+            data = file.read(length)
+            if len(name) < name_length or len(data) < length:
+                return
+
+            yield Record(name.decode(), timestamp, duration, zlib.decompress(data))
@@ -0,0 +1,195 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import time
+from typing import Optional
+
+from pygasprice_client import GasClientApi, EtherchainOrg, POANetwork, EthGasStation, Etherscan, Blocknative
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.engine import AsyncEngine
+from pygasprice_client.node import EthFeeHistory
+from pygasprice_client.scoring import QualityScoring
+from pygasprice_client.session import SessionPool, default_session_pool
+from pygasprice_client.strategy import AggregationStrategy, PrunedMean, TrimmedMean, WeightedMedian, \
+    FreshnessWeightedMean
+
+PROVIDERS = {cls.__name__: cls for cls in (EtherchainOrg, POANetwork, EthGasStation, Etherscan, Blocknative,
+                                           EthFeeHistory)}
+
+STRATEGIES = {cls.__name__: cls for cls in (PrunedMean, TrimmedMean, WeightedMedian, FreshnessWeightedMean,
+                                            QualityScoring)}
+
+
+class ChainAggregator(Aggregator):
+    """Aggregates the providers of one chain of a `ChainRegistry`.
+
+    Attributes:
+        chain: Name of the chain.
+    """
+
+    def __init__(self, chain: str, refresh_interval: int, expiry: int, clients: list, **kwargs):
+        assert isinstance(chain, str)
+
+        self.chain = chain
+        # distinguishes the chains in logs and in the snapshot cache
+        self.URL = f"aggregator/{chain}"
+
+        super().__init__(refresh_interval, expiry, clients=clients, **kwargs)
+
+
+class ChainRegistry:
+    """Gas prices of several chains, configured declaratively and refreshed by a single engine.
+
+    The clients of all chains are scheduled by one `AsyncEngine` and send their requests through
+    one `SessionPool`, which keeps a single session per host. `chain(name)` returns the
+    `ChainAggregator` of a chain, which implements the accessors of `GasClientApi`.
+
+    The configuration names the providers of every chain by class name (see `PROVIDERS`) along
+    with their arguments. Chain settings default to the `defaults` section, and provider settings
+    to their chain's. Arguments ending in `_env` are read from the environment variable named
+    by their value:
+
+        {
+            "defaults": {"refresh_interval": 30, "expiry": 600},
+            "max_workers": 8,
+            "chains": {
+                "mainnet": {
+                    "strategy": {"name": "TrimmedMean", "k": 1},
+                    "providers": [
+                        {"type": "Etherscan", "api_key_env": "ETHERSCAN_API_KEY"},
+                        {"type": "EthFeeHistory", "url": "http://localhost:8545", "refresh_interval": 12}
+                    ]
+                },
+                "polygon": {
+                    "refresh_interval": 10,
+                    "providers": [
+                        {"type": "Etherscan", "url": "https://api.polygonscan.com/api?module=gastracker&action=gasoracle",
+                         "api_key_env": "POLYGONSCAN_API_KEY"}
+                    ]
+                }
+            }
+        }
+
+    Strategies are given by name, or by a dictionary holding the `name` and arguments of the
+    strategy (see `STRATEGIES`). Additional keyword arguments (for example `metrics` or `cache`)
+    are passed to all clients.
+
+    Attributes:
+        engine: The `AsyncEngine` refreshing all clients.
+        session_pool: The `SessionPool` shared by all clients.
+    """
+
+    def __init__(self, config: dict, engine: Optional[AsyncEngine] = None,
+                 session_pool: Optional[SessionPool] = None, **kwargs):
+        assert isinstance(config, dict)
+        assert isinstance(engine, AsyncEngine) or engine is None
+        assert isinstance(session_pool, SessionPool) or session_pool is None
+        assert isinstance(config.get('chains'), dict)
+
+        self._owns_engine = engine is None
+        self.engine = engine if engine is not None else AsyncEngine(config.get('max_workers', 8))
+        self.session_pool = session_pool if session_pool is not None else default_session_pool()
+
+        defaults = config.get('defaults', {})
+        self._chains = {}
+        for name, chain_config in config['chains'].items():
+            settings = dict(defaults)
+            settings.update(chain_config)
+            self._chains[name] = self._create_chain(name, settings, kwargs)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'ChainRegistry':
+        """Creates a registry configured by the JSON file at `path`."""
+        with open(path) as file:
+            return cls(json.load(file), **kwargs)
+
+    def _create_chain(self, name: str, settings: dict, kwargs: dict) -> ChainAggregator:
+        refresh_interval, expiry = settings['refresh_interval'], settings['expiry']
+        clients = [self._create_client(provider, refresh_interval, expiry, kwargs)
+                   for provider in settings.get('providers', [])]
+        assert len(clients) > 0, f"No providers configured for chain {name}"
+
+        return ChainAggregator(name, refresh_interval, expiry, clients, strategy=strategy(settings.get('strategy')),
+                               engine=self.engine, session_pool=self.session_pool, **kwargs)
+
+    def _create_client(self, provider: dict, refresh_interval: int, expiry: int, kwargs: dict) -> GasClientApi:
+        arguments = dict(provider)
+        provider_class = arguments.pop('type')
+        if isinstance(provider_class, str):
+            assert provider_class in PROVIDERS, f"Unknown provider {provider_class}"
+            provider_class = PROVIDERS[provider_class]
+
+        for key in [key for key in arguments if key.endswith('_env')]:
+            arguments[key[:-len('_env')]] = os.environ.get(arguments.pop(key))
+
+        arguments.setdefault('refresh_interval', refresh_interval)
+        arguments.setdefault('expiry', expiry)
+        arguments.update(kwargs)
+        return provider_class(engine=self.engine, session_pool=self.session_pool, **arguments)
+
+    @property
+    def chains(self) -> list:
+        """Names of all configured chains."""
+        return list(self._chains.keys())
+
+    def chain(self, name: str) -> ChainAggregator:
+        """Returns the aggregated gas prices of chain `name`."""
+        return self._chains[name]
+
+    def __getitem__(self, name: str) -> ChainAggregator:
+        return self.chain(name)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every chain has aggregated prices of at least one provider.
+
+        Args:
+            timeout: Maximum time to wait for all chains together (in seconds), or `None` to wait indefinitely.
+
+        Returns:
+            `True` if all chains are ready, `False` if `timeout` elapsed first.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for aggregator in self._chains.values():
+            remaining = max(deadline - time.monotonic(), 0.0) if deadline is not None else None
+            if not aggregator.wait_ready(remaining):
+                return False
+
+        return True
+
+    def stop(self):
+        """Stops refreshing the clients of all chains, shutting the engine down if the registry created it."""
+        for aggregator in self._chains.values():
+            aggregator.stop()
+
+        if self._owns_engine:
+            self.engine.stop()
+
+
+def strategy(config) -> Optional[AggregationStrategy]:
+    """Creates the aggregation strategy named by `config`, or by its `name` if it is a dictionary."""
+    if config is None or isinstance(config, AggregationStrategy):
+        return config
+
+    arguments = {'name': config} if isinstance(config, str) else dict(config)
+    name = arguments.pop('name')
+    assert name in STRATEGIES, f"Unknown aggregation strategy {name}"
+    if 'strategy' in arguments:
+        # strategies wrapping another one, like `QualityScoring`
+        arguments['strategy'] = strategy(arguments['strategy'])
+    return STRATEGIES[name](**arguments)
@@ -0,0 +1,142 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from typing import Iterable, Iterator, Optional, Tuple
+
+from pygasprice_client import GasClientApi
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.metrics import ClientMetrics, MetricsRegistry
+from pygasprice_client.parsing import loads
+from pygasprice_client.recording import Record
+from pygasprice_client.registry import PROVIDERS
+from pygasprice_client.snapshot import GasPriceSnapshot, EMPTY_SNAPSHOT, NANOSECONDS, monotonic_ns
+from pygasprice_client.strategy import AggregationStrategy
+
+# arguments required by some providers, which are never used to send requests when replaying
+_PLACEHOLDERS = {'Blocknative': {'api_key': 'replay'}, 'EthFeeHistory': {'url': 'replay'}}
+
+
+class _ReplayEngine:
+    # registering clients with it keeps them from starting a background thread
+    def register(self, client):
+        pass
+
+
+class FeedReplay:
+    """Replays recorded provider responses through the clients' parsers and an `Aggregator`.
+
+    Every record is parsed by the `_parse_api_data()` of a client of the recorded provider class,
+    created on first use, and published as if it had just been fetched. The aggregator then
+    re-aggregates as it would have live, and every `refresh_interval` seconds of recorded time it
+    also re-reads all clients, dropping those whose prices have expired.
+
+    Records are replayed as fast as they can be parsed, without sleeping or sending requests. Time
+    is simulated by placing the snapshot of every client on the monotonic clock by its age at the
+    recorded time of the record being replayed, so expiry and freshness based strategies see the
+    same ages as they would have live.
+
+    Attributes:
+        aggregator: The `Aggregator` combining the replayed clients, whose listeners are notified
+            of every update.
+        clients: Replayed clients by provider class name.
+    """
+
+    logger = logging.getLogger()
+
+    def __init__(self, records: Iterable[Record], refresh_interval: int = 60, expiry: int = 600,
+                 strategy: Optional[AggregationStrategy] = None, clients: Optional[dict] = None):
+        assert isinstance(refresh_interval, int)
+        assert isinstance(expiry, int)
+        assert isinstance(clients, dict) or clients is None
+
+        self.records = records
+        self.refresh_interval = refresh_interval
+        self.expiry = expiry
+
+        self._engine = _ReplayEngine()
+        self._metrics = ClientMetrics(MetricsRegistry())
+        self._received = {}
+
+        self.clients = {}
+        self.aggregator = Aggregator(refresh_interval, expiry, clients=[], strategy=strategy, engine=self._engine,
+                                     metrics=self._metrics, history_size=0)
+        for name, client in (clients or {}).items():
+            self._add_client(name, client)
+
+    def _add_client(self, name: str, client: GasClientApi):
+        self.clients[name] = client
+        self.aggregator.clients.append(client)
+        client.add_listener(self.aggregator._on_client_refresh)
+
+    def _client(self, name: str) -> GasClientApi:
+        client = self.clients.get(name)
+        if client is None:
+            assert name in PROVIDERS, f"No client to replay responses of {name}"
+            client = PROVIDERS[name](self.refresh_interval, self.expiry, engine=self._engine, metrics=self._metrics,
+                                     history_size=0, **_PLACEHOLDERS.get(name, {}))
+            self._add_client(name, client)
+
+        return client
+
+    def _rebase(self, now: float):
+        """Makes the snapshots of all clients as old as they were at recorded time `now`."""
+        now_ns = monotonic_ns()
+        for client, (started, finished) in self._received.items():
+            snapshot = client._snapshot
+            if snapshot is EMPTY_SNAPSHOT:
+                continue
+
+            snapshot = snapshot.with_fetch_times(now_ns - int((now - started) * NANOSECONDS),
+                                                 now_ns - int((now - finished) * NANOSECONDS))
+            client._snapshot = snapshot
+            client._valid_until = client._deadline(snapshot)
+
+    def run(self) -> Iterator[Tuple[float, Optional[GasPriceSnapshot]]]:
+        """Replays all records, yielding the recorded time and the aggregate after each of them."""
+        next_check = None
+        for record in self.records:
+            if next_check is None:
+                next_check = record.timestamp + self.refresh_interval
+
+            # periodic checks of the aggregator due before this record
+            while next_check <= record.timestamp:
+                self._rebase(next_check)
+                self.aggregator._fetch_price()
+                next_check += self.refresh_interval
+
+            client = self._client(record.provider)
+            try:
+                snapshot = client._parse_api_data(loads(record.body))
+            except Exception:
+                self.logger.warning(f"Failed to parse recorded response of {record.provider}"
+                                    f" at {record.timestamp}")
+                continue
+
+            if snapshot is None:
+                continue
+
+            self._received[client] = (record.timestamp - record.duration, record.timestamp)
+            self._rebase(record.timestamp)
+
+            now_ns = monotonic_ns()
+            client._record_latency(record.duration)
+            client._publish(snapshot.with_fetch_times(now_ns - int(record.duration * NANOSECONDS), now_ns))
+            client._expired = False
+            client._notify_listeners()
+
+            yield record.timestamp, self.aggregator.snapshot()
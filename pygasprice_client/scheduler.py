@@ -0,0 +1,88 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from typing import Optional
+
+from pygasprice_client.snapshot import GasPriceSnapshot
+
+
+class AdaptiveSchedule:
+    """Refresh policy adapting the refresh interval of a client to price volatility.
+
+    Whenever a refresh moves any gas price or max fee by more than `threshold` (relative to
+    the previous refresh), the interval is multiplied by `speedup`, but not below `min_interval`.
+    While prices are stable, it is multiplied by `backoff` after every refresh, up to
+    `max_interval`. The policy itself is stateless, so one instance can be shared by many
+    clients, each of which keeps its own current interval.
+
+    Attributes:
+        min_interval: Shortest refresh interval (in seconds).
+        max_interval: Longest refresh interval (in seconds).
+        threshold: Relative price change considered significant.
+        speedup: Factor applied to the interval after a significant change.
+        backoff: Factor applied to the interval after a stable refresh.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, threshold: float = 0.05,
+                 speedup: float = 0.5, backoff: float = 1.5):
+        assert 0 < min_interval <= max_interval
+        assert threshold >= 0
+        assert 0 < speedup <= 1
+        assert backoff >= 1
+
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.speedup = speedup
+        self.backoff = backoff
+
+    @staticmethod
+    def change(previous: GasPriceSnapshot, latest: GasPriceSnapshot) -> float:
+        """Returns the largest relative change of any gas price or max fee between two snapshots."""
+        changes = [abs(new - old) / old
+                   for old, new in zip(previous.gas_prices + previous.max_fees, latest.gas_prices + latest.max_fees)
+                   if old and new]
+        return max(changes, default=0.0)
+
+    def next_interval(self, current: float, previous: Optional[GasPriceSnapshot],
+                      latest: GasPriceSnapshot) -> float:
+        """Returns the interval to wait after a refresh which published `latest`."""
+        if previous is not None and self.change(previous, latest) > self.threshold:
+            current = current * self.speedup
+        else:
+            current = current * self.backoff
+
+        return min(max(current, self.min_interval), self.max_interval)
+
+
+def retry_after(value: Optional[str], default: float) -> float:
+    """Parses a `Retry-After` header given either in seconds or as an HTTP date, returning seconds."""
+    if value is None:
+        return default
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    # HTTP dates are rare, so the email package is only imported when one is received
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,280 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import math
+import statistics
+from typing import Optional
+
+from pygasprice_client.batch import PriceMatrix
+from pygasprice_client.strategy import AggregationStrategy
+
+# tiers (safe low to fastest) of each fee type
+TIERS = 4
+
+
+class ProviderScore:
+    """Rolling quality statistics of a single provider, smoothed over the last `window` observations.
+
+    Attributes:
+        samples: Number of distinct responses observed.
+        deviation: Smoothed mean absolute log ratio of the values to the consensus, net of the bias
+            if it is corrected.
+        violations: Smoothed share of responses whose tiers were not ascending.
+        staleness: Smoothed age of the prices relative to their expiry (1 if they have expired).
+        bias: Smoothed log ratio of the reported values to the consensus, per series.
+        quarantined: Whether the provider is left out of the aggregate.
+    """
+
+    def __init__(self, width: int):
+        self.samples = 0
+        self.deviation = 0.0
+        self.violations = 0.0
+        self.staleness = 0.0
+        self.bias = [0.0] * width
+        self.quarantined = False
+
+        # the last row observed and its fee types with inverted tiers
+        self.row = None
+        self.inverted = ()
+
+    def reliability(self, deviation_scale: float) -> float:
+        """Returns how well the values agree with the consensus, between 0 and 1."""
+        return math.exp(-self.deviation / deviation_scale) * (1 - self.violations)
+
+    def score(self, deviation_scale: float) -> float:
+        """Returns the reliability of the provider, reduced by the age of its prices."""
+        return self.reliability(deviation_scale) * (1 - self.staleness)
+
+    def as_dict(self, deviation_scale: float) -> dict:
+        return {'score': self.score(deviation_scale), 'reliability': self.reliability(deviation_scale),
+                'samples': self.samples, 'deviation': self.deviation,
+                'violations': self.violations, 'staleness': self.staleness, 'bias': list(self.bias),
+                'quarantined': self.quarantined}
+
+
+class QualityScoring(AggregationStrategy):
+    """Scores providers by their agreement with the consensus, corrects their bias and quarantines bad ones.
+
+    Every aggregation updates, for each provider whose values have changed, how far its values
+    deviate from the aggregate (the consensus) beyond its usual bias and how often its tiers are not
+    ascending (for example a safe low price above the fast one), and for all providers how old their
+    prices are, as exponentially weighted averages over roughly the last `window` observations. This
+    is incremental, in O(providers) per refresh.
+
+    Providers systematically reporting higher or lower values, for example copying the fast price
+    into the fastest one, have their learned bias per series divided out once `min_samples`
+    responses have been observed. Biases are learned relative to the median bias of all providers,
+    so they do not shift the consensus itself. Fee types with inverted tiers are ignored until the
+    provider reports ascending ones.
+
+    The reliability of a provider is exp(-deviation / `deviation_scale`) * (1 - violations), and its
+    score is its reliability * (1 - staleness). Providers whose reliability drops below
+    `quarantine_below` are left out of the aggregate until it rises above `release_above` again; the
+    statistics of quarantined providers keep being updated. The corrected values are averaged
+    weighted by score, or combined by `strategy` if given.
+
+    A `QualityScoring` holds the scores of the providers of a single aggregator. As scores change
+    with every refresh, all series are re-aggregated every time.
+
+    Args:
+        strategy: Strategy combining the corrected values, instead of averaging them weighted by score.
+        window: Number of observations the statistics are averaged over.
+        deviation_scale: Mean absolute log deviation from the consensus which reduces the score by 1/e.
+        quarantine_below: Reliability below which a provider is quarantined.
+        release_above: Reliability above which a quarantined provider is released.
+        min_samples: Observations needed before a provider can be quarantined or bias corrected.
+        correct_bias: Whether learned biases are corrected.
+    """
+
+    logger = logging.getLogger()
+
+    full_recompute = True
+
+    def __init__(self, strategy: Optional[AggregationStrategy] = None, window: int = 50,
+                 deviation_scale: float = 0.1, quarantine_below: float = 0.2, release_above: float = 0.5,
+                 min_samples: int = 10, correct_bias: bool = True):
+        assert isinstance(strategy, AggregationStrategy) or strategy is None
+        assert isinstance(window, int)
+        assert window > 0
+        assert deviation_scale > 0
+        assert 0 <= quarantine_below <= release_above <= 1
+        assert isinstance(min_samples, int)
+
+        self.strategy = strategy
+        self.window = window
+        self.deviation_scale = deviation_scale
+        self.quarantine_below = quarantine_below
+        self.release_above = release_above
+        self.min_samples = min_samples
+        self.correct_bias = correct_bias
+
+        self._alpha = 2 / (window + 1)
+        self._scores = {}
+
+    def scores(self, clients: list) -> dict:
+        """Returns the statistics and score of each of `clients` observed so far, by client."""
+        return {client: self._scores[id(client)].as_dict(self.deviation_scale)
+                for client in clients if id(client) in self._scores}
+
+    def aggregate(self, matrix: PriceMatrix, columns: list, clients: list) -> list:
+        assert len(matrix) == len(clients)
+
+        scores = [self._score(client, matrix.width) for client in clients]
+        changed = [row for row, score in enumerate(scores) if self._observe(score, matrix.row(row))]
+        for client, score in zip(clients, scores):
+            self._smooth_staleness(client, score)
+
+        offsets = self._offsets(scores, matrix.width)
+        corrected = [self._correct(matrix.row(row), score, offsets) for row, score in enumerate(scores)]
+
+        included = PriceMatrix(len(matrix), width=matrix.width)
+        for row, score in enumerate(scores):
+            if not score.quarantined:
+                included.set_row(row, corrected[row])
+
+        if self.strategy is not None:
+            results = self.strategy.aggregate(included, columns, clients)
+        else:
+            weights = [score.score(self.deviation_scale) for score in scores]
+            results = [self._weighted_mean(included, column, weights) for column in columns]
+
+        for row in changed:
+            self._learn(clients[row], scores[row], corrected[row], offsets, columns, results)
+
+        return results
+
+    def aggregate_series(self, samples: list) -> Optional[float]:
+        matrix = PriceMatrix(len(samples), width=1)
+        for row, (value, _) in enumerate(samples):
+            matrix.set_row(row, (value,))
+        return self.aggregate(matrix, [0], [client for _, client in samples])[0]
+
+    def combine(self, matrix: PriceMatrix, columns: list, clients: list) -> list:
+        """Combines values of the providers by their current scores, leaving quarantined providers out.
+
+        Biases are learned per series, so the values are not corrected.
+        """
+        assert len(matrix) == len(clients)
+
+        scores = [self._scores.get(id(client)) for client in clients]
+        included = PriceMatrix(len(matrix), width=matrix.width)
+        for row, score in enumerate(scores):
+            if score is None or not score.quarantined:
+                included.set_row(row, matrix.row(row))
+
+        if self.strategy is not None:
+            return self.strategy.combine(included, columns, clients)
+
+        weights = [score.score(self.deviation_scale) if score is not None else 1.0 for score in scores]
+        return [self._weighted_mean(included, column, weights) for column in columns]
+
+    def _score(self, client, width: int) -> ProviderScore:
+        score = self._scores.get(id(client))
+        if score is None:
+            score = self._scores[id(client)] = ProviderScore(width)
+        return score
+
+    def _smooth(self, average: float, value: float, samples: Optional[int] = None) -> float:
+        # plain average of the first samples, so that early observations are not biased towards 0
+        alpha = self._alpha if samples is None else max(self._alpha, 1 / samples)
+        return average + alpha * (value - average)
+
+    def _observe(self, score: ProviderScore, row: tuple) -> bool:
+        """Records the tier violations of `row` if it is a new response. Returns whether it is."""
+        if row == score.row:
+            return False
+
+        score.row = row
+        if not any(row):
+            return False
+
+        score.samples += 1
+        score.inverted = tuple(start for start in range(0, len(row), TIERS) if not _ascending(row[start:start + TIERS]))
+        score.violations = self._smooth(score.violations, 1.0 if score.inverted else 0.0, score.samples)
+        return True
+
+    def _smooth_staleness(self, client, score: ProviderScore):
+        snapshot = client.snapshot()
+        staleness = 1.0 if snapshot is None else min(max(snapshot.age / client.expiry, 0.0), 1.0)
+        score.staleness = self._smooth(score.staleness, staleness)
+
+    def _offsets(self, scores: list, width: int) -> list:
+        """Returns the median bias of all providers per series, which biases are corrected relative to."""
+        learned = [score for score in scores if score.samples > 0 and not score.quarantined]
+        if not self.correct_bias or len(learned) == 0:
+            return [None] * width
+
+        return [statistics.median(score.bias[column] for score in learned) for column in range(width)]
+
+    def _correct(self, row: tuple, score: ProviderScore, offsets: list) -> tuple:
+        corrected = list(row)
+        for start in score.inverted:
+            corrected[start:start + TIERS] = [None] * len(row[start:start + TIERS])
+
+        if score.samples >= self.min_samples:
+            for column, offset in enumerate(offsets):
+                if corrected[column] and offset is not None:
+                    corrected[column] = corrected[column] / math.exp(score.bias[column] - offset)
+
+        return tuple(corrected)
+
+    def _learn(self, client, score: ProviderScore, corrected: tuple, offsets: list, columns: list, results: list):
+        """Updates the bias and deviation of a provider from its new response and the new consensus `results`."""
+        deviations = []
+        for column, consensus in zip(columns, results):
+            # values of fee types with inverted tiers have been dropped
+            if not consensus or not corrected[column]:
+                continue
+
+            ratio = math.log(score.row[column] / consensus)
+            expected = score.bias[column] - offsets[column] if offsets[column] is not None else 0.0
+            deviations.append(abs(ratio - expected))
+            score.bias[column] = self._smooth(score.bias[column], ratio, score.samples)
+
+        if len(deviations) == 0:
+            return
+
+        score.deviation = self._smooth(score.deviation, sum(deviations) / len(deviations), score.samples)
+
+        if score.samples < self.min_samples:
+            return
+
+        value = score.reliability(self.deviation_scale)
+        if not score.quarantined and value < self.quarantine_below:
+            score.quarantined = True
+            self.logger.warning(f"Quarantined gas prices of {type(client).__name__} with reliability {value:.2f}")
+        elif score.quarantined and value > self.release_above:
+            score.quarantined = False
+            self.logger.info(f"Released gas prices of {type(client).__name__} with reliability {value:.2f}")
+
+    @staticmethod
+    def _weighted_mean(matrix: PriceMatrix, column: int, weights: list) -> Optional[float]:
+        weighted = [(matrix.row(row)[column], weight) for row, weight in enumerate(weights) if matrix.row(row)[column]]
+        total = sum(weight for _, weight in weighted)
+        if total == 0:
+            return None
+        if len(weighted) == 1:
+            return weighted[0][0]
+
+        return sum(value * weight for value, weight in weighted) / total
+
+
+def _ascending(tiers: tuple) -> bool:
+    """Whether the present values of `tiers` do not decrease from safe low to fastest."""
+    present = [value for value in tiers if value]
+    return all(lower <= higher for lower, higher in zip(present, present[1:]))
@@ -0,0 +1,255 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+from urllib.parse import urlsplit
+
+
+class SessionPool:
+    """Pool of keep-alive HTTP sessions, one per host, shared by gas price clients.
+
+    Every client fetching from the same host reuses the same `requests.Session` and therefore
+    the same urllib3 connection pool, so subsequent refreshes skip the TCP and TLS handshakes.
+    All requests are sent with a (connect, read) timeout and retried according to the
+    configured retry policy. API keys in the request URLs urllib3 logs while retrying are masked.
+
+    `hedged_get()` races requests to redundant endpoints on a small thread pool, created when
+    first needed. Hedged requests are not retried, as the next endpoint is requested instead.
+
+    Attributes:
+        pool_maxsize: Maximum number of connections kept alive per host.
+        timeout: Connect and read timeouts (in seconds).
+        retries: Number of retries on connection errors and 5xx responses.
+        backoff_factor: Backoff factor between retries (in seconds).
+        hedging_workers: Maximum number of hedged requests in flight.
+    """
+
+    def __init__(self, pool_maxsize: int = 4, timeout: tuple = (3.05, 10), retries: int = 2,
+                 backoff_factor: float = 0.3, hedging_workers: int = 8):
+        assert(isinstance(pool_maxsize, int))
+        assert(isinstance(timeout, tuple))
+        assert(isinstance(retries, int))
+        assert(isinstance(backoff_factor, float))
+        assert(isinstance(hedging_workers, int))
+
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.hedging_workers = hedging_workers
+
+        self._sessions = {}
+        self._hedging_sessions = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _new_session(self, retries: int) -> 'requests.Session':
+        # imported by the first request rather than with the package, as they take ~100ms to import
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        _redact_urllib3_logs()
+
+        # HTTP 429 is left to the client, which reschedules its refresh instead of sleeping here
+        retry = Retry(total=retries, backoff_factor=self.backoff_factor,
+                      status_forcelist=(500, 502, 503, 504), raise_on_status=False,
+                      respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session_for(self, url: str) -> 'requests.Session':
+        """Returns the session shared by all requests to the host of `url`."""
+        return self._session_for(url, self._sessions, self.retries)
+
+    def _session_for(self, url: str, sessions: dict, retries: int) -> 'requests.Session':
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+
+        with self._lock:
+            session = sessions.get(host)
+            if session is None:
+                session = sessions[host] = self._new_session(retries)
+
+        return session
+
+    def get(self, url: str, headers: Optional[dict] = None) -> 'requests.Response':
+        return self.session_for(url).get(url, headers=headers, timeout=self.timeout)
+
+    def hedged_get(self, urls: list, headers: Optional[dict] = None, delay: float = 1.0,
+                   deadline: Optional[float] = None) -> 'requests.Response':
+        """Sends GET requests to redundant `urls`, returning the first successful response.
+
+        `urls[0]` is requested immediately, and the next URL whenever a request fails or no
+        successful response has arrived `delay` seconds after the last request was sent. The
+        first response with a status below 400 is returned, and the others are closed as they
+        complete. If all requests fail, the last response received is returned, or the last
+        exception raised if there is none.
+
+        The whole call takes at most `deadline` seconds, by default the connect and read timeouts
+        of a single request. Requests still in flight then are abandoned (and closed once they
+        complete), returning the last failed response received or raising `requests.Timeout`.
+        """
+        assert(isinstance(urls, list))
+        assert(len(urls) > 0)
+        assert(deadline is None or isinstance(deadline, (int, float)))
+
+        if deadline is None:
+            deadline = sum(self.timeout)
+        expires_at = time.monotonic() + deadline
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedging_workers,
+                                                    thread_name_prefix="gasprice-hedge")
+            executor = self._executor
+
+        remaining = list(urls)
+        pending = set()
+        response, error = None, None
+        try:
+            while remaining or pending:
+                left = expires_at - time.monotonic()
+                if left <= 0:
+                    break
+
+                if remaining:
+                    pending.add(executor.submit(self._hedged_request, remaining.pop(0), headers))
+
+                done, pending = wait(pending, timeout=min(delay, left) if remaining else left,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = e
+                        continue
+
+                    if result.status_code < 400:
+                        return result
+                    if response is not None:
+                        response.close()
+                    response = result
+        finally:
+            for future in pending:
+                if not future.cancel():
+                    future.add_done_callback(_close_response)
+
+        if response is not None:
+            return response
+        if pending or error is None:
+            import requests
+            raise requests.Timeout(f"No response from {len(urls)} hedged requests within {deadline}s")
+        raise error
+
+    def _hedged_request(self, url: str, headers: Optional[dict]) -> 'requests.Response':
+        # failures are hedged by requesting the next URL, so retrying would only delay the race
+        session = self._session_for(url, self._hedging_sessions, 0)
+        return session.get(url, headers=headers, timeout=self.timeout)
+
+    def post(self, url: str, json=None, headers: Optional[dict] = None) -> 'requests.Response':
+        return self.session_for(url).post(url, json=json, headers=headers, timeout=self.timeout)
+
+    def stream(self, url: str, headers: Optional[dict] = None, read_timeout: Optional[float] = None) -> 'requests.Response':
+        """Opens a streaming GET request, whose body is consumed incrementally by the caller.
+
+        `read_timeout` bounds the silence between two chunks and defaults to the pool's read timeout.
+        """
+        timeout = (self.timeout[0], read_timeout if read_timeout is not None else self.timeout[1])
+        return self.session_for(url).get(url, headers=headers, timeout=timeout, stream=True)
+
+    @property
+    def hosts(self) -> list:
+        """Hosts which currently have a session in this pool."""
+        with self._lock:
+            return list(dict.fromkeys(list(self._sessions) + list(self._hedging_sessions)))
+
+    def close(self):
+        """Closes all sessions and their kept-alive connections, and stops hedging threads."""
+        with self._lock:
+            sessions = list(self._sessions.values()) + list(self._hedging_sessions.values())
+            self._sessions.clear()
+            self._hedging_sessions.clear()
+            executor, self._executor = self._executor, None
+
+        for session in sessions:
+            session.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+class _RedactingFilter(logging.Filter):
+    """Masks API keys in the request URLs which urllib3 logs, for example when retrying."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from pygasprice_client import redact_url
+
+        message = record.getMessage()
+        redacted = redact_url(message)
+        if redacted != message:
+            record.msg, record.args = redacted, None
+        return True
+
+
+_URLLIB3_LOGGERS = ('urllib3.connectionpool', 'urllib3.util.retry')
+_redacting_filter = None
+
+
+def _redact_urllib3_logs():
+    global _redacting_filter
+
+    if _redacting_filter is None:
+        _redacting_filter = _RedactingFilter()
+        for name in _URLLIB3_LOGGERS:
+            logging.getLogger(name).addFilter(_redacting_filter)
+
+
+def answered_by(response: 'requests.Response', url: str) -> bool:
+    """Tells whether `response` answers a request to `url`, e.g. the primary URL of `hedged_get()`."""
+    import requests
+
+    requested = response.history[0] if response.history else response
+    return requested.url == requests.Request('GET', url).prepare().url
+
+
+def _close_response(future):
+    # releases the connection of a request which lost the race
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_session_pool() -> SessionPool:
+    """Returns the process-wide `SessionPool` used by clients not given one explicitly."""
+    global _default_pool
+
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SessionPool()
+
+        return _default_pool
@@ -0,0 +1,173 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import struct
+import time
+from typing import Optional, Sequence
+
+# offsets of the three fee types within `GasPriceSnapshot.values`, each followed by
+# the four tiers indexed 0 (safe low) to 3 (fastest)
+GAS_PRICE = 0
+MAX_FEE = 4
+MAX_TIP = 8
+
+SERIES = ('safe_low_price', 'standard_price', 'fast_price', 'fastest_price',
+          'safe_low_maxfee', 'standard_maxfee', 'fast_maxfee', 'fastest_maxfee',
+          'safe_low_tip', 'standard_tip', 'fast_tip', 'fastest_tip')
+
+# binary encoding: timestamp, one type tag per value, then the 12 values as 64-bit integers
+# (floats are stored by their IEEE 754 bit pattern)
+_CODEC = struct.Struct('<d12B12q')
+_FLOAT = struct.Struct('<d')
+_INT = struct.Struct('<q')
+_NONE, _INTEGER, _DOUBLE = 0, 1, 2
+_INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+NANOSECONDS = 1000000000
+
+# `time.monotonic_ns()` is not available before Python 3.7
+monotonic_ns = getattr(time, 'monotonic_ns', None) or (lambda: int(time.monotonic() * NANOSECONDS))
+
+
+def _tiers(values: Optional[Sequence]) -> tuple:
+    values = tuple(values or ())
+    assert len(values) <= 4
+    return values + (None,) * (4 - len(values))
+
+
+class GasPriceSnapshot:
+    """Immutable set of gas prices, max fees and tips obtained by a single refresh.
+
+    Clients publish a new snapshot by swapping a single reference, so all values read
+    from one snapshot always come from the same fetch. Missing values are `None`.
+
+    Freshness is measured on the monotonic clock, so it is not affected by adjustments of the
+    wall clock. Snapshots created with an explicit `timestamp` (for example decoded from a feed
+    or cache written by another process) are placed on the monotonic clock by their wall clock age.
+
+    Attributes:
+        values: All 12 values, indexed by `GAS_PRICE`, `MAX_FEE` or `MAX_TIP` plus the tier.
+        timestamp: Time of the refresh (in seconds since the epoch).
+        fetch_started_ns: `monotonic_ns()` when the request for the values was sent.
+        fetch_finished_ns: `monotonic_ns()` when the values had been received.
+    """
+
+    __slots__ = ('values', 'timestamp', 'fetch_started_ns', 'fetch_finished_ns')
+
+    def __init__(self, gas_prices: Optional[Sequence] = None, max_fees: Optional[Sequence] = None,
+                 max_tips: Optional[Sequence] = None, timestamp: Optional[float] = None,
+                 fetch_started_ns: Optional[int] = None, fetch_finished_ns: Optional[int] = None):
+        now, now_ns = time.time(), monotonic_ns()
+        if timestamp is None:
+            timestamp = now if fetch_finished_ns is None else now - (now_ns - fetch_finished_ns) / NANOSECONDS
+        if fetch_finished_ns is None:
+            fetch_finished_ns = now_ns - int((now - timestamp) * NANOSECONDS)
+
+        object.__setattr__(self, 'values', _tiers(gas_prices) + _tiers(max_fees) + _tiers(max_tips))
+        object.__setattr__(self, 'timestamp', timestamp)
+        object.__setattr__(self, 'fetch_started_ns', fetch_finished_ns if fetch_started_ns is None else fetch_started_ns)
+        object.__setattr__(self, 'fetch_finished_ns', fetch_finished_ns)
+
+    @classmethod
+    def from_values(cls, values: Sequence, timestamp: Optional[float] = None) -> 'GasPriceSnapshot':
+        """Creates a snapshot from all 12 values, ordered like `values`."""
+        assert len(values) == len(SERIES)
+        return cls(values[0:4], values[4:8], values[8:12], timestamp)
+
+    def with_fetch_times(self, started_ns: int, finished_ns: int) -> 'GasPriceSnapshot':
+        """Returns a copy of the snapshot fetched between the `monotonic_ns()` times given."""
+        snapshot = object.__new__(GasPriceSnapshot)
+        object.__setattr__(snapshot, 'values', self.values)
+        object.__setattr__(snapshot, 'timestamp', time.time() - (monotonic_ns() - finished_ns) / NANOSECONDS)
+        object.__setattr__(snapshot, 'fetch_started_ns', started_ns)
+        object.__setattr__(snapshot, 'fetch_finished_ns', finished_ns)
+        return snapshot
+
+    @property
+    def age_ns(self) -> int:
+        """Time elapsed since the values had been received (in nanoseconds)."""
+        return monotonic_ns() - self.fetch_finished_ns
+
+    @property
+    def age(self) -> float:
+        """Time elapsed since the values had been received (in seconds)."""
+        return self.age_ns / NANOSECONDS
+
+    def to_bytes(self) -> bytes:
+        """Encodes the snapshot into `SNAPSHOT_SIZE` bytes, preserving integer and float values exactly."""
+        tags, words = [], []
+        for value in self.values:
+            if value is None:
+                tags.append(_NONE)
+                words.append(0)
+            elif isinstance(value, int) and value in _INT_RANGE:
+                tags.append(_INTEGER)
+                words.append(value)
+            else:
+                tags.append(_DOUBLE)
+                words.append(_INT.unpack(_FLOAT.pack(float(value)))[0])
+
+        return _CODEC.pack(self.timestamp, *tags, *words)
+
+    @classmethod
+    def from_bytes(cls, buffer, offset: int = 0) -> 'GasPriceSnapshot':
+        """Decodes a snapshot encoded by `to_bytes()` from `buffer`, starting at `offset`."""
+        fields = _CODEC.unpack_from(buffer, offset)
+        tags, words = fields[1:13], fields[13:25]
+
+        values = [word if tag == _INTEGER else None if tag == _NONE else _FLOAT.unpack(_INT.pack(word))[0]
+                  for tag, word in zip(tags, words)]
+        return cls.from_values(values, fields[0])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @property
+    def gas_prices(self) -> tuple:
+        return self.values[GAS_PRICE:GAS_PRICE + 4]
+
+    @property
+    def max_fees(self) -> tuple:
+        return self.values[MAX_FEE:MAX_FEE + 4]
+
+    @property
+    def max_tips(self) -> tuple:
+        return self.values[MAX_TIP:MAX_TIP + 4]
+
+    def as_dict(self) -> dict:
+        result = dict(zip(SERIES, self.values))
+        result['timestamp'] = self.timestamp
+        return result
+
+    def __repr__(self):
+        return f"GasPriceSnapshot(values={self.values!r}, timestamp={self.timestamp!r})"
+
+
+def _series_property(index: int):
+    return property(lambda self: self.values[index])
+
+
+for _index, _name in enumerate(SERIES):
+    setattr(GasPriceSnapshot, _name, _series_property(_index))
+
+
+EMPTY_SNAPSHOT = GasPriceSnapshot(timestamp=0)
+
+SNAPSHOT_SIZE = _CODEC.size
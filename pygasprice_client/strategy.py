@@ -0,0 +1,173 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from typing import Optional
+
+from pygasprice_client.batch import PriceMatrix
+
+
+class AggregationStrategy:
+    """Combines the values several providers report for the same series into a single value.
+
+    Subclasses implement `aggregate_series()`, which receives the `(value, client)` pairs of all
+    providers having a value for the series. Strategies able to process all series at once can
+    override `aggregate()` instead.
+
+    An `Aggregator` only re-aggregates the series whose values have changed. Strategies whose
+    results also depend on something else, like the age of the values or state learned from them,
+    set `full_recompute` so that every aggregation recomputes all series.
+    """
+
+    full_recompute = False
+
+    def aggregate(self, matrix: PriceMatrix, columns: list, clients: list) -> list:
+        """Returns one aggregated value per column of `matrix`, whose rows belong to `clients`."""
+        assert len(matrix) == len(clients)
+
+        rows = [matrix.row(row) for row in range(len(matrix))]
+        return [self.aggregate_series([(row[column], client) for row, client in zip(rows, clients) if row[column]])
+                for column in columns]
+
+    def aggregate_series(self, samples: list) -> Optional[float]:
+        raise NotImplementedError
+
+    def combine(self, matrix: PriceMatrix, columns: list, clients: list) -> list:
+        """Like `aggregate()`, but without learning anything from the values.
+
+        Used to combine other values of the same providers than their series, for example the
+        points of their price curves. Strategies keeping state override it.
+        """
+        return self.aggregate(matrix, columns, clients)
+
+
+class PrunedMean(AggregationStrategy):
+    """Prunes the highest (of more than three) and the lowest (of more than two) value and averages the rest.
+
+    This is the behaviour of `Aggregator.aggregate`, similar to the Maker OSM, and the default strategy.
+    """
+
+    def aggregate(self, matrix: PriceMatrix, columns: list, clients: list) -> list:
+        return matrix.aggregate(columns)
+
+    def aggregate_series(self, samples: list) -> Optional[float]:
+        matrix = PriceMatrix(len(samples), width=1)
+        for row, (value, _) in enumerate(samples):
+            matrix.set_row(row, (value,))
+        return matrix.aggregate()[0]
+
+
+class TrimmedMean(AggregationStrategy):
+    """Drops the `k` lowest and `k` highest values and averages the rest.
+
+    With fewer than 2 * `k` + 1 values, as many values are trimmed from both ends as possible
+    while keeping at least one.
+    """
+
+    def __init__(self, k: int = 1):
+        assert isinstance(k, int)
+        assert k >= 0
+        self.k = k
+
+    def aggregate_series(self, samples: list) -> Optional[float]:
+        if len(samples) == 0:
+            return None
+
+        values = sorted(value for value, _ in samples)
+        trim = min(self.k, (len(values) - 1) // 2)
+        kept = values[trim:len(values) - trim]
+        return sum(kept) / len(kept)
+
+
+class WeightedMedian(AggregationStrategy):
+    """Returns the value at which the cumulative weight of the sorted values reaches half of the total.
+
+    Args:
+        weights: Weight per provider, keyed by class name (e.g. `{'Blocknative': 3.0}`).
+        default_weight: Weight of providers missing in `weights`.
+    """
+
+    def __init__(self, weights: Optional[dict] = None, default_weight: float = 1.0):
+        assert isinstance(weights, dict) or weights is None
+        assert default_weight >= 0
+
+        self.weights = weights or {}
+        self.default_weight = default_weight
+
+    def weight(self, client) -> float:
+        return self.weights.get(type(client).__name__, self.default_weight)
+
+    def aggregate_series(self, samples: list) -> Optional[float]:
+        weighted = sorted((value, self.weight(client)) for value, client in samples if self.weight(client) > 0)
+        if len(weighted) == 0:
+            return None
+
+        half = sum(weight for _, weight in weighted) / 2
+        cumulative = 0.0
+        for position, (value, weight) in enumerate(weighted):
+            cumulative += weight
+            if cumulative > half:
+                return value
+            if cumulative == half:
+                # exactly half of the weight lies on both sides
+                return (value + weighted[position + 1][0]) / 2
+
+
+class FreshnessWeightedMean(AggregationStrategy):
+    """Averages values weighted by the freshness and the fetch latency of their provider.
+
+    The weight of a provider halves every `half_life` seconds since its last refresh, and is divided
+    by (1 + latency / `latency_scale`), where latency is the smoothed duration of its fetches. As
+    weights change while values age, all series are re-aggregated every time.
+    """
+
+    full_recompute = True
+
+    def __init__(self, half_life: float = 30.0, latency_scale: float = 1.0):
+        assert half_life > 0
+        assert latency_scale > 0
+
+        self.half_life = half_life
+        self.latency_scale = latency_scale
+
+    def weight(self, client) -> float:
+        snapshot = client.snapshot()
+        if snapshot is None:
+            return 0.0
+
+        age = max(snapshot.age, 0.0)
+        latency = client.latency or 0.0
+        return 0.5 ** (age / self.half_life) / (1 + latency / self.latency_scale)
+
+    def aggregate(self, matrix: PriceMatrix, columns: list, clients: list) -> list:
+        weights = [self.weight(client) for client in clients]
+
+        rows = [matrix.row(row) for row in range(len(matrix))]
+        return [self._mean([(row[column], weight) for row, weight in zip(rows, weights) if row[column]])
+                for column in columns]
+
+    def aggregate_series(self, samples: list) -> Optional[float]:
+        return self._mean([(value, self.weight(client)) for value, client in samples])
+
+    @staticmethod
+    def _mean(weighted: list) -> Optional[float]:
+        total = sum(weight for _, weight in weighted)
+        if total == 0:
+            return None
+        if len(weighted) == 1:
+            return weighted[0][0]
+
+        return sum(value * weight for value, weight in weighted) / total
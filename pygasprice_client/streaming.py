@@ -0,0 +1,240 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import socket
+import time
+from typing import Iterator, Optional
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+from pygasprice_client import GasClientApi
+from pygasprice_client.snapshot import GasPriceSnapshot, monotonic_ns
+
+
+class StreamingGasClientApi(GasClientApi):
+    """Client receiving gas prices pushed by the provider over a persistent connection.
+
+    Instead of polling, the background thread keeps a connection open and every message is
+    parsed by `_parse_api_data()` into a `GasPriceSnapshot` as soon as it arrives. Messages
+    which do not carry prices (acknowledgements, heartbeats) are skipped by returning `None`.
+    Listeners are notified for every published snapshot, so an `Aggregator` including the
+    client re-aggregates on every pushed update.
+
+    If the connection fails or is closed, the client reconnects after `refresh_interval`
+    seconds, backing off through its circuit breaker if reconnecting keeps failing. Prices
+    still expire `expiry` seconds after the last message. Subclasses implement `_messages()`.
+
+    Streaming clients hold their connection on a dedicated thread, so they can not be
+    scheduled by an `AsyncEngine`. `stop()` shuts the current connection down.
+    """
+
+    # response or socket of the current connection, shut down by `stop()`
+    _connection = None
+
+    def __init__(self, url: str, refresh_interval: int, expiry: int, headers=None, **kwargs):
+        assert kwargs.get('engine') is None, "Streaming clients can not be scheduled by an engine"
+        super().__init__(url, refresh_interval, expiry, headers, **kwargs)
+
+    def stop(self):
+        super().stop()
+
+        connection = self._connection
+        if connection is not None:
+            _shutdown(connection)
+
+    def _background_run(self):
+        stopped = self._stopped
+        while stopped is not None and not stopped.is_set():
+            if self.breaker is None or self.breaker.allow():
+                self._stream()
+            stopped.wait(self._next_refresh_delay())
+
+    def _stream(self):
+        """Consumes one connection until it is closed or fails."""
+        try:
+            for message in self._messages():
+                self._handle_message(message)
+        except Exception:
+            if self._stopped is None:
+                # the connection has been shut down by `stop()`
+                return
+
+            self.logger.warning(f"Gas price stream from {self.logger_url} failed")
+            if self.metrics is not None:
+                self.metrics.fetch_failed(self)
+            if self.breaker is not None and self.breaker.record_failure():
+                self.logger.warning(f"Connections to {self.logger_url} are suspended for"
+                                    f" {self.breaker.retry_in():.1f}s after {self.breaker.failures} failures")
+        else:
+            self.logger.info(f"Gas price stream from {self.logger_url} was closed, reconnecting")
+
+    def _messages(self) -> Iterator[str]:
+        """Connects to the provider and yields the payload of every message received."""
+        raise NotImplementedError
+
+    def _handle_message(self, message: str):
+        started, received_ns = time.perf_counter(), monotonic_ns()
+        try:
+            data = json.loads(message)
+            snapshot = self._parse_api_data(data)
+        except Exception:
+            self.logger.warning(f"Failed to parse gas price message from {self.logger_url}")
+            return
+
+        if snapshot is None:
+            return
+
+        if self.recorder is not None:
+            self.recorder.record(self, message.encode() if isinstance(message, str) else message)
+        snapshot = snapshot.with_fetch_times(received_ns, received_ns)
+
+        if self.metrics is not None:
+            self.metrics.fetch_succeeded(self, None, time.perf_counter() - started)
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+        self._publish(snapshot)
+        self.logger.debug(f"Received current gas prices from {self.logger_url}: {data}")
+
+        if self._expired:
+            self.logger.info(f"Current gas prices from {self.logger_url} became available")
+            self._expired = False
+
+        self._notify_listeners()
+
+    def _parse_api_data(self, data) -> Optional[GasPriceSnapshot]:
+        raise NotImplementedError
+
+
+class SSEGasClientApi(StreamingGasClientApi):
+    """Streaming client for Server-Sent Events (`text/event-stream`) feeds.
+
+    The `data` of every event is passed to `_parse_api_data()` as JSON. After a reconnect, the
+    id of the last event received is sent as `Last-Event-ID`, and a `retry` field sent by the
+    server overrides the reconnection delay.
+    """
+
+    def __init__(self, url: str, refresh_interval: int, expiry: int, headers=None, **kwargs):
+        self.last_event_id = None
+        self._reconnect_delay = None
+        super().__init__(url, refresh_interval, expiry, headers, **kwargs)
+
+    def _next_refresh_delay(self) -> float:
+        delay = super()._next_refresh_delay()
+        if self._reconnect_delay is None:
+            return delay
+
+        backoff = self.breaker.retry_in() if self.breaker is not None else 0.0
+        return max(self._reconnect_delay, backoff)
+
+    def _messages(self) -> Iterator[str]:
+        headers = dict(self.headers or {})
+        headers['Accept'] = 'text/event-stream'
+        if self.last_event_id is not None:
+            headers['Last-Event-ID'] = self.last_event_id
+
+        # the server has to send something (at least a comment) before prices expire
+        with self.session_pool.stream(self.URL, headers=headers, read_timeout=self.expiry) as response:
+            self._connection = response
+            response.raise_for_status()
+            if self._stopped is None:
+                return
+
+            # chunks are yielded as they arrive, but a stream delimited by closing the connection
+            # has to be read byte by byte not to block until it ends
+            chunk_size = None if response.raw.chunked else 1
+
+            data = []
+            for line in _lines(response.iter_content(chunk_size=chunk_size)):
+                if line == '':
+                    if data:
+                        yield '\n'.join(data)
+                        data = []
+                    continue
+
+                field, _, value = line.partition(':')
+                if value.startswith(' '):
+                    value = value[1:]
+
+                if field == 'data':
+                    data.append(value)
+                elif field == 'id':
+                    self.last_event_id = value
+                elif field == 'retry' and value.isdigit():
+                    self._reconnect_delay = int(value) / 1000
+
+
+def _shutdown(connection):
+    """Shuts down the socket of a streaming response or a WebSocket, waking up the thread reading it."""
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        # urllib3 response of a streaming `requests.Response`
+        sock = getattr(getattr(getattr(connection, 'raw', None), '_connection', None), 'sock', None)
+
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def _lines(chunks: Iterator[bytes]) -> Iterator[str]:
+    # splits chunks as they arrive, unlike `iter_lines()` which waits for a full buffer
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.rstrip(b'\r').decode('utf-8')
+
+
+class WebSocketGasClientApi(StreamingGasClientApi):
+    """Streaming client for WebSocket feeds, requiring the optional `websocket-client` package.
+
+    Every text message is passed to `_parse_api_data()` as JSON. Subclasses can return the
+    messages to send after connecting (e.g. to subscribe) from `_subscriptions()`.
+    """
+
+    def __init__(self, url: str, refresh_interval: int, expiry: int, headers=None, **kwargs):
+        assert websocket is not None, "WebSocket feeds require the websocket-client package"
+        super().__init__(url, refresh_interval, expiry, headers, **kwargs)
+
+    def _subscriptions(self) -> list:
+        return []
+
+    def _messages(self) -> Iterator[str]:
+        headers = [f"{name}: {value}" for name, value in (self.headers or {}).items()]
+        connection = websocket.create_connection(self.URL, header=headers, timeout=self.expiry)
+        self._connection = connection
+        try:
+            if self._stopped is None:
+                return
+
+            for subscription in self._subscriptions():
+                connection.send(json.dumps(subscription))
+
+            while True:
+                message = connection.recv()
+                if not message:
+                    return
+                yield message
+        finally:
+            connection.close()
@@ -48,6 +48,17 @@ setup(
     #
     # For an analysis of "install_requires" vs pip's requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=requirements
+    install_requires=requirements,
+
+    # Optional dependencies, installed with e.g. `pip install pygasprice-client[websocket]`
+    extras_require={
+        'websocket': ['websocket-client >= 0.58'],
+    },
+
+    entry_points={
+        'console_scripts': [
+            'pygasprice-daemon=pygasprice_client.daemon:main',
+        ],
+    }
 )
 
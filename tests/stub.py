@@ -0,0 +1,311 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class NoEngine:
+    """Engine which never refreshes the clients registered with it, so that tests (and benchmarks)
+    drive every fetch themselves."""
+
+    def register(self, client):
+        pass
+
+    def unregister(self, client):
+        pass
+
+
+class StubServer:
+    """Local HTTP server answering every GET with a fixed JSON payload, counting requests.
+
+    `connect_latency` delays every newly accepted connection, imitating TCP and TLS handshakes,
+    and `latency` every response.
+    """
+
+    def __init__(self, payload: dict, connect_latency: float = 0.0):
+        self.payload = payload
+        self.status = 200
+        self.headers = {}
+        self.connect_latency = connect_latency
+        self.latency = 0.0
+        self.requests = 0
+        self.connections = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                stub.connections += 1
+                time.sleep(stub.connect_latency)
+                super().setup()
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                body = json.dumps(stub.payload).encode()
+                self.send_response(stub.status)
+                for name, value in stub.headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+POA_PAYLOAD = {"health": True, "block_number": 1, "slow": 10.0, "standard": 12.0, "fast": 15.0, "instant": 20.0}
+
+
+class _PushStubServer:
+    """Base of stub servers pushing messages to every connected streaming client."""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.received = []
+        self._changed = threading.Condition()
+        self._closed = False
+
+    def push(self, payload: dict):
+        with self._changed:
+            self.messages.append(json.dumps(payload))
+            self._changed.notify_all()
+
+    def wait_connections(self, connections: int, timeout: float = 5) -> bool:
+        with self._changed:
+            return self._changed.wait_for(lambda: self.connections >= connections, timeout)
+
+    def _connected(self):
+        with self._changed:
+            self.connections += 1
+            self._changed.notify_all()
+            # only messages pushed after connecting are delivered
+            return len(self.messages)
+
+    def _next(self, position: int):
+        """Blocks until a message is pushed after `position`, returning it or `None` once closed."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._closed or len(self.messages) > position)
+            return None if self._closed else self.messages[position]
+
+    def close(self):
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+
+class SSEStubServer(_PushStubServer):
+    """Local Server-Sent Events server, sending every pushed payload as one event."""
+
+    def __init__(self):
+        super().__init__()
+        self.last_event_ids = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.last_event_ids.append(self.headers.get("Last-Event-ID"))
+                position = stub._connected()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self._send(": connected\n\n")
+
+                while True:
+                    message = stub._next(position)
+                    if message is None:
+                        return
+                    position += 1
+                    self._send(f"id: {position}\ndata: {message}\n\n")
+
+            def _send(self, text: str):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/stream"
+
+
+class WebSocketStubServer(_PushStubServer):
+    """Minimal local WebSocket server, sending every pushed payload as a text frame."""
+
+    def __init__(self):
+        super().__init__()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                key = self.headers["Sec-WebSocket-Key"].encode()
+                accept = base64.b64encode(hashlib.sha1(key + b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11").digest())
+
+                self.send_response(101)
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept.decode())
+                self.end_headers()
+                self.wfile.flush()
+
+                position = stub._connected()
+                threading.Thread(target=self._receive, daemon=True).start()
+                while True:
+                    message = stub._next(position)
+                    if message is None:
+                        return
+                    position += 1
+                    payload = message.encode()
+                    header = bytes([0x81, len(payload)]) if len(payload) < 126 \
+                        else bytes([0x81, 126]) + struct.pack("!H", len(payload))
+                    self.wfile.write(header + payload)
+                    self.wfile.flush()
+
+            def _receive(self):
+                # client frames are always masked
+                try:
+                    while True:
+                        opcode, length = self.rfile.read(2)
+                        length &= 0x7f
+                        if length == 126:
+                            length = struct.unpack("!H", self.rfile.read(2))[0]
+                        mask = self.rfile.read(4)
+                        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rfile.read(length)))
+                        if opcode & 0x0f == 0x1:
+                            stub.received.append(payload.decode())
+                except (ValueError, OSError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/"
+
+
+class RPCStubServer:
+    """Local JSON-RPC server simulating the fee market of an Ethereum node.
+
+    `blocks` holds one `(base_fee, rewards, gas_used_ratio)` tuple per block, `rewards` being
+    the priority fees at the requested percentiles. `next_base_fee` is the base fee of the
+    block after the latest. Every call is recorded in `calls` as `(method, params)`.
+    """
+
+    def __init__(self, blocks: list, next_base_fee: int):
+        self.blocks = blocks
+        self.next_base_fee = next_base_fee
+        self.calls = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.calls.append((request["method"], request["params"]))
+
+                method = getattr(stub, request["method"], None)
+                if method is None:
+                    response = {"error": {"code": -32601, "message": "Method not found"}}
+                else:
+                    response = {"result": method(*request["params"])}
+
+                body = json.dumps(dict(response, jsonrpc="2.0", id=request["id"])).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def eth_getBlockByNumber(self, number: str, full: bool) -> dict:
+        assert number == "latest"
+        latest = len(self.blocks) - 1
+        return {"number": hex(latest), "baseFeePerGas": hex(self.blocks[latest][0])}
+
+    def eth_feeHistory(self, count: str, newest: str, percentiles: list) -> dict:
+        newest = int(newest, 16)
+        oldest = max(newest - int(count, 16) + 1, 0)
+        blocks = self.blocks[oldest:newest + 1]
+        return {"oldestBlock": hex(oldest),
+                "baseFeePerGas": [hex(base_fee) for base_fee, _, _ in blocks] + [hex(self.next_base_fee)],
+                "gasUsedRatio": [ratio for _, _, ratio in blocks],
+                "reward": [[hex(reward) for reward in rewards] for _, rewards, _ in blocks]}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
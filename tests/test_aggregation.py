@@ -15,11 +15,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 import pytest
+import threading
 import time
 
 from pygasprice_client import GasClientApi
 from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.scoring import QualityScoring
+from pygasprice_client.strategy import TrimmedMean, FreshnessWeightedMean
+from pygasprice_client.snapshot import GasPriceSnapshot, NANOSECONDS
+from tests.stub import NoEngine
 
 GWEI = 1000000000
 
@@ -28,7 +34,7 @@ GWEI = 1000000000
 def test_aggregator():
     aggregator = Aggregator(10, 600)
 
-    time.sleep(3)  # Since there's no synchronous API, wait a few seconds for data to become available
+    assert aggregator.wait_ready(10)
 
     assert aggregator.safe_low_price()
     assert aggregator.standard_price()
@@ -85,34 +91,28 @@ def test_london_aggregation():
             self.expiry = 600
             self.headers = None
 
-            # indexed 0 (safe low) to 3 (fastest)
-            self._gas_prices = []
-            self._max_fees = []
-            self._max_tips = []
-
-            self._last_refresh = 0
             self._expired = True
 
         def _fetch_price(self):
             print("MockGasClient._fetch_price called")
-            self._parse_api_data(None)
-            self._last_refresh = int(time.time())
+            self._snapshot = self._parse_api_data(None)
             self._expired = False
 
         def _parse_api_data(self, data):
             print("MockGasClient._parse_api_data called")
-            self._gas_prices = [int(55 * self.SCALE * self.multiplier),
-                                int(56 * self.SCALE * self.multiplier),
-                                int(57 * self.SCALE * self.multiplier),
-                                int(58 * self.SCALE * self.multiplier)]
-            self._max_fees = [int(100) * self.SCALE * self.multiplier,
-                              int(110) * self.SCALE * self.multiplier,
-                              int(120) * self.SCALE * self.multiplier,
-                              int(130) * self.SCALE * self.multiplier]
-            self._max_tips = [int(1) * self.SCALE * self.multiplier,
-                              int(2) * self.SCALE * self.multiplier,
-                              int(3) * self.SCALE * self.multiplier,
-                              int(4) * self.SCALE * self.multiplier]
+            gas_prices = [int(55 * self.SCALE * self.multiplier),
+                          int(56 * self.SCALE * self.multiplier),
+                          int(57 * self.SCALE * self.multiplier),
+                          int(58 * self.SCALE * self.multiplier)]
+            max_fees = [int(100) * self.SCALE * self.multiplier,
+                        int(110) * self.SCALE * self.multiplier,
+                        int(120) * self.SCALE * self.multiplier,
+                        int(130) * self.SCALE * self.multiplier]
+            max_tips = [int(1) * self.SCALE * self.multiplier,
+                        int(2) * self.SCALE * self.multiplier,
+                        int(3) * self.SCALE * self.multiplier,
+                        int(4) * self.SCALE * self.multiplier]
+            return GasPriceSnapshot(gas_prices, max_fees, max_tips)
 
     class AggregatorTestHarness(Aggregator):
         def __init__(self):
@@ -139,3 +139,177 @@ def test_london_aggregation():
     assert aggregator.safe_low_price() == (55 + 55*2)/2 * GWEI
     assert aggregator.standard_maxfee() == (110 + 110*2)/2 * GWEI
     assert aggregator.fast_tip() == (3 + 3*2)/2 * GWEI
+
+
+class ManualGasClient(GasClientApi):
+    """Client refreshed explicitly by the test instead of by a background thread."""
+
+    def __init__(self):
+        super().__init__("(manual)", 600, 600, engine=NoEngine())
+        self.data = None
+
+    def push(self, gas_prices: list):
+        self.data = gas_prices
+        self._fetch_price()
+
+    def _fetch_price(self):
+        self._snapshot = self._parse_api_data(self.data)
+        self._expired = False
+        self._notify_listeners()
+
+    def _parse_api_data(self, data):
+        return GasPriceSnapshot(gas_prices=[price * GWEI for price in data])
+
+
+def test_event_driven_aggregation():
+    class AggregatorTestHarness(Aggregator):
+        aggregations = 0
+
+        def __init__(self):
+            super().__init__(600, 600, clients=[ManualGasClient(), ManualGasClient(), ManualGasClient()],
+                             engine=NoEngine())
+
+        @staticmethod
+        def aggregate(values: list):
+            AggregatorTestHarness.aggregations += 1
+            return Aggregator.aggregate(values)
+
+    aggregator = AggregatorTestHarness()
+    assert aggregator.fast_price() is None
+
+    # A refresh of a single client is visible immediately, without waiting for `refresh_interval`
+    aggregator.clients[0].push([10, 20, 30, 40])
+    assert aggregator.fast_price() == 30 * GWEI
+    assert AggregatorTestHarness.aggregations == 4
+
+    aggregator.clients[1].push([10, 20, 40, 50])
+    assert aggregator.fast_price() == 35 * GWEI
+    assert aggregator.fastest_price() == 45 * GWEI
+
+    # Only the tiers whose inputs changed are recomputed
+    AggregatorTestHarness.aggregations = 0
+    aggregator.clients[1].push([10, 20, 40, 60])
+    assert AggregatorTestHarness.aggregations == 1
+    assert aggregator.fastest_price() == 50 * GWEI
+    assert aggregator.safe_low_price() == 10 * GWEI
+
+    # A refresh without changes does not recompute anything
+    AggregatorTestHarness.aggregations = 0
+    aggregator.clients[2].push([0, 0, 0, 0])
+    aggregator.clients[1].push([10, 20, 40, 60])
+    assert AggregatorTestHarness.aggregations == 0
+
+
+@pytest.mark.timeout(15)
+def test_wait_ready_quorum():
+    aggregator = Aggregator(600, 600, clients=[ManualGasClient(), ManualGasClient(), ManualGasClient()],
+                            engine=NoEngine())
+    assert not aggregator.wait_ready(0.1)
+
+    threading.Timer(0.2, aggregator.clients[0].push, [[10, 20, 30, 40]]).start()
+    threading.Timer(0.4, aggregator.clients[1].push, [[10, 20, 30, 40]]).start()
+
+    started = time.time()
+    assert aggregator.wait_ready(5)
+    assert aggregator.providers_ready() == 1
+    assert aggregator.wait_ready(5, quorum=2)
+    assert time.time() - started < 2
+    assert aggregator.providers_ready() == 2
+
+    assert not aggregator.wait_ready(0.1, quorum=3)
+    loop = asyncio.new_event_loop()
+    try:
+        assert not loop.run_until_complete(aggregator.ready(0.1, quorum=3))
+
+        threading.Timer(0.2, aggregator.clients[2].push, [[10, 20, 30, 40]]).start()
+        assert loop.run_until_complete(aggregator.ready(5, quorum=3))
+    finally:
+        loop.close()
+
+
+def test_quality_scoring():
+    clients = [ManualGasClient(), ManualGasClient(), ManualGasClient()]
+    aggregator = Aggregator(600, 600, clients=clients, strategy=QualityScoring(), engine=NoEngine())
+    assert aggregator.provider_scores() == {}
+
+    clients[0].push([10, 20, 30, 40])
+    clients[1].push([10, 20, 30, 40])
+    # inverted tiers of the third client are left out
+    clients[2].push([40, 30, 20, 10])
+    assert aggregator.fast_price() == pytest.approx(30 * GWEI)
+    assert aggregator.provider_scores()[clients[2]]['violations'] == 1.0
+    assert aggregator.provider_scores()[clients[0]]['violations'] == 0.0
+
+
+def test_quarantine_applies_to_unchanged_series():
+    clients = [ManualGasClient() for _ in range(4)]
+    # a plain mean of the corrected values includes the outlier with full weight until it is quarantined
+    scoring = QualityScoring(TrimmedMean(k=0), deviation_scale=0.5, min_samples=5, window=10)
+    aggregator = Aggregator(600, 600, clients=clients, strategy=scoring, engine=NoEngine())
+
+    for step in range(30):
+        for client in clients[:3]:
+            client.push([10, 20, 30, 40 + step % 2])
+        clients[3].push([price * (4 if step % 2 else 0.25) for price in (10, 20, 30, 40)])
+        if aggregator.provider_scores()[clients[3]]['quarantined']:
+            break
+
+    assert aggregator.provider_scores()[clients[3]]['quarantined']
+
+    # only the fastest price of the others changes, the outlier's values stay the same
+    for client in clients[:3]:
+        client.push([10, 20, 30, 45])
+    assert aggregator.safe_low_price() == pytest.approx(10 * GWEI, rel=0.01)
+    assert aggregator.fast_price() == pytest.approx(30 * GWEI, rel=0.01)
+
+
+def test_freshness_weights_follow_age():
+    clients = [ManualGasClient(), ManualGasClient()]
+    aggregator = Aggregator(600, 600, clients=clients, strategy=FreshnessWeightedMean(half_life=30.0),
+                            engine=NoEngine())
+
+    clients[0].push([10, 20, 30, 40])
+    clients[1].push([10, 20, 60, 80])
+    assert aggregator.fast_price() == pytest.approx(45 * GWEI, rel=0.001)
+
+    # the values of the second client stay the same while they age
+    snapshot = clients[1]._snapshot
+    clients[1]._snapshot = snapshot.with_fetch_times(snapshot.fetch_started_ns - 300 * NANOSECONDS,
+                                                     snapshot.fetch_finished_ns - 300 * NANOSECONDS)
+    aggregator._fetch_price()
+    assert aggregator.fast_price() == pytest.approx(30 * GWEI, rel=0.001)
+
+
+def test_aggregate_is_as_old_as_its_oldest_input():
+    clients = [ManualGasClient(), ManualGasClient()]
+    aggregator = Aggregator(600, 600, clients=clients, engine=NoEngine())
+
+    clients[0].push([10, 20, 30, 40])
+    clients[1].push([10, 20, 30, 40])
+    assert aggregator.fast_price(max_age=5) == 30 * GWEI
+
+    snapshot = clients[1]._snapshot
+    clients[1]._snapshot = snapshot.with_fetch_times(snapshot.fetch_started_ns - 300 * NANOSECONDS,
+                                                     snapshot.fetch_finished_ns - 300 * NANOSECONDS)
+    aggregator._fetch_price()
+    assert clients[1].fast_price(max_age=5) is None
+    assert aggregator.fast_price(max_age=5) is None
+    assert aggregator.fast_price(max_age=400) == 30 * GWEI
+    assert aggregator.snapshot().age == pytest.approx(300, abs=1)
+
+
+def test_expired_inputs_are_dropped():
+    clients = [ManualGasClient(), ManualGasClient()]
+    for client in clients:
+        client.expiry = 1
+    aggregator = Aggregator(600, 1, clients=clients, engine=NoEngine())
+
+    clients[0].push([10, 20, 30, 40])
+    clients[1].push([10, 20, 40, 50])
+    assert aggregator.fast_price() == 35 * GWEI
+
+    # the second provider stops refreshing while the first one goes on
+    time.sleep(1.2)
+    clients[0].push([10, 20, 30, 40])
+    assert aggregator.fast_price() == 30 * GWEI
+    assert aggregator.snapshot().age < 1
@@ -0,0 +1,89 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+
+import pytest
+
+from pygasprice_client import batch
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.batch import PriceMatrix, aggregate_batch
+
+GWEI = 1000000000
+
+implementations = [False, pytest.param(True, marks=pytest.mark.skipif(not batch.NUMPY_INSTALLED,
+                                                                       reason="NumPy is not installed"))]
+
+
+def expected(rows: list) -> list:
+    return [Aggregator.aggregate([row[column] for row in rows if row[column]]) for column in range(len(rows[0]))]
+
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_matches_aggregate(use_numpy):
+    generator = random.Random(1559)
+    for providers in [1, 2, 3, 4, 5, 50, 500]:
+        rows = [[generator.choice([None, 0, generator.randint(1, 500) * GWEI]) for _ in range(12)]
+                for _ in range(providers)]
+        assert aggregate_batch(rows, use_numpy=use_numpy) == expected(rows)
+
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_matches_aggregate_for_fractional_values(use_numpy):
+    generator = random.Random(1559)
+    for providers in [1, 2, 3, 4, 5, 50, 500]:
+        rows = [[generator.choice([None, 0, generator.uniform(1, 500) * GWEI, generator.uniform(0.1, 3.0)])
+                 for _ in range(12)]
+                for _ in range(providers)]
+        assert aggregate_batch(rows, use_numpy=use_numpy) == expected(rows)
+
+    # whole numbers whose sum is too large to be represented exactly
+    rows = [[2 ** 53 - 1], [3], [5], [2 ** 53 - 1], [2 ** 52 + 1]]
+    assert aggregate_batch(rows, use_numpy=use_numpy) == expected(rows)
+
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_methodology(use_numpy):
+    rows = [[24 * GWEI, 64 * GWEI, 16.80 * GWEI, 23 * GWEI, 33.3 * GWEI, None],
+            [15 * GWEI, 64 * GWEI, 18.00 * GWEI, 24 * GWEI, None, None],
+            [24 * GWEI, 72 * GWEI, 15.65 * GWEI, None, None, None],
+            [127 * GWEI, 65 * GWEI, None, None, None, None],
+            [13 * GWEI, None, None, None, None, None]]
+
+    assert aggregate_batch(rows, use_numpy=use_numpy) == [21 * GWEI, 64.5 * GWEI, 17.4 * GWEI, 23.5 * GWEI,
+                                                          33.3 * GWEI, None]
+    assert aggregate_batch(rows, columns=[1, 5], use_numpy=use_numpy) == [64.5 * GWEI, None]
+    assert isinstance(aggregate_batch(rows, columns=[4], use_numpy=use_numpy)[0], float)
+    assert aggregate_batch([], columns=[0]) == [None]
+
+
+@pytest.mark.parametrize("use_numpy", implementations)
+def test_price_matrix_updates(use_numpy):
+    matrix = PriceMatrix(3, width=2, use_numpy=use_numpy)
+    assert matrix.aggregate() == [None, None]
+
+    matrix.set_row(0, (10 * GWEI, None))
+    assert matrix.aggregate() == [10 * GWEI, None]
+
+    matrix.set_row(1, (20 * GWEI, 5 * GWEI))
+    matrix.set_row(2, (30 * GWEI, None))
+    assert matrix.aggregate() == [25 * GWEI, 5 * GWEI]
+    assert matrix.aggregate(columns=[1]) == [5 * GWEI]
+
+    matrix.set_row(2, (None, None))
+    assert matrix.aggregate() == [15 * GWEI, 5 * GWEI]
+    assert matrix.row(1) == (20 * GWEI, 5 * GWEI)
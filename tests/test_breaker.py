@@ -0,0 +1,106 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import functools
+import time
+
+import pytest
+
+from pygasprice_client import POANetwork
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from pygasprice_client.session import SessionPool
+from tests.stub import NoEngine, StubServer, POA_PAYLOAD
+from tests.test_aggregation import ManualGasClient, GWEI
+
+
+def test_breaker_states():
+    breaker = CircuitBreaker(failure_threshold=2, base_delay=0.2, max_delay=0.4, jitter=0)
+    assert breaker.state == CLOSED
+    assert not breaker.record_failure()
+    assert breaker.allow()
+
+    # the threshold opens the breaker, and requests are refused until the backoff delay has passed
+    assert breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert 0.1 < breaker.retry_in() <= 0.2
+
+    time.sleep(0.25)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # a failed probe opens the breaker again with a doubled delay, capped at `max_delay`
+    assert breaker.record_failure()
+    assert 0.3 < breaker.retry_in() <= 0.4
+    assert breaker.record_failure()
+    assert 0.3 < breaker.retry_in() <= 0.4
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.as_dict() == {'state': CLOSED, 'failures': 0, 'trips': 0, 'retry_in': 0.0}
+
+
+def test_breaker_jitter():
+    delays = set()
+    for _ in range(20):
+        breaker = CircuitBreaker(failure_threshold=1, base_delay=10, jitter=0.2)
+        breaker.record_failure()
+        delays.add(round(breaker.retry_in(), 3))
+
+    assert all(7.9 <= delay <= 12 for delay in delays)
+    assert len(delays) > 1
+
+
+@pytest.mark.timeout(15)
+def test_client_breaker_suspends_requests():
+    server = StubServer(POA_PAYLOAD)
+    try:
+        breaker_factory = functools.partial(CircuitBreaker, failure_threshold=2, base_delay=60, jitter=0)
+        client = POANetwork(600, 600, alt_url=server.url, session_pool=SessionPool(retries=0),
+                            breaker_factory=breaker_factory)
+        assert client.wait_ready(5)
+
+        server.status = 500
+        client._fetch_price()
+        client._fetch_price()
+        assert client.breaker.state == OPEN
+        assert client._next_refresh_delay() == 600
+
+        requests = server.requests
+        client._fetch_price()
+        assert server.requests == requests
+    finally:
+        server.close()
+
+
+def test_aggregator_skips_open_circuits():
+    aggregator = Aggregator(600, 600, clients=[ManualGasClient(), ManualGasClient()], engine=NoEngine())
+    aggregator.clients[0].push([10, 20, 30, 40])
+    aggregator.clients[1].push([10, 20, 50, 60])
+    assert aggregator.fast_price() == 40 * GWEI
+
+    breaker = aggregator.clients[1].breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    aggregator.clients[1].snapshot = None   # would fail if the aggregator read it
+
+    aggregator._fetch_price()
+    assert aggregator.fast_price() == 30 * GWEI
+    assert aggregator.clients[0].breaker.state == CLOSED
+    assert aggregator.breaker_states() == {aggregator.clients[0]: CLOSED, aggregator.clients[1]: OPEN}
@@ -0,0 +1,86 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+
+import pytest
+
+from pygasprice_client import POANetwork
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.cache import SnapshotCache
+from pygasprice_client.snapshot import GasPriceSnapshot
+from tests.stub import NoEngine, StubServer, POA_PAYLOAD
+from tests.test_aggregation import ManualGasClient
+
+GWEI = 1000000000
+
+
+def test_store_and_load(tmpdir):
+    cache = SnapshotCache(str(tmpdir.join("cache")))
+    assert cache.load("missing") is None
+
+    cache.store("key", GasPriceSnapshot([10 * GWEI, 20 * GWEI], timestamp=1234))
+    assert cache.load("key").values[:3] == (10 * GWEI, 20 * GWEI, None)
+    assert cache.load("key").timestamp == 1234
+    assert os.listdir(cache.directory) == ["key.snapshot"]
+
+    # corrupt files are ignored
+    with open(cache.path("key"), "r+b") as file:
+        file.seek(20)
+        file.write(b"\xff")
+    assert cache.load("key") is None
+
+
+@pytest.mark.timeout(15)
+def test_client_warm_start(tmpdir):
+    cache = SnapshotCache(str(tmpdir))
+    server = StubServer(POA_PAYLOAD)
+    try:
+        client = POANetwork(600, 600, alt_url=server.url, cache=cache)
+        assert client.wait_ready(5)
+    finally:
+        server.close()
+
+    # the provider is down after the restart, yet cached prices are served right away
+    restarted = POANetwork(600, 600, alt_url=server.url, cache=cache)
+    assert restarted.wait_ready(0)
+    assert restarted.fast_price() == 15 * GWEI
+
+    # unless they are older than `expiry`
+    time.sleep(0.01)
+    assert not POANetwork(600, 0, alt_url=server.url, cache=cache).wait_ready(0)
+
+
+def test_aggregator_warm_start(tmpdir):
+    class AggregatorTestHarness(Aggregator):
+        def __init__(self):
+            super().__init__(600, 600, clients=[ManualGasClient(), ManualGasClient()], cache=cache, engine=NoEngine())
+
+    cache = SnapshotCache(str(tmpdir))
+    aggregator = AggregatorTestHarness()
+    aggregator.clients[0].push([10, 20, 30, 40])
+    aggregator.clients[1].push([10, 20, 50, 60])
+    assert aggregator.fast_price() == 40 * GWEI
+
+    restarted = AggregatorTestHarness()
+    assert restarted.fast_price() == 40 * GWEI
+
+    # the first live aggregation replaces all restored values
+    restarted.clients[0].push([10, 20, 30])
+    assert restarted.fast_price() == 30 * GWEI
+    assert restarted.fastest_price() is None
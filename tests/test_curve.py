@@ -0,0 +1,125 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from pygasprice_client import GasClientApi, Blocknative
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.curve import PriceCurve, tier_points
+from pygasprice_client.parsing import loads
+from pygasprice_client.scoring import QualityScoring
+from pygasprice_client.snapshot import GasPriceSnapshot
+from pygasprice_client.strategy import TrimmedMean, WeightedMedian
+from benchmarks.payloads import PAYLOADS
+from tests.stub import NoEngine
+
+GWEI = 1000000000
+
+
+class FixedGasClient(GasClientApi):
+    """Client holding the snapshots published by the test instead of fetching any."""
+
+    def __init__(self, snapshot: GasPriceSnapshot):
+        super().__init__("(fixed)", 600, 600, engine=NoEngine())
+        self._publish(snapshot)
+
+
+def test_curve_passes_through_tiers():
+    snapshot = GasPriceSnapshot([10 * GWEI, 20 * GWEI, 30 * GWEI, 40 * GWEI], max_tips=[1 * GWEI, 2 * GWEI, 3 * GWEI])
+    curve = PriceCurve.from_points(snapshot, tier_points(snapshot, GasClientApi.TIER_TARGETS))
+
+    for (blocks, confidence), price in zip(GasClientApi.TIER_TARGETS, snapshot.gas_prices):
+        assert curve.gas_price(blocks, confidence) == pytest.approx(price, rel=0.001)
+    assert curve.max_tip(25, 0.9) == pytest.approx(2 * GWEI, rel=0.001)
+    assert curve.max_fee(25, 0.9) is None
+
+    # more urgent targets are never cheaper, and targets beyond the tiers get the outermost tier
+    assert curve.gas_price(10, 0.5) < curve.gas_price(10, 0.9) < curve.gas_price(5, 0.9) < 40 * GWEI
+    assert curve.gas_price(1, 0.999) == 40 * GWEI
+    assert curve.gas_price(1000, 0.5) == 10 * GWEI
+    assert curve.max_tip(1, 0.999) == pytest.approx(3 * GWEI, rel=0.001)
+
+
+def test_client_price_within():
+    client = FixedGasClient(GasPriceSnapshot([10 * GWEI, 20 * GWEI, 30 * GWEI, 40 * GWEI]))
+
+    assert client.price_within(25) == pytest.approx(20 * GWEI, rel=0.001)
+    assert client.price_curve() is client.price_curve()
+    assert client.tip_within(25) is None
+
+    client._publish(GasPriceSnapshot([20 * GWEI, 40 * GWEI, 60 * GWEI, 80 * GWEI]))
+    assert client.price_within(25) == pytest.approx(40 * GWEI, rel=0.001)
+
+    assert client.price_within(25, max_age=-1) is None
+
+
+def test_blocknative_confidence_levels():
+    client = Blocknative(600, 600, api_key="key", engine=NoEngine())
+    client._publish(client._parse_api_data(loads(PAYLOADS['Blocknative'])))
+
+    # the 70% level is not one of the tiers
+    assert client.tip_within(1, 0.7) == pytest.approx(1.06 * GWEI, rel=0.005)
+    assert client.tip_within(1, 0.99) == pytest.approx(2.5 * GWEI, rel=0.005)
+    assert client.maxfee_within(1, 0.9) == pytest.approx(61.69 * GWEI, rel=0.005)
+
+
+def test_aggregated_curve():
+    clients = [FixedGasClient(GasPriceSnapshot([price * GWEI for price in prices]))
+               for prices in ([10, 20, 30, 40], [20, 40, 60, 80])]
+    aggregator = Aggregator(600, 600, clients=clients, engine=NoEngine())
+    aggregator._fetch_price()
+
+    assert aggregator.price_within(25) == pytest.approx(30 * GWEI, rel=0.001)
+    assert aggregator.price_within(2) == pytest.approx(60 * GWEI, rel=0.001)
+
+
+def test_aggregated_curve_follows_strategy():
+    clients = [FixedGasClient(GasPriceSnapshot([price * GWEI for price in prices]))
+               for prices in ([10, 20, 30, 40], [20, 40, 60, 80], [90, 180, 270, 360])]
+
+    # the pruned mean of three values drops the lowest one, the weighted median takes the middle one
+    aggregator = Aggregator(600, 600, clients=clients, engine=NoEngine())
+    aggregator._fetch_price()
+    assert aggregator.price_within(25) == pytest.approx(110 * GWEI, rel=0.001)
+
+    aggregator = Aggregator(600, 600, clients=clients, strategy=WeightedMedian(), engine=NoEngine())
+    aggregator._fetch_price()
+    assert aggregator.price_within(25) == pytest.approx(40 * GWEI, rel=0.001)
+
+    # quarantined providers are left out
+    strategy = QualityScoring(TrimmedMean(k=0))
+    aggregator = Aggregator(600, 600, clients=clients, strategy=strategy, engine=NoEngine())
+    aggregator._fetch_price()
+    strategy._scores[id(clients[2])].quarantined = True
+    aggregator._fetch_price()
+    assert aggregator.price_within(25) == pytest.approx(30 * GWEI, rel=0.001)
+
+
+def test_aggregated_curve_is_combined_when_a_curve_changes():
+    clients = [FixedGasClient(GasPriceSnapshot([price * GWEI for price in prices]))
+               for prices in ([10, 20, 30, 40], [20, 40, 60, 80])]
+    aggregator = Aggregator(600, 600, clients=clients, engine=NoEngine())
+    aggregator._fetch_price()
+    curve = aggregator.price_curve()
+
+    aggregator._fetch_price()
+    assert aggregator.price_curve() is not curve
+    assert aggregator.price_curve()._tables is curve._tables
+
+    clients[1]._publish(GasPriceSnapshot([40 * GWEI, 80 * GWEI, 120 * GWEI, 160 * GWEI]))
+    aggregator._fetch_price()
+    assert aggregator.price_within(25) == pytest.approx(50 * GWEI, rel=0.001)
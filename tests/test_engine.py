@@ -0,0 +1,118 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from pygasprice_client import POANetwork
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.engine import AsyncEngine
+from tests.stub import StubServer, POA_PAYLOAD
+
+GWEI = 1000000000
+
+
+@pytest.mark.timeout(15)
+def test_engine_refreshes_registered_clients():
+    server = StubServer(POA_PAYLOAD)
+    engine = AsyncEngine(max_workers=2)
+    try:
+        threads_before = threading.active_count()
+        clients = [POANetwork(1, 600, alt_url=server.url, engine=engine) for _ in range(20)]
+        for client in clients:
+            assert client.wait_ready(5)
+
+        assert engine.clients == 20
+        for client in clients:
+            assert client.safe_low_price() == 10 * GWEI
+            assert client.fastest_price() == 20 * GWEI
+
+        # No per-client threads, only the bounded pool of the engine
+        pool_threads = [thread for thread in threading.enumerate() if thread.name.startswith("gasprice")]
+        assert len(pool_threads) <= engine.max_workers
+        assert threading.active_count() - threads_before < len(clients)
+    finally:
+        engine.stop()
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_engine_unregister():
+    server = StubServer(POA_PAYLOAD)
+    engine = AsyncEngine(max_workers=1)
+    try:
+        client = POANetwork(1, 600, alt_url=server.url, engine=engine)
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(client.ready(5))
+        finally:
+            loop.close()
+
+        engine.unregister(client)
+        time.sleep(0.2)
+        assert engine.clients == 0
+
+        requests_seen = server.requests
+        time.sleep(1.5)
+        assert server.requests == requests_seen
+    finally:
+        engine.stop()
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_lazy_start():
+    server = StubServer(POA_PAYLOAD)
+    try:
+        client = POANetwork(1, 600, alt_url=server.url, lazy=True)
+        time.sleep(0.5)
+        assert server.requests == 0
+
+        # the first access starts refreshing
+        client.fast_price()
+        assert client.wait_ready(5)
+        assert client.fast_price() == 15 * GWEI
+
+        client.stop()
+        time.sleep(0.2)
+        requests_seen = server.requests
+        time.sleep(1.5)
+        assert server.requests == requests_seen
+    finally:
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_context_manager():
+    server = StubServer(POA_PAYLOAD)
+    engine = AsyncEngine(max_workers=1)
+    try:
+        with Aggregator(1, 600, providers=['POANetwork'], poa_network_alt_url=server.url, engine=engine,
+                        lazy=True) as aggregator:
+            assert [type(client) for client in aggregator.clients] == [POANetwork]
+            assert aggregator.wait_ready(5)
+            assert aggregator.fast_price() == 15 * GWEI
+            assert engine.clients == 2
+
+        time.sleep(0.2)
+        assert engine.clients == 0
+    finally:
+        engine.stop()
+        server.close()
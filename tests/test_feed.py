@@ -0,0 +1,124 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+import os
+import stat
+import struct
+import time
+
+import pytest
+
+from pygasprice_client import feed
+from pygasprice_client.feed import SharedFeedClient, SharedFeedReader, SharedFeedWriter
+from pygasprice_client.snapshot import GasPriceSnapshot
+
+GWEI = 1000000000
+
+
+def publish_from_other_process(path: str):
+    writer = SharedFeedWriter(path)
+    writer.publish(GasPriceSnapshot([1 * GWEI, 2 * GWEI, 3 * GWEI, 4 * GWEI]))
+    writer.close()
+
+
+def test_reader_waits_for_writer(tmpdir):
+    path = str(tmpdir.join("feed"))
+    reader = SharedFeedReader(path)
+    assert reader.read() is None
+
+    writer = SharedFeedWriter(path)
+    assert reader.read() is None
+
+    writer.publish(GasPriceSnapshot([10 * GWEI, 20 * GWEI, 30 * GWEI, 40 * GWEI], timestamp=1234))
+    sequence, snapshot = reader.read()
+    assert snapshot.fast_price == 30 * GWEI
+    assert snapshot.timestamp == 1234
+
+    # unchanged feeds are not decoded again
+    assert reader.read(sequence) is None
+
+    writer.publish(GasPriceSnapshot([11 * GWEI]))
+    assert reader.read(sequence)[0] == sequence + 2
+
+
+def test_reader_skips_incomplete_writes(tmpdir):
+    path = str(tmpdir.join("feed"))
+    writer = SharedFeedWriter(path)
+    writer.publish(GasPriceSnapshot([10 * GWEI]))
+
+    # an odd sequence number marks a write in progress
+    struct.pack_into('<Q', writer._mmap, 8, 3)
+    assert SharedFeedReader(path, max_attempts=10).read() is None
+
+    # a restarted writer continues after the interrupted write
+    writer = SharedFeedWriter(path)
+    writer.publish(GasPriceSnapshot([12 * GWEI]))
+    assert SharedFeedReader(path).read()[0] == 6
+
+
+@pytest.mark.timeout(15)
+def test_feed_client(tmpdir):
+    path = str(tmpdir.join("feed"))
+    client = SharedFeedClient(600, 600, path=path)
+    assert client.fast_price() is None
+
+    process = multiprocessing.get_context("spawn").Process(target=publish_from_other_process, args=(path,))
+    process.start()
+    process.join()
+
+    # no need to wait for a refresh, reads see the latest published snapshot
+    assert client.fast_price() == 3 * GWEI
+    assert client.wait_ready(0)
+
+    client.expiry = 0
+    time.sleep(0.01)
+    assert client.fast_price() is None
+
+
+def test_feed_is_private(tmpdir):
+    path = os.path.join(str(tmpdir), "pygasprice", "feed")
+    writer = SharedFeedWriter(path)
+    writer.publish(GasPriceSnapshot([1 * GWEI, 2 * GWEI, 3 * GWEI, 4 * GWEI]))
+    writer.close()
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+    assert SharedFeedReader(path).read() is not None
+
+    # feeds of other users or writable by them are not trusted
+    assert SharedFeedReader(path, owner=os.geteuid() + 1).read() is None
+    os.chmod(path, 0o666)
+    assert SharedFeedReader(path).read() is None
+    with pytest.raises(PermissionError):
+        SharedFeedWriter(path)
+
+    # nor are symbolic links
+    link = os.path.join(str(tmpdir), "link")
+    os.symlink(path, link)
+    os.chmod(path, 0o600)
+    assert SharedFeedReader(link).read() is None
+    with pytest.raises(OSError):
+        SharedFeedWriter(link)
+
+
+def test_default_feed_path(monkeypatch, tmpdir):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmpdir))
+    assert feed._default_feed_path() == os.path.join(str(tmpdir), "pygasprice.feed")
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert os.path.basename(os.path.dirname(feed._default_feed_path())) == f"pygasprice-{os.geteuid()}"
@@ -0,0 +1,150 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+
+import pytest
+
+from pygasprice_client import POANetwork, FAST
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.history import GasPriceHistory
+from pygasprice_client.snapshot import GasPriceSnapshot, GAS_PRICE, MAX_FEE, NANOSECONDS
+from tests.stub import NoEngine, StubServer, POA_PAYLOAD
+from tests.test_aggregation import ManualGasClient
+
+GWEI = 1000000000
+
+
+def history_of(prices: list, capacity: int = 8) -> GasPriceHistory:
+    history = GasPriceHistory(capacity)
+    for timestamp, price in enumerate(prices):
+        history.append(GasPriceSnapshot(gas_prices=[price, price, price, price], timestamp=1000 + timestamp,
+                                        fetch_finished_ns=timestamp * NANOSECONDS))
+    return history
+
+
+def test_ring_buffer_is_bounded():
+    history = history_of(list(range(1, 21)))
+    assert len(history) == 8
+    assert history.values('fast_price') == [13, 14, 15, 16, 17, 18, 19, 20]
+    assert history.latest_timestamp() == 1019
+
+
+def test_windows():
+    history = history_of([10, 20, 30, 40, 50])
+    assert history.values(GAS_PRICE + FAST, samples=2) == [40, 50]
+    assert history.values(GAS_PRICE + FAST, seconds=2) == [30, 40, 50]
+    assert history.values(GAS_PRICE + FAST, samples=2, seconds=3) == [40, 50]
+
+    # missing values are skipped
+    assert history.values(MAX_FEE + FAST) == []
+    assert history.median('fast_maxfee') is None
+
+
+def test_percentiles():
+    history = history_of([50, 10, 40, 20, 30])
+    assert history.median('fast_price') == 30
+    assert history.percentile('fast_price', 0) == 10
+    assert history.percentile('fast_price', 100) == 50
+    assert history.percentile('fast_price', 25) == 20
+    assert history.percentile('fast_price', 90) == pytest.approx(46)
+    assert history.median('fast_price', samples=2) == 25
+
+
+def test_rolling_percentiles():
+    def percentile(values: list, percent: float):
+        ordered = sorted(values)
+        if len(ordered) == 0:
+            return None
+        rank = (len(ordered) - 1) * percent / 100
+        lower, upper = int(rank), min(int(rank) + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+    generator = random.Random(1559)
+    history = GasPriceHistory(16)
+    windows = [(None, None), (5, None), (None, 3.5), (8, 6.0)]
+    for sequence in range(200):
+        price = generator.choice([None, generator.randint(1, 50), generator.randint(1, 50)])
+        history.append(GasPriceSnapshot(gas_prices=[price] * 4, timestamp=1000 + sequence,
+                                        fetch_finished_ns=sequence * NANOSECONDS))
+
+        # windows are updated after every append, after a few, or rebuilt after more than `capacity`
+        if sequence < 100 or generator.random() < 0.05:
+            for samples, seconds in windows:
+                values = history.values('fast_price', samples, seconds)
+                for percent in (0, 25, 50, 90, 100):
+                    assert history.percentile('fast_price', percent, samples, seconds) == \
+                        pytest.approx(percentile(values, percent))
+
+
+def test_windows_follow_the_monotonic_clock():
+    history = GasPriceHistory(8)
+    # the wall clock has been set back between the second and third snapshot
+    for sequence, (price, timestamp) in enumerate([(10, 1000), (20, 1001), (30, 500), (40, 501)]):
+        history.append(GasPriceSnapshot(gas_prices=[price] * 4, timestamp=timestamp,
+                                        fetch_finished_ns=sequence * NANOSECONDS))
+
+    assert history.values('fast_price', seconds=1.5) == [30, 40]
+    assert history.median('fast_price', seconds=1.5) == 35
+    assert history.latest_timestamp() == 501
+
+
+def test_aggregator_records_changes():
+    clients = [ManualGasClient(), ManualGasClient()]
+    aggregator = Aggregator(600, 600, clients=clients, engine=NoEngine())
+
+    clients[0].push([10, 20, 30, 40])
+    clients[1].push([10, 20, 30, 40])
+    aggregator._fetch_price()
+    assert len(aggregator.history) == 1
+
+    clients[1].push([20, 30, 40, 50])
+    assert len(aggregator.history) == 2
+    assert aggregator.history.values('fast_price') == [30 * GWEI, 35 * GWEI]
+
+
+def test_ema():
+    history = history_of([10, 10, 10])
+    assert history.ema('fast_price', 3) == 10
+
+    # new samples are folded into the cached average
+    history.append(GasPriceSnapshot(gas_prices=[20, 20, 20, 20], timestamp=2000))
+    assert history.ema('fast_price', 3) == 15
+    assert history.ema('fast_price', 3) == 15
+
+
+def test_volatility():
+    assert history_of([10, 10, 10, 10]).volatility('fast_price') == 0
+    assert history_of([10, 11]).volatility('fast_price') is None
+    assert history_of([10, 20, 10, 20]).volatility('fast_price') > 0.5
+
+
+@pytest.mark.timeout(15)
+def test_client_records_history():
+    server = StubServer(POA_PAYLOAD)
+    try:
+        client = POANetwork(600, 600, alt_url=server.url, history_size=4)
+        assert client.wait_ready(5)
+        for _ in range(5):
+            client._fetch_price()
+
+        assert len(client.history) == 4
+        assert client.history.median('fast_price') == 15 * GWEI
+
+        assert POANetwork(600, 600, alt_url=server.url, history_size=0).history is None
+    finally:
+        server.close()
@@ -0,0 +1,70 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+from decimal import Decimal
+
+import pytest
+
+from pygasprice_client import Blocknative, EthGasStation, Etherscan, EtherchainOrg
+from pygasprice_client.parsing import loads, to_wei
+from benchmarks.payloads import PAYLOADS
+
+GWEI = 1000000000
+
+
+def test_to_wei_is_exact():
+    assert to_wei("0.29") == 290000000
+    assert to_wei(0.29) == 290000000
+    assert to_wei(30) == 30 * GWEI
+    assert to_wei("30.093218461") == 30093218461
+    assert to_wei(Decimal("1.5")) == 1500000000
+    assert to_wei("41.5", scale=10 ** 8) == 4150000000
+    assert to_wei(1e22) == 10 ** 31
+    assert to_wei("1e-05") == 10000
+
+    generator = random.Random(1)
+    for _ in range(10000):
+        wei = generator.randint(0, 10 ** 15)
+        text = f"{wei // GWEI}.{wei % GWEI:09d}"
+        assert to_wei(text) == wei
+        assert to_wei(float(text)) == wei
+
+
+def test_to_wei_rejects_non_amounts():
+    with pytest.raises(TypeError):
+        to_wei(True)
+    with pytest.raises(ValueError):
+        to_wei("nan")
+    with pytest.raises(ValueError):
+        to_wei("")
+
+
+def parse(cls, name: str):
+    # parsers are used without starting a client
+    return object.__new__(cls)._parse_api_data(loads(PAYLOADS[name]))
+
+
+def test_provider_parsers():
+    assert parse(EtherchainOrg, 'EtherchainOrg').gas_prices == (31100000000, 33300000000, 36600000000, 41100000000)
+    assert parse(EthGasStation, 'EthGasStation').gas_prices == (33 * GWEI, 35 * GWEI, 42 * GWEI, 48 * GWEI)
+    assert parse(Etherscan, 'Etherscan').fast_price == 38 * GWEI
+
+    # fractional Gwei are no longer truncated
+    snapshot = parse(Blocknative, 'Blocknative')
+    assert snapshot.max_tips == (1170000000, 1500000000, 1830000000, 2500000000)
+    assert snapshot.fastest_maxfee == 62690000000
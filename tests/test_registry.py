@@ -0,0 +1,126 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import threading
+import time
+
+import pytest
+
+from pygasprice_client import EtherchainOrg, Etherscan, GasClientApi, POANetwork
+from pygasprice_client.registry import ChainRegistry
+from pygasprice_client.session import SessionPool
+from pygasprice_client.snapshot import GasPriceSnapshot
+from pygasprice_client.strategy import TrimmedMean
+from tests.stub import NoEngine, StubServer, POA_PAYLOAD
+
+GWEI = 1000000000
+
+ETHERCHAIN_PAYLOAD = {"safeLow": "1", "standard": "2", "fast": "3", "fastest": "4"}
+
+
+class DelayedGasClient(GasClientApi):
+    """Client delivering prices once, `delay` seconds after it has been created."""
+
+    def __init__(self, refresh_interval: int, expiry: int, delay: float, **kwargs):
+        super().__init__("(delayed)", refresh_interval, expiry, **kwargs)
+        self._timer = threading.Timer(delay, self._deliver)
+        self._timer.start()
+
+    def _deliver(self):
+        self._publish(GasPriceSnapshot([1 * GWEI, 2 * GWEI, 3 * GWEI, 4 * GWEI]))
+        self._notify_listeners()
+
+    def _fetch_price(self):
+        pass
+
+
+def test_provider_url():
+    etherscan = Etherscan(600, 600, api_key="key", url="https://api.polygonscan.com/api?module=gastracker",
+                          engine=NoEngine())
+    assert etherscan.URL == "https://api.polygonscan.com/api?module=gastracker&apikey=key"
+    assert Etherscan.URL.startswith("https://api.etherscan.io")
+
+
+@pytest.mark.timeout(15)
+def test_registry_serves_all_chains(tmpdir, monkeypatch):
+    mainnet, gnosis = StubServer(POA_PAYLOAD), StubServer(ETHERCHAIN_PAYLOAD)
+    monkeypatch.setenv("GNOSIS_URL", gnosis.url)
+
+    config = {
+        "defaults": {"refresh_interval": 600, "expiry": 600},
+        "max_workers": 2,
+        "chains": {
+            "mainnet": {
+                "strategy": {"name": "TrimmedMean", "k": 0},
+                "providers": [{"type": "POANetwork", "url": mainnet.url},
+                              {"type": "EtherchainOrg", "url": mainnet.url + "/etherchain", "expiry": 0}]
+            },
+            "gnosis": {
+                "refresh_interval": 300,
+                "providers": [{"type": "EtherchainOrg", "url_env": "GNOSIS_URL"}]
+            }
+        }
+    }
+    path = tmpdir.join("chains.json")
+    path.write(json.dumps(config))
+
+    session_pool = SessionPool()
+    registry = ChainRegistry.from_file(str(path), session_pool=session_pool)
+    try:
+        assert registry.chains == ["mainnet", "gnosis"]
+        assert registry.wait_ready(5)
+
+        mainnet_clients = registry["mainnet"].clients
+        assert [type(client) for client in mainnet_clients] == [POANetwork, EtherchainOrg]
+        assert isinstance(registry["mainnet"].strategy, TrimmedMean)
+        assert mainnet_clients[1].expiry == 0
+        assert registry.chain("gnosis").refresh_interval == 300
+        assert registry["gnosis"].clients[0].URL == gnosis.url
+
+        # one engine and one session per host serve all chains
+        assert registry.engine.clients == 5
+        assert all(client.session_pool is session_pool for client in mainnet_clients)
+        assert sorted(session_pool.hosts) == sorted([mainnet.url, gnosis.url])
+
+        assert registry["mainnet"].fast_price() == 15 * GWEI
+        assert registry["gnosis"].fast_price() == 3 * GWEI
+    finally:
+        registry.stop()
+        mainnet.close()
+        gnosis.close()
+
+
+def test_registry_wait_ready_shares_the_timeout():
+    config = {
+        "defaults": {"refresh_interval": 600, "expiry": 600},
+        "chains": {
+            "mainnet": {"providers": [{"type": DelayedGasClient, "delay": 0.4}]},
+            "gnosis": {"providers": [{"type": DelayedGasClient, "delay": 0.8}]}
+        }
+    }
+
+    # the second chain is not ready when the timeout has elapsed, although it would be within the timeout
+    # counted from when the first one became ready
+    started = time.monotonic()
+    registry = ChainRegistry(config)
+    try:
+        assert not registry.wait_ready(0.6)
+        assert time.monotonic() - started < 0.75
+        assert registry.wait_ready(1)
+    finally:
+        registry.stop()
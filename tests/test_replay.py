@@ -0,0 +1,89 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+
+import pytest
+
+from pygasprice_client import POANetwork
+from pygasprice_client.recording import FeedRecorder, Record, read_records
+from pygasprice_client.replay import FeedReplay
+from pygasprice_client.strategy import FreshnessWeightedMean
+from tests.stub import NoEngine, StubServer, POA_PAYLOAD
+
+GWEI = 1000000000
+
+ETHERCHAIN_PAYLOAD = {"safeLow": "1", "standard": "2", "fast": "3", "fastest": "4"}
+
+
+def record(provider: str, timestamp: float, payload: dict) -> Record:
+    return Record(provider, timestamp, 0.0, json.dumps(payload).encode())
+
+
+@pytest.mark.timeout(15)
+def test_recording(tmpdir):
+    path = str(tmpdir.join("feed.log"))
+    server = StubServer(POA_PAYLOAD)
+    recorder = FeedRecorder(path)
+    try:
+        client = POANetwork(600, 600, url=server.url, engine=NoEngine(), recorder=recorder)
+        client._fetch_price()
+        client._fetch_price()
+    finally:
+        recorder.close()
+        server.close()
+
+    # a frame cut short by a crash ends the log
+    with open(path, 'ab') as file:
+        file.write(b'\x10\x00')
+
+    records = list(read_records(path))
+    assert [record.provider for record in records] == ['POANetwork', 'POANetwork']
+    assert json.loads(records[0].body) == POA_PAYLOAD
+    assert records[0].timestamp <= records[1].timestamp
+    assert records[0].duration >= 0
+
+    # recording appends to existing logs
+    recorder = FeedRecorder(path)
+    recorder.close()
+    assert len(list(read_records(path))) == 2
+
+
+def test_replay_expires_providers():
+    records = [record('POANetwork', 1000, POA_PAYLOAD),
+               record('EtherchainOrg', 1001, ETHERCHAIN_PAYLOAD),
+               record('EtherchainOrg', 1300, ETHERCHAIN_PAYLOAD)]
+    replay = FeedReplay(records, refresh_interval=10, expiry=100)
+
+    results = list(replay.run())
+    assert [timestamp for timestamp, _ in results] == [1000, 1001, 1300]
+    assert results[0][1].fast_price == 15 * GWEI
+    assert results[1][1].fast_price == 9 * GWEI
+    # prices of POANetwork had expired long before
+    assert results[2][1].fast_price == 3 * GWEI
+    assert sorted(replay.clients) == ['EtherchainOrg', 'POANetwork']
+
+
+def test_replay_recorded_ages():
+    records = [record('POANetwork', 1000, POA_PAYLOAD),
+               record('EtherchainOrg', 1010, ETHERCHAIN_PAYLOAD)]
+    replay = FeedReplay(records, expiry=600, strategy=FreshnessWeightedMean(half_life=10, latency_scale=1000))
+
+    # POANetwork prices are one half-life old when EtherchainOrg's arrive
+    *_, (timestamp, snapshot) = replay.run()
+    assert snapshot.fast_price == pytest.approx((15 * 0.5 + 3) / 1.5 * GWEI, rel=1e-4)
+    assert replay.clients['POANetwork'].snapshot().age == pytest.approx(10, abs=0.5)
@@ -0,0 +1,76 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from email.utils import formatdate
+import time
+
+import pytest
+
+from pygasprice_client import POANetwork, Etherscan
+from pygasprice_client.scheduler import AdaptiveSchedule, retry_after
+from pygasprice_client.snapshot import GasPriceSnapshot
+from tests.stub import StubServer, POA_PAYLOAD
+
+
+def prices(fast: int) -> GasPriceSnapshot:
+    return GasPriceSnapshot(gas_prices=[fast, fast, fast, fast])
+
+
+def test_adaptive_schedule():
+    schedule = AdaptiveSchedule(min_interval=2, max_interval=60, threshold=0.05, speedup=0.5, backoff=2)
+
+    # stable prices back off up to the ceiling
+    assert schedule.next_interval(10, prices(100), prices(101)) == 20
+    assert schedule.next_interval(40, prices(100), prices(100)) == 60
+    assert schedule.next_interval(10, None, prices(100)) == 20
+
+    # volatile prices refresh faster, down to the floor
+    assert schedule.next_interval(10, prices(100), prices(110)) == 5
+    assert schedule.next_interval(3, prices(100), prices(50)) == 2
+
+    assert AdaptiveSchedule.change(prices(100), prices(110)) == pytest.approx(0.1)
+    assert AdaptiveSchedule.change(GasPriceSnapshot(), prices(110)) == 0
+
+
+def test_retry_after():
+    assert retry_after("7", default=1) == 7
+    assert retry_after(None, default=1) == 1
+    assert retry_after("garbage", default=1) == 1
+    assert 25 <= retry_after(formatdate(time.time() + 30, usegmt=True), default=1) <= 30
+
+
+def test_provider_minimum_interval():
+    assert Etherscan(1, 600)._next_refresh_delay() == 5
+    assert Etherscan(1, 600, api_key="abcdefg")._next_refresh_delay() == 1
+
+
+@pytest.mark.timeout(15)
+def test_rate_limited_client_backs_off():
+    server = StubServer(POA_PAYLOAD)
+    try:
+        schedule = AdaptiveSchedule(min_interval=1, max_interval=60, backoff=2)
+        client = POANetwork(10, 600, alt_url=server.url, schedule=schedule)
+        assert client.wait_ready(5)
+        assert client._next_refresh_delay() == 20
+
+        server.status = 429
+        server.headers = {"Retry-After": "120"}
+        client._fetch_price()
+        assert 115 <= client._next_refresh_delay() <= 120
+        assert client.fast_price() is not None
+    finally:
+        server.close()
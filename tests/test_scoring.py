@@ -0,0 +1,111 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+
+import pytest
+
+from pygasprice_client.batch import PriceMatrix
+from pygasprice_client.registry import strategy
+from pygasprice_client.scoring import QualityScoring
+from pygasprice_client.snapshot import GasPriceSnapshot
+from pygasprice_client.strategy import TrimmedMean
+
+GWEI = 1000000000
+
+
+class FakeClient:
+    expiry = 600
+
+    def snapshot(self):
+        return GasPriceSnapshot()
+
+
+class Etherscan(FakeClient):
+    pass
+
+
+class Noisy(FakeClient):
+    pass
+
+
+def aggregate(scoring: QualityScoring, clients: list, rows: list) -> list:
+    matrix = PriceMatrix(len(rows), width=4)
+    for row, values in enumerate(rows):
+        matrix.set_row(row, values)
+    return scoring.aggregate(matrix, [0, 1, 2, 3], clients)
+
+
+def tiers(base: float, fastest: float = 1.4) -> tuple:
+    return base * GWEI, base * 1.1 * GWEI, base * 1.2 * GWEI, base * fastest * GWEI
+
+
+def test_bias_correction():
+    scoring = QualityScoring(min_samples=5)
+    clients = [FakeClient(), FakeClient(), Etherscan()]
+
+    for step in range(30):
+        base = 20 + step % 3
+        # Etherscan reports its fast price as the fastest one
+        results = aggregate(scoring, clients, [tiers(base), tiers(base), tiers(base, fastest=1.2)])
+
+    assert results[3] == pytest.approx(base * 1.4 * GWEI, rel=0.01)
+    assert results[0] == pytest.approx(base * GWEI, rel=0.01)
+
+    scores = scoring.scores(clients)
+    assert scores[clients[2]]['bias'][3] < -0.1
+    assert not scores[clients[2]]['quarantined']
+
+
+def test_quarantine_and_release():
+    scoring = QualityScoring(min_samples=5, window=10)
+    clients = [FakeClient(), FakeClient(), FakeClient(), Noisy()]
+    random.seed(1)
+
+    for step in range(30):
+        base = 20 + step % 3
+        noisy = tiers(base * random.choice([0.3, 3.0]))
+        results = aggregate(scoring, clients, [tiers(base)] * 3 + [noisy])
+
+    assert scoring.scores(clients)[clients[-1]]['quarantined']
+    assert results[0] == pytest.approx(base * GWEI)
+
+    for step in range(30):
+        base = 20 + step % 3
+        aggregate(scoring, clients, [tiers(base)] * 4)
+
+    assert not scoring.scores(clients)[clients[-1]]['quarantined']
+
+
+def test_inverted_tiers_are_dropped():
+    scoring = QualityScoring()
+    clients = [FakeClient(), FakeClient(), Noisy()]
+
+    inverted = (40 * GWEI, 30 * GWEI, 20 * GWEI, 10 * GWEI)
+    results = aggregate(scoring, clients, [tiers(20), tiers(20), inverted])
+
+    assert results == pytest.approx(list(tiers(20)))
+    assert scoring.scores(clients)[clients[-1]]['violations'] == 1.0
+    assert scoring.scores(clients)[clients[0]]['violations'] == 0.0
+
+
+def test_wrapped_strategy_from_config():
+    scoring = strategy({'name': 'QualityScoring', 'window': 20, 'strategy': {'name': 'TrimmedMean', 'k': 1}})
+
+    assert isinstance(scoring, QualityScoring)
+    assert isinstance(scoring.strategy, TrimmedMean)
+    assert scoring.window == 20
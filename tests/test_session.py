@@ -0,0 +1,185 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import time
+
+import pytest
+import requests
+
+from pygasprice_client import POANetwork
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.session import SessionPool, default_session_pool
+from tests.stub import NoEngine, StubServer, POA_PAYLOAD
+
+
+def test_session_per_host():
+    pool = SessionPool()
+    first = pool.session_for("https://api.etherscan.io/api?module=gastracker&action=gasoracle")
+    second = pool.session_for("https://api.etherscan.io/api?module=gastracker&action=gasoracle&apikey=abc")
+    other = pool.session_for("https://www.etherchain.org/api/gasPriceOracle")
+
+    assert first is second
+    assert first is not other
+    assert len(pool.hosts) == 2
+
+    pool.close()
+    assert pool.hosts == []
+
+
+def test_default_session_pool_is_shared():
+    assert default_session_pool() is default_session_pool()
+
+
+@pytest.mark.timeout(15)
+def test_connections_are_reused():
+    server = StubServer(POA_PAYLOAD)
+    pool = SessionPool()
+    try:
+        clients = [POANetwork(600, 600, alt_url=server.url, session_pool=pool) for _ in range(3)]
+        for client in clients:
+            assert client.wait_ready(5)
+
+        connections = server.connections
+        for _ in range(5):
+            for client in clients:
+                client._fetch_price()
+
+        assert server.connections == connections
+    finally:
+        pool.close()
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_hedged_requests():
+    slow, fast = StubServer(POA_PAYLOAD), StubServer(dict(POA_PAYLOAD, fast=16.0))
+    slow.latency = 2.0
+    pool = SessionPool(retries=0)
+    try:
+        # the mirror answers first once the hedge delay has passed
+        started = time.perf_counter()
+        response = pool.hedged_get([slow.url, fast.url], delay=0.1)
+        assert response.json()['fast'] == 16.0
+        assert time.perf_counter() - started < 1.0
+        assert slow.requests == 1 and fast.requests == 1
+
+        # a failed request is hedged immediately
+        slow.latency, slow.status = 0.0, 500
+        started = time.perf_counter()
+        assert pool.hedged_get([slow.url, fast.url], delay=5.0).json()['fast'] == 16.0
+        assert time.perf_counter() - started < 1.0
+
+        # if all requests fail, the last response is returned
+        fast.status = 503
+        assert pool.hedged_get([slow.url, fast.url], delay=5.0).status_code in (500, 503)
+    finally:
+        pool.close()
+        slow.close()
+        fast.close()
+
+
+@pytest.mark.timeout(15)
+def test_hedged_requests_deadline():
+    first, second = StubServer(POA_PAYLOAD), StubServer(POA_PAYLOAD)
+    first.latency = second.latency = 2.0
+    pool = SessionPool(retries=2, backoff_factor=0.0)
+    try:
+        # requests still in flight are abandoned once the deadline has passed
+        started = time.perf_counter()
+        with pytest.raises(requests.Timeout):
+            pool.hedged_get([first.url, second.url], delay=0.1, deadline=0.5)
+        assert time.perf_counter() - started < 1.0
+
+        # hedged requests are not retried, unlike the requests of `get()`
+        first.latency, first.status = 0.0, 500
+        second.latency, second.status = 0.0, 503
+        requests_before = first.requests
+        assert pool.hedged_get([first.url, second.url], delay=5.0).status_code in (500, 503)
+        assert first.requests == requests_before + 1
+
+        requests_before = first.requests
+        assert pool.get(first.url).status_code == 500
+        assert first.requests == requests_before + 3
+    finally:
+        pool.close()
+        first.close()
+        second.close()
+
+
+@pytest.mark.timeout(15)
+def test_client_mirrors():
+    primary, mirror = StubServer(POA_PAYLOAD), StubServer(dict(POA_PAYLOAD, fast=16.0))
+    primary.status = 500
+    try:
+        client = POANetwork(600, 600, alt_url=primary.url, mirrors=[mirror.url], session_pool=SessionPool(retries=0))
+        assert client.wait_ready(5)
+        assert client.fast_price() == 16 * 1000000000
+        assert client.hedge_delay() == POANetwork.HEDGE_DELAY
+
+        client._latencies.extend([0.01] * 95 + [0.5] * 5)
+        assert client.hedge_delay() == 0.01
+    finally:
+        primary.close()
+        mirror.close()
+
+
+@pytest.mark.timeout(15)
+def test_hedge_delay_follows_the_primary():
+    primary, mirror = StubServer(POA_PAYLOAD), StubServer(dict(POA_PAYLOAD, fast=16.0))
+    try:
+        client = POANetwork(600, 600, alt_url=primary.url, mirrors=[mirror.url], session_pool=SessionPool(retries=0))
+        assert client.wait_ready(5)
+        assert len(client._latencies) == 1
+        assert client._latencies[0] < 0.5
+
+        # the mirror answers while the primary is slow, without recording hedged durations
+        client._latencies.extend([0.05] * 20)
+        primary.latency = 0.5
+        for _ in range(30):
+            client._fetch_price()
+        assert client.fast_price() == 16 * 1000000000
+        assert client.hedge_delay() == 0.05
+    finally:
+        primary.close()
+        mirror.close()
+
+
+def test_aggregator_hedges_alt_url():
+    aggregator = Aggregator(600, 600, providers=['POANetwork'], poa_network_alt_url="http://127.0.0.1:8000",
+                            engine=NoEngine())
+    assert aggregator.clients[0].URL == "http://127.0.0.1:8000"
+    assert aggregator.clients[0].mirrors == [POANetwork.URL]
+
+    aggregator = Aggregator(600, 600, providers=['POANetwork'], engine=NoEngine())
+    assert aggregator.clients[0].URL == POANetwork.URL
+    assert aggregator.clients[0].mirrors == []
+
+
+def test_retry_logs_are_redacted(caplog):
+    pool = SessionPool(retries=1, backoff_factor=0.0)
+    try:
+        with caplog.at_level(logging.DEBUG):
+            # nothing listens on the discard port, so the connection is refused and retried
+            with pytest.raises(Exception):
+                pool.get("http://127.0.0.1:9/api?module=gastracker&apikey=secret")
+
+        assert "Retrying" in caplog.text
+        assert "apikey=***" in caplog.text
+        assert "secret" not in caplog.text
+    finally:
+        pool.close()
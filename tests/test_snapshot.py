@@ -0,0 +1,140 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import pytest
+
+from pygasprice_client import POANetwork, FAST
+from pygasprice_client.snapshot import GasPriceSnapshot, MAX_TIP, SNAPSHOT_SIZE, monotonic_ns
+from tests.stub import StubServer, POA_PAYLOAD
+
+GWEI = 1000000000
+
+
+def test_snapshot_is_immutable():
+    snapshot = GasPriceSnapshot([1, 2, 3, 4], [10, 20, 30, 40], [5, 6, 7, 8], timestamp=1234)
+
+    with pytest.raises(AttributeError):
+        snapshot.timestamp = 0
+    with pytest.raises(AttributeError):
+        snapshot.other = 0
+    assert not hasattr(snapshot, '__dict__')
+
+    assert snapshot.values[MAX_TIP + FAST] == 7
+    assert snapshot.fast_tip == 7
+    assert snapshot.max_fees == (10, 20, 30, 40)
+    assert snapshot.as_dict()['fastest_price'] == 4
+    assert snapshot.as_dict()['timestamp'] == 1234
+
+
+def test_missing_values():
+    snapshot = GasPriceSnapshot(gas_prices=[1, 2, 3, 4])
+    assert snapshot.safe_low_maxfee is None
+    assert snapshot.max_tips == (None, None, None, None)
+    assert GasPriceSnapshot.from_values(snapshot.values).values == snapshot.values
+
+
+
+def test_binary_encoding():
+    snapshot = GasPriceSnapshot([10 * GWEI, 20.5 * GWEI, None, 2 ** 70], [1], timestamp=1234.5)
+    decoded = GasPriceSnapshot.from_bytes(snapshot.to_bytes())
+
+    assert len(snapshot.to_bytes()) == SNAPSHOT_SIZE
+    assert decoded.values == (10 * GWEI, 20.5 * GWEI, None, float(2 ** 70), 1) + (None,) * 7
+    assert isinstance(decoded.safe_low_price, int)
+    assert decoded.timestamp == 1234.5
+
+
+def test_snapshot_age():
+    # snapshots created from a wall clock time are placed on the monotonic clock by their age
+    snapshot = GasPriceSnapshot([1], timestamp=time.time() - 10)
+    assert snapshot.age == pytest.approx(10, abs=0.1)
+    assert snapshot.fetch_started_ns == snapshot.fetch_finished_ns
+
+    started_ns = monotonic_ns() - 2000000000
+    fetched = snapshot.with_fetch_times(started_ns, started_ns + 1000000000)
+    assert fetched.values == snapshot.values
+    assert fetched.fetch_started_ns == started_ns
+    assert fetched.age == pytest.approx(1, abs=0.1)
+    assert fetched.timestamp == pytest.approx(time.time() - 1, abs=0.1)
+
+@pytest.mark.timeout(15)
+def test_client_snapshot():
+    server = StubServer(POA_PAYLOAD)
+    try:
+        client = POANetwork(600, 2, alt_url=server.url)
+        assert client.wait_ready(5)
+
+        snapshot = client.snapshot()
+        assert snapshot.safe_low_price == 10 * GWEI
+        assert snapshot.fastest_price == 20 * GWEI
+        assert snapshot.fast_maxfee is None
+        assert client.fast_price() == snapshot.fast_price
+
+        # Expired snapshots are not returned
+        time.sleep(3)
+        assert client.snapshot() is None
+        assert client.fast_price() is None
+    finally:
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_expiry_deadline(monkeypatch):
+    server = StubServer(POA_PAYLOAD)
+    try:
+        client = POANetwork(600, 600, alt_url=server.url)
+        assert client.wait_ready(5)
+
+        # validity is checked against the monotonic clock, so wall clock jumps do not expire prices
+        wall_clock = time.time
+        monkeypatch.setattr(time, 'time', lambda: wall_clock() + 3600)
+        assert client.fast_price() == 15 * GWEI
+        monkeypatch.undo()
+
+        # the deadline accounts for the age of snapshots fetched before they were published
+        client._swap(GasPriceSnapshot([1, 2, 3, 4], timestamp=time.time() - 700))
+        assert client.fast_price() is None
+
+        client.expiry = 800
+        assert client.fast_price() == 3
+    finally:
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_max_age():
+    server = StubServer(POA_PAYLOAD)
+    try:
+        client = POANetwork(600, 600, alt_url=server.url)
+        assert client.wait_ready(5)
+
+        snapshot = client.snapshot()
+        assert snapshot.fetch_started_ns <= snapshot.fetch_finished_ns <= monotonic_ns()
+        assert 0 <= snapshot.age < 5
+
+        time.sleep(0.1)
+        assert client.fast_price(max_age=0.05) is None
+        assert client.snapshot(max_age=0.05) is None
+        assert client.fast_price(max_age=5) == 15 * GWEI
+
+        # a stricter age for one call does not expire the client
+        assert client.fast_price() == 15 * GWEI
+        assert not client._expired
+    finally:
+        server.close()
@@ -0,0 +1,97 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import pytest
+
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.batch import PriceMatrix
+from pygasprice_client.snapshot import GasPriceSnapshot, NANOSECONDS, monotonic_ns
+from pygasprice_client.strategy import PrunedMean, TrimmedMean, WeightedMedian, FreshnessWeightedMean
+
+GWEI = 1000000000
+
+
+class FakeClient:
+    # all fakes are aged from the same instant, so that their ages differ by exactly what is given
+    EPOCH = time.time(), monotonic_ns()
+
+    def __init__(self, age: float = 0.0, latency: float = None):
+        self.latency = latency
+        now, now_ns = FakeClient.EPOCH
+        fetched_ns = now_ns - int(age * NANOSECONDS)
+        self._snapshot = GasPriceSnapshot(timestamp=now - age, fetch_started_ns=fetched_ns,
+                                          fetch_finished_ns=fetched_ns)
+
+    def snapshot(self):
+        return self._snapshot
+
+
+class Blocknative(FakeClient):
+    pass
+
+
+class Etherscan(FakeClient):
+    pass
+
+
+def matrix_of(values: list) -> PriceMatrix:
+    matrix = PriceMatrix(len(values), width=1)
+    for row, value in enumerate(values):
+        matrix.set_row(row, (value,))
+    return matrix
+
+
+def test_pruned_mean_is_the_default():
+    prices = [24.00 * GWEI, 15.00 * GWEI, 24.00 * GWEI, 127.00 * GWEI, 13.00 * GWEI]
+    clients = [FakeClient() for _ in prices]
+
+    assert PrunedMean().aggregate(matrix_of(prices), [0], clients) == [Aggregator.aggregate(list(prices))]
+    assert PrunedMean().aggregate_series([(price, None) for price in prices]) == 21.0 * GWEI
+
+
+def test_trimmed_mean():
+    samples = [(value, None) for value in [1, 2, 3, 4, 100, 200]]
+    assert TrimmedMean(k=2).aggregate_series(samples) == 3.5
+    assert TrimmedMean(k=0).aggregate_series(samples) == 310 / 6
+    assert TrimmedMean(k=5).aggregate_series(samples) == 3.5
+    assert TrimmedMean(k=5).aggregate_series([(7, None)]) == 7
+    assert TrimmedMean().aggregate_series([]) is None
+
+
+def test_weighted_median():
+    strategy = WeightedMedian(weights={'Blocknative': 3.0, 'Etherscan': 0.0})
+    assert strategy.aggregate_series([(10, FakeClient()), (20, Blocknative()), (30, FakeClient())]) == 20
+    assert strategy.aggregate_series([(10, FakeClient()), (30, FakeClient())]) == 20
+    assert strategy.aggregate_series([(10, Etherscan())]) is None
+
+    # a heavily weighted provider outvotes several others
+    assert strategy.aggregate_series([(10, FakeClient()), (11, FakeClient()), (50, Blocknative())]) == 50
+
+
+def test_freshness_weighted_mean():
+    strategy = FreshnessWeightedMean(half_life=10.0, latency_scale=1.0)
+    fresh, stale, slow = FakeClient(age=0), FakeClient(age=10), FakeClient(age=0, latency=1.0)
+
+    assert strategy.aggregate_series([(10, fresh), (40, stale)]) == pytest.approx(20)
+    assert strategy.aggregate_series([(10, fresh), (40, slow)]) == pytest.approx(20)
+
+    matrix = PriceMatrix(2, width=2)
+    matrix.set_row(0, (10, None))
+    matrix.set_row(1, (40, 5))
+    assert strategy.aggregate(matrix, [0, 1], [fresh, stale]) == [pytest.approx(20), 5]
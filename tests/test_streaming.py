@@ -0,0 +1,139 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2021 MakerDAO
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import threading
+
+import pytest
+
+from pygasprice_client import streaming
+from pygasprice_client.aggregator import Aggregator
+from pygasprice_client.snapshot import GasPriceSnapshot
+from pygasprice_client.streaming import SSEGasClientApi, WebSocketGasClientApi
+from tests.stub import NoEngine, SSEStubServer, WebSocketStubServer
+
+GWEI = 1000000000
+
+
+def parse(data):
+    if 'prices' not in data:
+        return None
+    return GasPriceSnapshot(gas_prices=[price * GWEI for price in data['prices']])
+
+
+class SSEClient(SSEGasClientApi):
+    def __init__(self, url: str, **kwargs):
+        super().__init__(url, 1, 600, **kwargs)
+
+    def _parse_api_data(self, data):
+        return parse(data)
+
+
+class WebSocketClient(WebSocketGasClientApi):
+    def __init__(self, url: str, **kwargs):
+        super().__init__(url, 1, 600, **kwargs)
+
+    def _subscriptions(self) -> list:
+        return [{"subscribe": "gasprices"}]
+
+    def _parse_api_data(self, data):
+        return parse(data)
+
+
+def wait_for_update(client) -> threading.Event:
+    updated = threading.Event()
+    client.add_listener(lambda _: updated.set())
+    return updated
+
+
+@pytest.mark.timeout(15)
+def test_sse_client():
+    server = SSEStubServer()
+    try:
+        client = SSEClient(server.url)
+        assert server.wait_connections(1)
+        assert client.fast_price() is None
+
+        server.push({"prices": [10, 20, 30, 40]})
+        assert client.wait_ready(5)
+        assert client.fast_price() == 30 * GWEI
+
+        # messages without prices are skipped
+        updated = wait_for_update(client)
+        server.push({"heartbeat": True})
+        server.push({"prices": [10, 20, 35, 40]})
+        assert updated.wait(5)
+        assert client.fast_price() == 35 * GWEI
+        assert client.breaker.state == 'closed'
+
+        # sent as `Last-Event-ID` when reconnecting
+        assert client.last_event_id == "3"
+        assert server.last_event_ids == [None]
+    finally:
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_streaming_aggregation():
+    server = SSEStubServer()
+    try:
+        client = SSEClient(server.url)
+        aggregator = Aggregator(600, 600, clients=[client], engine=NoEngine())
+        assert server.wait_connections(1)
+
+        updated = wait_for_update(aggregator)
+        server.push({"prices": [10, 20, 30, 40]})
+        assert updated.wait(5)
+        assert aggregator.fast_price() == 30 * GWEI
+    finally:
+        server.close()
+
+
+@pytest.mark.timeout(15)
+@pytest.mark.skipif(streaming.websocket is None, reason="websocket-client is not installed")
+def test_websocket_client():
+    server = WebSocketStubServer()
+    try:
+        client = WebSocketClient(server.url, headers={"Authorization": "key"})
+        assert server.wait_connections(1)
+
+        server.push({"prices": [10, 20, 30, 40]})
+        assert client.wait_ready(5)
+        assert client.fast_price() == 30 * GWEI
+        assert [json.loads(message) for message in server.received] == [{"subscribe": "gasprices"}]
+    finally:
+        server.close()
+
+
+@pytest.mark.timeout(15)
+def test_stop_closes_the_connection():
+    server = SSEStubServer()
+    try:
+        client = SSEClient(server.url)
+        assert server.wait_connections(1)
+
+        client.stop()
+        updated = wait_for_update(client)
+        server.push({"prices": [10, 20, 30, 40]})
+
+        # the connection has been shut down at once rather than after `expiry` seconds of silence,
+        # and neither counted as a failure nor re-established
+        assert not updated.wait(1.5)
+        assert server.connections == 1
+        assert client.breaker.state == 'closed'
+    finally:
+        server.close()